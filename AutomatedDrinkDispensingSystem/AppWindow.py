@@ -19,15 +19,19 @@ import time
 
 #my modules
 from Camera import Camera
+from PaymentSession import PaymentSession
 
 
 class AppWindow():
     var = 5  #number of attempts at secret button
+    payment_session = None  #PaymentSession of the drink being bought
+    wait_camera = None      #camera started for the wait screen
     
     def __init__(self,main_app):
         """Provides basic functionality to each window of the main application."""
         self.main_app_instance = main_app
         self.background_color = self.main_app_instance.MASTER_BACKGROUND_COLOR
+        self.round_items = [] #(drink, quantity) pairs that are ordered together as a round
 
 
     def displayDrinkOptionsInGUI(self):
@@ -167,6 +171,24 @@ class AppWindow():
                                     style="artsy_text.TButton")
             order_btn.grid(row=2,column=3)
             self.drink_profile_elements.append(order_btn)
+            round_btn = ttk.Button(self.frame,text="Add to Round",
+                                    command=self.addToRoundEvent,
+                                    style="artsy_text.TButton")
+            round_btn.grid(row=3,column=3)
+            self.drink_profile_elements.append(round_btn)
+            if self.round_items:
+                round_label = ttk.Label(self.frame,text="Round: "+self.getRoundText(self.round_items),
+                                        font=('Helvetica',14))
+                round_label.grid(row=3,column=1,columnspan=2)
+                remove_btn = ttk.Button(self.frame,text="Remove Last",
+                                        command=self.removeFromRoundEvent,
+                                        style="artsy_text.TButton")
+                remove_btn.grid(row=4,column=2)
+                clear_btn = ttk.Button(self.frame,text="Clear Round",
+                                        command=self.clearRoundEvent,
+                                        style="artsy_text.TButton")
+                clear_btn.grid(row=4,column=3)
+                self.drink_profile_elements.extend((round_label,remove_btn,clear_btn))
             """#if buttons are desired
             for i in range(5):
                 quantity_btn = ttk.Button(self.frame,text=str(i+1),
@@ -182,58 +204,100 @@ class AppWindow():
         self.drink_profile_elements.extend((img_item,name_of_drink,ingredient_text,back_button))
          
 
+    def isDrinkLoadedOnBoard(self):
+        """Checks that the current drink's recipe was uploaded to the embedded
+        board. Tells the user to wait if it is still being uploaded, or that
+        no drinks can be made if the board failed to start."""
+        if self.main_app_instance.order_queue.isHeld():
+            messagebox.showerror("Machine Unavailable",
+                                 "The drink machine is not working right now. Please ask an employee for help.",
+                                 parent=self.master)
+            return False
+        if not hasattr(self.main_app_instance, 'embedded_board'):
+            return True #no board, nothing to wait on
+        
+        board = self.main_app_instance.embedded_board
+        if board.getRecipeSlot(self.current_drink.id_number) is None:
+            return True #loaded into a recipe slot when its order is next
+        if board.isRecipeUploaded(self.current_drink.id_number):
+            return True
+        
+        messagebox.showinfo("Please Wait",
+                            "This drink is still being loaded onto the machine. Please try again in a few seconds.",
+                            parent=self.master)
+        return False
+
+
+    def doesRoundFitOnBoard(self):
+        """Checks that the round and the current drink can be poured as one
+        batch. Tells the employee to remove a drink from the round if it has
+        more different drinks than the boards have recipe slots."""
+        drink_ids = [drink.id_number for drink, quantity in self.round_items]
+        drink_ids.append(self.current_drink.id_number)
+        if self.main_app_instance.canFitOnBoard(drink_ids):
+            return True
+        messagebox.showerror("Round Too Large",
+                             "This round has more different drinks than the machine can hold. Please remove a drink from the round.",
+                             parent=self.master)
+        return False
+
+
     def startBuyEvent(self):
-        """Starts the buying process for the customer mode."""
+        """Starts the buying process for the customer mode. With a bill
+        acceptor, a PaymentSession takes the payment and the order is placed
+        as soon as the price is paid."""
+        if self.payment_session is not None and self.payment_session.state == "waiting":
+            return #already paying for a drink
+        if not self.isDrinkLoadedOnBoard():
+            return
         self.isOrdered = self.displayConfirmationMessageBox()
         if self.isOrdered:
+            self.isOrdered = False #reset value
             if hasattr(self.main_app_instance, 'pulse_pin'):
-                self.main_app_instance.pulse_pin.detectPulseEvent() #enable detection of money
-                isPaidFor = messagebox.askokcancel("Payment",
-                    "Insert cash into bill acceptor and press okay to finish order.\n$" +self.current_drink.price,parent=self.master ) 
-
-                if isPaidFor:
-                    self.main_app.AMOUNT_PAID = self.main_app_instance.pulse_pin.pulse_count
-                    
-                    while self.main_app.AMOUNT_PAID < float(self.current_drink.price) :
-                        owe = float(self.current_drink.price) - self.main_app.AMOUNT_PAID 
-                        msg = "You owe: $%.2f" % owe
-                        self.main_app.AMOUNT_PAID = self.main_app_instance.pulse_pin.pulse_count
-                        messagebox.showinfo("Remaining Payment",msg,parent=self.master)
-                        
-                    messagebox.showinfo("Payment Received","Drink process will start now.",parent=self.master)
-                    
-                    self.main_app_instance.BUTTON_ENABLE = False  #disable employee switch will making a drink
-                    self.main_app_instance.switch.state = "off"
-                    
-                    print("Going to wait screen.")
-                    self.main_app_instance.pulse_pin.pulse_count = 0  #reset pulse count once full payment is received.
-                    self.main_app.AMOUNT_PAID = 0 
-                    
-                    self.main_app_instance.pulse_pin.disablePulseEvent()
-                    self.main_app_instance.pulse_pin.state = "off"
-                
-
-                else:
-                    messagebox.showinfo("Payment","Payment was not received, so process was cancelled.",parent=self.master)
+                self.payment_session = PaymentSession(self.main_app_instance,self.current_drink.price,
+                                                      self.finishBuyEvent,self.cancelBuyEvent,self.master)
+                self.payment_session.start()
             else: #no bill acceptor connected
+                self.clearDrinkProfile()
                 self.setupWaitScreen(1)
-                return
-            self.isOrdered = False #reset value
-            self.clearDrinkProfile()
-            self.setupWaitScreen(1)
-            
+
+
+    def finishBuyEvent(self,payment_session):
+        """Places the customer's order once it is paid for."""
+        self.payment_session = None
+        if self.main_app_instance.device_enable and hasattr(self.main_app_instance,'switch'):
+            self.main_app_instance.BUTTON_ENABLE = False  #disable employee switch will making a drink
+            self.main_app_instance.switch.state = "off"
+        
+        print("Going to wait screen.")
+        self.clearDrinkProfile()
+        order = self.setupWaitScreen(1)
+        payment_session.logOverpayment(order)
+
+
+    def cancelBuyEvent(self,payment_session):
+        """Goes back to the drink options if the customer walked away, or
+        stays on the drink profile if they cancelled."""
+        self.payment_session = None
+        if payment_session.state == "timed out":
+            self.resetDrinkOptions()
 
 			
     def startEmployeeOrderEvent(self,num_of_drinks=None):
         """Starts the ordering process for the employee mode."""
         if num_of_drinks is None:
             num_of_drinks= int(self.drink_num_option.get())
+        if not self.isDrinkLoadedOnBoard() or not self.doesRoundFitOnBoard():
+            return
         
-        self.isOrdered = self.displayConfirmationMessageBox("Employee",num_of_drinks)
+        if self.round_items:
+            self.isOrdered = self.displayRoundConfirmationMessageBox(num_of_drinks)
+        else:
+            self.isOrdered = self.displayConfirmationMessageBox("Employee",num_of_drinks)
         if self.isOrdered:
             print("Going to wait screen")
             
-            if self.main_app_instance.device_enable :
+            if self.main_app_instance.device_enable and hasattr(self.main_app_instance,'switch'):
                 self.main_app_instance.BUTTON_ENABLE = False  
                 self.main_app_instance.switch.state = "off"
                 #turn off employee switch, so that the drink making process won't be interrupted
@@ -244,27 +308,79 @@ class AppWindow():
             self.setupWaitScreen(num_of_drinks)
                 
 
-    def sendDrinkOrderToEmbeddedBoard(self,drink_quantity):
-        """Sends the actual data to the embedded board """
-        DRINK_ID = int(self.current_drink.id_number)
-        QUANT = int(drink_quantity)
-        data_sequence = [DRINK_ID,QUANT,0,0,0,0,0,0,0,0]
-        #self.main_app_instance.embedded_board.pollPinUntilLow()
-        
-        self.main_app_instance.embedded_board.orderDrink(data_sequence)
+    def addToRoundEvent(self):
+        """Adds the current drink to the round, which is ordered as one batch
+        with the drink that is finished with 'Finish Order'."""
+        if not self.isDrinkLoadedOnBoard() or not self.doesRoundFitOnBoard():
+            return
+        self.round_items.append((self.current_drink,int(self.drink_num_option.get())))
+        self.resetDrinkOptions()
+
+
+    def removeFromRoundEvent(self):
+        """Takes the drink that was added last out of the round."""
+        if self.round_items:
+            self.round_items.pop()
+        self.clearDrinkProfile()
+        self.setupDrinkProfileInGUI()
+
+
+    def clearRoundEvent(self):
+        """Discards the round once the employee confirms it."""
+        if messagebox.askokcancel("Confirmation",
+                                  "Are you sure that you want to clear this round: "+self.getRoundText(self.round_items)+" ?",
+                                  parent=self.master):
+            self.round_items = []
+            self.clearDrinkProfile()
+            self.setupDrinkProfileInGUI()
+
+
+    def getRoundText(self,drink_quantities):
+        """Returns (drink, quantity) pairs as text, e.g. '2 Margarita, 1 Mojito'."""
+        return ", ".join([str(quantity)+" "+drink.name.title().replace("_"," ")
+                          for drink, quantity in drink_quantities])
 
 
     def setupWaitScreen(self,num_of_drinks):
-        """Creates and displays the elements of the wait screen."""
+        """Adds the order (with the round, if there is one) to the order queue
+        and shows that it was placed. The drink options come back after a few
+        seconds, so the next customer can order while this drink is made.
+        Returns the order."""
+        drink_quantities = self.round_items + [(self.current_drink,num_of_drinks)]
+        self.round_items = []
+        order_queue = self.main_app_instance.order_queue
+        order = order_queue.addBatchOrder(drink_quantities)
+        orders_ahead = order_queue.getOrdersAhead(order)
+        self.main_app_instance.startOrderStatusUpdates()
+        
         self.wait_frame = tk.Frame(self.master,height=500,width=500,bg=self.background_color)
         self.frame.grid_forget()
         
-        self.waitLabel = ttk.Label(self.wait_frame,text="Waiting...",anchor=tk.CENTER)
+        self.waitLabel = ttk.Label(self.wait_frame,text="",anchor=tk.CENTER)
         self.waitLabel.pack(fill=tk.X,side=tk.TOP)
+        self.isWaitScreenShown = True
+        wait_label = self.waitLabel
+        
+        def updateWaitLabel():
+            """Shows the order's ETA every second while this order's wait screen is up."""
+            if not self.isWaitScreenShown or self.waitLabel is not wait_label:
+                return #a newer wait screen has its own updates
+            if order.get("isFailed"):
+                wait_label.configure(text="Order #{} could not be made. Please ask an employee for help.".format(
+                    order["number"]))
+                return
+            eta = self.main_app_instance.pour_estimator.formatTime(order_queue.getEstimatedWait(order))
+            wait_label.configure(text="Order #{} was placed. Drinks ahead of yours: {}. Ready in about {}".format(
+                order["number"],orders_ahead,eta))
+            self.main_app.master.after(self.main_app_instance.ORDER_STATUS_DELAY,updateWaitLabel)
+        
+        updateWaitLabel()
         
+        self.wait_camera = None
         if hasattr(self.main_app_instance, 'camera'):
             self.img_item = ttk.Label(self.wait_frame)
-            self.main_app_instance.camera.startThreading(self.img_item)
+            self.wait_camera = self.main_app_instance.camera
+            self.wait_camera.startThreading(self.img_item)
         
         else:
             img = Image.open(self.main_app_instance.WAIT_SCREEN_IMG_PATH)
@@ -279,94 +395,74 @@ class AppWindow():
 
         self.wait_frame.pack(fill=tk.X)
         
+        self.main_app.master.after(self.main_app_instance.ORDER_PLACED_SCREEN_TIME,self.returnToDrinkOptions)
+        return order
+
+
+    def returnToDrinkOptions(self):
+        """Leaves the wait screen and sets up the main window for the next customer."""
+        if self.wait_camera is not None:
+            self.wait_camera.onExit() #turn off camera if used
+            while(self.wait_camera.state == "enabled"):
+                pass #wait until camera is off before going to next screen
+            self.wait_camera = None
+        
+        print("\nReturning to main window.")
+        self.isWaitScreenShown = False
+        self.waitLabel.pack_forget()
+        self.img_item.pack_forget()
+        self.wait_frame.pack_forget()
+        
+        self.frame = tk.Frame(self.master)
+        self.frame.configure(background= self.background_color)
+        self.frame.grid() 
+       
+        if self.main_app_instance.device_enable and hasattr(self.main_app_instance,'switch'):
+            #Re-enable employee switch
+            self.main_app_instance.BUTTON_ENABLE = True 
+            self.main_app_instance.switch.state = "enabled"
         
-        if hasattr(self.main_app_instance, 'embedded_board'):
-            def callback():
-                """Recursively called until timer completes. Setup main window
-                to be used for next customer """
-                if str(self.main_app_instance.embedded_board.getStateOfPin() ) != "1":
-                    #if state is low on pin, then execute next code
-                    print("Sending order.")
-                    self.sendDrinkOrderToEmbeddedBoard(num_of_drinks)
-                    print("Order sent. Waiting until done")
-                    
-                    def innerCallback():
-                        """Recursively called until drink making process is done (when pin is brought low)."""
-                    
-                        if str(self.main_app_instance.embedded_board.getStateOfPin() ) != "1":
-                            self.setupDeliveryScreen() #go to final screen of drink making process
-                            
-                            if hasattr(self.main_app_instance, 'camera'):
-                                self.main_app_instance.camera.onExit() #turn off camera if used
-                            
-                                while(self.main_app_instance.camera.state == "enabled"):
-                                    pass #wait until camera is off before going to next screen
-                        else:
-                            self.main_app.master.after(1000,innerCallback)
-                    
-                    self.main_app.master.after(1000,innerCallback)
-
-                else: #if state is high on pin, use callback in 1 second
-                    self.main_app.master.after(1000,callback)
-            
-            self.main_app.master.after(1000,callback)
+        self.displayDrinkOptionsInGUI()
+
+
+    def setupDeliveryScreen(self,order):
+        """Shows a pick up screen for a finished order in its own window, so
+        the drink options stay usable. Closes itself after 10 seconds."""
+        delivery_top_lvl = tk.Toplevel(self.master,background=self.background_color)
+        delivery_top_lvl.attributes('-topmost',True)
         
+        if len(order["items"]) > 1:
+            msg = "Order #{}: your round ({}) is ready for pick up!".format(order["number"],order["drink_name"].title())
+        elif order["quantity"] == 1:
+            msg = "Order #{}: your {} is ready for pick up!".format(order["number"],order["drink_name"].title())
         else:
-           def goToWait():
-               self.setupDeliveryScreen() #go to final screen of drink making process
-               if hasattr(self.main_app_instance, 'camera'):
-                   self.main_app_instance.camera.onExit() #turn off camera if used
-                   while(self.main_app_instance.camera.state == "enabled"):
-                       pass #wait until camera is off before going to next screen
-           self.main_app.master.after(5000,goToWait)
-
+            msg = "Order #{}: your {} {}s are ready for pick up!".format(order["number"],order["quantity"],
+                                                                        order["drink_name"].title())
+        delivery_label = ttk.Label(delivery_top_lvl,text=msg,anchor=tk.CENTER)
+        delivery_label.pack(fill=tk.X,side=tk.TOP)
         
-    
-    
-    def setupDeliveryScreen(self):
-        """Goes to final screen."""
-        self.waitLabel.pack_forget() #don't need text label anymore
-        self.img_item.pack_forget()  # or past image
-        
-        #self.delivery_img = ttk.Label(self.wait_frame,anchor=tk.CENTER)
-        self.delivery_img = tk.Label(self.wait_frame,anchor=tk.CENTER,
-                                    bg=self.background_color)
-                                    
         img = Image.open(self.main_app_instance.DELIVERY_SCREEN_IMG_PATH)
         img = img.resize((500,500),Image.ANTIALIAS)
         tk_photo = ImageTk.PhotoImage(img)
-            
-        self.delivery_img_reference = tk_photo 
         
-        self.delivery_img.configure(image=tk_photo)
-        self.delivery_img.pack(fill=tk.X,side=tk.BOTTOM)
+        delivery_img = tk.Label(delivery_top_lvl,image=tk_photo,anchor=tk.CENTER,
+                                bg=self.background_color)
+        delivery_img.img_ref = tk_photo #keeping a reference allows photo to display
+        delivery_img.pack(fill=tk.X)
+        
+        ttk.Button(delivery_top_lvl,text="Done",command=delivery_top_lvl.destroy).pack()
 
         i = 10 #seconds
         MILLI = 1000
-        print("Timer set for 10 seconds.\n")
         
         def callback():
-            """Recursively called until timer completes. Setup main window
-            to be used for next customer """
-            nonlocal i, MILLI
-            print(i)
+            """Recursively called until timer completes, then closes the pick up screen."""
+            nonlocal i
             i-= 1 #decrement second value
-            if not i: #if i < 1
-                print("\nReturning to main window.")
-                #setup drink options again after drink has been picked up
-                self.delivery_img.pack_forget()
-                self.wait_frame.pack_forget()
-                
-                self.frame = tk.Frame(self.master)
-                self.frame.configure(background= self.background_color)
-                self.frame.grid() 
-               
-                if self.main_app_instance.device_enable :
-                    #Re-enable employee switch
-                    self.main_app_instance.BUTTON_ENABLE = True 
-                    self.main_app_instance.switch.state = "enabled"
-                
-                self.displayDrinkOptionsInGUI()
+            if not delivery_top_lvl.winfo_exists():
+                return #closed with the Done button
+            if not i:
+                delivery_top_lvl.destroy()
             else:
                 self.main_app.master.after(MILLI,callback)
         
@@ -375,6 +471,18 @@ class AppWindow():
             
 
 
+    def setupOrderFailureScreen(self,order):
+        """Tells the customer in its own window that an order couldn't be
+        made. Stays up until it is closed, so an employee sees it."""
+        failure_top_lvl = tk.Toplevel(self.master,background=self.background_color)
+        failure_top_lvl.attributes('-topmost',True)
+        
+        msg = "Order #{}: sorry, your {} could not be made. Please ask an employee for help.".format(
+            order["number"],order["drink_name"].title())
+        ttk.Label(failure_top_lvl,text=msg,anchor=tk.CENTER).pack(fill=tk.X,side=tk.TOP)
+        ttk.Button(failure_top_lvl,text="Done",command=failure_top_lvl.destroy).pack()
+
+
     def displayConfirmationMessageBox(self,mode="Customer",num_of_drinks=1):
         """Asks the user if they are sure about their drink selection """
         if mode == "Customer":
@@ -399,6 +507,24 @@ class AppWindow():
                 return False
             
     
+    def displayRoundConfirmationMessageBox(self,num_of_drinks=1):
+        """Asks the employee if they are sure about the round & the current drink."""
+        drink_quantities = self.round_items + [(self.current_drink,num_of_drinks)]
+        if messagebox.askokcancel("Confirmation",
+                                  "Are you sure that you want this round: "+self.getRoundText(drink_quantities)+" ?",
+                                  parent=self.master):
+            print("Round is confirmed.")
+            for drink, quantity in drink_quantities:
+                if quantity == 1:
+                    msg = str(quantity)+" "+ drink.name + " was ordered."
+                else:
+                    msg = str(quantity)+" "+ drink.name + "s were ordered."
+                self.main_app_instance.writeToDrinkSalesLog(msg)
+            return True
+        else:
+            return False
+
+
     def clearDrinkProfile(self):
         """Clears window of current drink profile."""
         for element in self.drink_profile_elements:
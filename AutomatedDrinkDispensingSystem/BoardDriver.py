@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the BoardDriver class, which runs every
+operation of an EmbeddedBoard as a coroutine on an asyncio event loop in its
+own thread. The pacing delays between I2C writes are awaited on that loop,
+so they never block the GUI, and several operations can be in flight at once.
+
+Notes:
+  >	submit() starts a coroutine from any thread and returns a
+	concurrent.futures.Future, which can be cancelled with cancel().
+  >	If the driver has a Tk master, the callback given to submit() is called
+	on the Tk thread. Finished operations are put into a queue, which is read
+	by the Tk main loop while callbacks are pending.
+  >	I2C transactions run one at a time on a worker thread per bus, so the
+	blocking SMBus calls never run on the event loop itself. Boards on
+	different buses are written to at the same time.
+  >	Writes are paced by acknowledgement: after a block is written, the driver
+	waits for the board to bring its ready pin low again (or, if the board
+	has a status register, for the register to read idle). TRANSMIT_DELAY is
+	only waited in full when no acknowledgement comes.
+  >	"device" arguments are board entries of the EmbeddedBoard's BoardLayout.
+  >	Halt goes through a priority lane: it is written on the caller's thread
+	with the open bus handles, without waiting for the loop, the bus queue
+	or an acknowledgement. Queued writes wait until the lane is clear, so
+	a halt only ever waits for the transaction that is on the bus.
+  >	The first menu sync after start up skips the boards whose menu digest
+	(read back from the board, or else from the host's record of the last
+	acknowledged upload) matches the compiled menu.
+"""
+
+#standard library imports
+import time
+import queue
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+#local imports
+from I2CBus import I2CBus
+
+
+
+class BoardDriver:
+
+	CALLBACK_POLL_DELAY = 5  #milliseconds between checks for finished operations on the Tk thread
+	STATUS_POLL_INTERVAL = 0.002  #seconds between reads of the board's status register
+	PRIORITY_POLL_INTERVAL = 0.001 #seconds between checks of the priority lane by held back writes
+
+	#Menu upload retries (e.g. 'OSError: [Errno 121] Remote I/O error')
+	BLOCK_ATTEMPTS = 4            #writes of one block before it is left for the next pass
+	RETRY_BASE_DELAY = 0.02       #seconds before the first retry; doubled after each failure
+	RETRY_MAX_DELAY = 0.5
+	REGISTER_ERROR_BUDGET = 12    #errors on one register in a pass before its other blocks are skipped
+	RESEND_PASSES = 2             #extra passes that re-send only the blocks that failed
+	RESEND_DELAY = 2.0            #seconds between passes
+
+	#Results of pourBatch
+	POUR_DONE = "poured"
+	POUR_NOT_SENT = "not sent"          #no board got the order frame, so it can be sent again
+	POUR_NOT_FINISHED = "not finished"  #a board got the frame, so it may have poured part of it
+
+
+	def __init__(self,embedded_board,master=None):
+		self.board = embedded_board
+		self.master = master                    #Tk widget that callbacks are run on
+
+		self.completions = queue.Queue()        #(callback, args, isFinal) of finished operations & posted events
+		self.pending_callbacks = 0              #only used on the Tk thread
+		self.isCheckingCompletions = False
+
+		self.bus_executors = {}                 #bus number -> worker; one I2C transaction at a time per bus
+		for bus_number in embedded_board.layout.getBuses():
+			self.bus_executors[bus_number] = ThreadPoolExecutor(max_workers=1)
+		self.loop = asyncio.new_event_loop()
+		self.ready_events = {}                  #ready pin -> set when the pin is brought low
+		self.ack_events = {}                    #ready pin -> set when the pin is brought low after a write
+		self.ready_edges = {}                   #ready pin -> falling edges seen; only used on the loop
+
+		self.priority_pending = 0               #commands in the priority lane; queued writes wait while > 0
+		self.priority_lock = threading.Lock()
+		self.halt_latencies = []                #seconds from halt request to halt written to every board
+
+		#Pacing stats
+		self.ack_count = 0                      #writes acknowledged by the board
+		self.fallback_count = 0                 #writes that waited the full TRANSMIT_DELAY
+		self.total_ack_time = 0.0               #seconds
+
+		isStarted = threading.Event()
+		self.thread = threading.Thread(target=self.runLoop,args=(isStarted,),daemon=True)
+		self.thread.start()
+		isStarted.wait()
+
+
+	def runLoop(self,isStarted):
+		"""Runs the event loop until stop() is called."""
+		asyncio.set_event_loop(self.loop)
+		for pin in self.board.layout.getReadyPins():
+			self.ready_events[pin] = asyncio.Event() #made in the loop's thread, so they bind to this loop
+			self.ack_events[pin] = asyncio.Event()
+			self.ready_edges[pin] = 0
+		isStarted.set()
+		self.loop.run_forever()
+
+
+	def stop(self):
+		"""Stops the event loop and the I2C worker threads."""
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self.thread.join(timeout=1)
+		for executor in self.bus_executors.values():
+			executor.shutdown(wait=False)
+
+
+	def submit(self,coroutine,callback=None):
+		"""Starts a coroutine on the event loop and returns its future. The
+		callback is called with the future when the coroutine is done."""
+		future = asyncio.run_coroutine_threadsafe(coroutine,self.loop)
+		if callback is None:
+			return future
+
+		if self.master is None:
+			future.add_done_callback(callback)
+		else:
+			self.pending_callbacks += 1
+			future.add_done_callback(lambda done_future: self.completions.put((callback,(done_future,),True)))
+			if not self.isCheckingCompletions:
+				self.isCheckingCompletions = True
+				self.master.after(self.CALLBACK_POLL_DELAY,self.checkCompletions)
+		return future
+
+
+	def run(self,coroutine,timeout=None):
+		"""Runs a coroutine and blocks until it is done. Not for the Tk thread."""
+		return self.submit(coroutine).result(timeout)
+
+
+	def post(self,callback,*args):
+		"""Calls a callback from a running operation: on the Tk thread if the
+		driver has a master. Only for operations that were started with a
+		submit() callback, which keeps the Tk thread checking for them."""
+		if callback is None:
+			return
+		if self.master is None:
+			callback(*args)
+		else:
+			self.completions.put((callback,args,False))
+
+
+	def cancel(self,future):
+		"""Cancels an operation that was started with submit()."""
+		return future.cancel()
+
+
+	def checkCompletions(self):
+		"""Calls the callbacks of finished operations on the Tk thread."""
+		while True:
+			try:
+				callback, args, isFinal = self.completions.get_nowait()
+			except queue.Empty:
+				break
+			if isFinal:
+				self.pending_callbacks -= 1
+			callback(*args)
+
+		if self.pending_callbacks > 0:
+			self.master.after(self.CALLBACK_POLL_DELAY,self.checkCompletions)
+		else:
+			self.isCheckingCompletions = False
+
+
+	def notifyPinEdge(self,pin,level):
+		"""Called from the GPIO thread on each edge of a ready pin."""
+		if str(level) != "1" and pin in self.ready_events:
+			self.loop.call_soon_threadsafe(self.recordReadyEdge,pin)
+
+
+	def recordReadyEdge(self,pin):
+		"""Counts a falling edge of a ready pin and wakes its waiters."""
+		self.ready_edges[pin] += 1
+		self.ready_events[pin].set()
+		self.ack_events[pin].set()
+
+
+	async def runOnBus(self,device,function,*args):
+		"""Runs a blocking I2C call for a board on its bus's worker thread."""
+		return await self.loop.run_in_executor(self.bus_executors[device["bus"]],function,
+											   self.board.i2c_buses[device["bus"]],device["address"],*args)
+
+
+	async def waitForPriorityLane(self):
+		"""Holds back a write while priority commands are being sent."""
+		while self.priority_pending:
+			await asyncio.sleep(self.PRIORITY_POLL_INTERVAL)
+
+
+	async def writeBlock(self,device,register,data,isPaced=True,isRepeatable=True):
+		"""Writes a block to a register of a board. If isPaced is True, waits
+		until the board has taken the block. If isRepeatable is False, the bus
+		never sends the block a second time."""
+		await self.waitForPriorityLane()
+		self.ack_events[device["ready_pin"]].clear()
+		await self.runOnBus(device,functools.partial(I2CBus.writeBlock,isRepeatable=isRepeatable),register,data)
+		if isPaced:
+			await self.waitForAck(device)
+
+
+	async def writeByte(self,device,register,value,isPaced=True):
+		"""Writes one byte to a register of a board. If isPaced is True, waits
+		until the board has taken the byte."""
+		await self.waitForPriorityLane()
+		self.ack_events[device["ready_pin"]].clear()
+		await self.runOnBus(device,I2CBus.writeByte,register,value)
+		if isPaced:
+			await self.waitForAck(device)
+
+
+	async def waitForAck(self,device):
+		"""Waits until a board has consumed the last write, but no longer
+		than TRANSMIT_DELAY. Returns True if the board acknowledged it."""
+		board = self.board
+		start = self.loop.time()
+		if board.STATUS_ADDRESS is not None:
+			isAcked = await self.pollStatusRegister(device,start + board.TRANSMIT_DELAY)
+		else:
+			try:
+				await asyncio.wait_for(self.ack_events[device["ready_pin"]].wait(),board.TRANSMIT_DELAY)
+				isAcked = True
+			except asyncio.TimeoutError:
+				isAcked = False #the fixed delay has been waited instead
+
+		if isAcked:
+			self.ack_count += 1
+			self.total_ack_time += self.loop.time() - start
+		else:
+			self.fallback_count += 1
+		return isAcked
+
+
+	async def pollStatusRegister(self,device,deadline):
+		"""Reads a board's status register until it reads idle or the
+		deadline (event loop time) passes."""
+		board = self.board
+		while True:
+			try:
+				status = await self.runOnBus(device,I2CBus.readByte,board.STATUS_ADDRESS)
+				if status == board.STATUS_IDLE:
+					return True
+			except OSError:
+				pass
+			remaining = deadline - self.loop.time()
+			if remaining <= 0:
+				return False
+			await asyncio.sleep(min(self.STATUS_POLL_INTERVAL,remaining))
+
+
+	def getPacingStats(self):
+		"""Returns a dictionary of how writes were paced."""
+		average = 0.0
+		if self.ack_count:
+			average = self.total_ack_time / self.ack_count
+		return {"acked":self.ack_count,
+				"fallback":self.fallback_count,
+				"average_ack_ms":average*1000}
+
+
+	async def waitReady(self,timeout=None,isNewEdgeRequired=False,devices=None):
+		"""Waits until the boards (all boards by default) bring their ready pins
+		low. Returns False if the timeout (seconds) runs out first. If
+		isNewEdgeRequired is True, only an edge since the last order counts,
+		even if a pin is low now."""
+		if devices is None:
+			devices = self.board.layout.boards
+		pins = sorted(set([device["ready_pin"] for device in devices]))
+		if not isNewEdgeRequired:
+			for pin in pins:
+				self.ready_events[pin].clear()
+			if self.board.isReady(devices):
+				return True
+			pins = [pin for pin in pins if str(self.board.getStateOfPin(pin)) == "1"]
+		try:
+			await asyncio.wait_for(asyncio.gather(*[self.ready_events[pin].wait() for pin in pins]),timeout)
+		except asyncio.TimeoutError:
+			return False
+		return True
+
+
+	async def waitForEdges(self,edge_counts,timeout=None):
+		"""Waits until each ready pin has reached its count of falling edges
+		({pin: count}). Returns False if the timeout (seconds) runs out first."""
+		deadline = None if timeout is None else self.loop.time() + timeout
+		while True:
+			pins = [pin for pin in edge_counts if self.ready_edges[pin] < edge_counts[pin]]
+			if not pins:
+				return True
+			for pin in pins:
+				self.ready_events[pin].clear() #the counts are checked again after every wake up
+			remaining = None if deadline is None else deadline - self.loop.time()
+			if remaining is not None and remaining <= 0:
+				return False
+			waits = [asyncio.ensure_future(self.ready_events[pin].wait()) for pin in pins]
+			done, pending = await asyncio.wait(waits,timeout=remaining,return_when=asyncio.FIRST_COMPLETED)
+			for wait in pending:
+				wait.cancel()
+
+
+	async def uploadMenu(self):
+		"""Keeps syncing the drink menu until there are no new requests. If
+		blocks failed, up to RESEND_PASSES more passes re-send only those blocks."""
+		board = self.board
+		resend_passes = 0
+		while True:
+			with board.sync_lock:
+				if not board.isSyncRequested:
+					board.upload_future = None
+					return
+				board.isSyncRequested = False
+			report = await self.syncDrinkMenu()
+
+			if report["failed"] and resend_passes < self.RESEND_PASSES:
+				resend_passes += 1
+				print("Re-sending failed blocks in {} seconds.".format(self.RESEND_DELAY))
+				await asyncio.sleep(self.RESEND_DELAY)
+				with board.sync_lock:
+					board.isSyncRequested = True #failed blocks are the only ones not acknowledged
+			else:
+				resend_passes = 0
+
+
+	async def syncDrinkMenu(self):
+		"""Writes the (recipe, register) blocks that differ from the last image
+		acknowledged by the boards, one bus at a time per bus. Returns the
+		upload report, which is also kept in board.upload_report:
+			landed   : recipes that are on the boards
+			failed   : {recipe: [registers whose blocks failed]}
+			written  : blocks written
+			retries  : writes that were retried
+		"""
+		board = self.board
+		menu_version = board.menu_version #read before the file, so slots changed after it stay stale
+		blocks = board.readDrinkMenuBlocks()
+		if board.isMenuCheckPending:
+			board.isMenuCheckPending = False
+			await self.restoreAckedMenu(blocks)
+		changed_blocks = board.findChangedBlocks(blocks)
+		board.clearStaleSlots(menu_version)
+		board.recordAckedMenu(blocks) #boards that are about to be written are left out of the record
+		report = {"landed":[],"failed":{},"written":0,"retries":0}
+		register_errors = {} #register number -> errors in this pass
+
+		bus_blocks = {}      #bus number -> [(recipe, register, block)], in recipe order
+		blocks_left = {}     #recipe number -> blocks not written yet
+		for recipe_num in sorted(changed_blocks):
+			blocks_left[recipe_num] = len(changed_blocks[recipe_num])
+			for reg_num, DATA in changed_blocks[recipe_num]:
+				device = board.layout.getBoardForRegister(reg_num)[0]
+				bus_blocks.setdefault(device["bus"],[]).append((recipe_num,reg_num,DATA))
+
+		done = 0
+		async def writeBusBlocks(block_list):
+			nonlocal done
+			for recipe_num, reg_num, DATA in block_list:
+				print("Recipe #{} Valve #{}".format(str(recipe_num),str(reg_num)))
+				#Writing the recipe
+				if await self.writeBlockWithRetry(reg_num,DATA,register_errors,report):
+					board.acked_menu[(recipe_num,reg_num)] = tuple(DATA)
+					report["written"] += 1
+				else:
+					report["failed"].setdefault(recipe_num,[]).append(reg_num)
+
+				blocks_left[recipe_num] -= 1
+				if blocks_left[recipe_num] == 0: #the recipe's blocks on other buses may finish first
+					if recipe_num not in report["failed"]:
+						board.uploaded_recipes.add(recipe_num)
+					done += 1
+					board.upload_progress.put((done,len(changed_blocks)))
+
+		await asyncio.gather(*[writeBusBlocks(bus_blocks[bus]) for bus in sorted(bus_blocks)])
+
+		board.markUnchangedRecipes(blocks,changed_blocks)
+		board.recordAckedMenu(blocks)
+		report["landed"] = sorted(board.uploaded_recipes)
+		board.upload_report = report
+		if changed_blocks:
+			print("Menu sync pacing: {}".format(self.getPacingStats()))
+		if report["failed"]:
+			print("Recipes not on the board: {}".format(sorted(report["failed"])))
+		return report
+
+
+	async def restoreAckedMenu(self,blocks):
+		"""Marks the blocks of each board whose menu digest matches the
+		compiled menu as acknowledged, so they aren't uploaded again."""
+		board = self.board
+		record = board.readMenuRecord()
+		for device in board.layout.boards:
+			key = board.getBoardKey(device)
+			if board.MENU_DIGEST_ADDRESS is not None:
+				try:
+					board_digest = await self.readMenuDigest(device)
+				except OSError as error:
+					print("Error: Not able to read the menu digest of board {}. {}".format(key,error))
+					board_digest = None
+			else:
+				board_digest = record.get(key)
+
+			if board_digest == board.getBoardDigest(blocks,device):
+				board.markBoardAcked(blocks,device)
+				print("Drink menu on board {} is up to date.".format(key))
+
+
+	async def readMenuDigest(self,device):
+		"""Reads the menu digest that a board keeps for its recipe blocks."""
+		data = await self.runOnBus(device,I2CBus.readBlock,self.board.MENU_DIGEST_ADDRESS,4)
+		return int.from_bytes(bytes(data),"little")
+
+
+	async def writeBlockWithRetry(self,reg_num,data,register_errors,report):
+		"""Writes a recipe block to the board that has the menu register,
+		retrying with exponential backoff. Gives up after BLOCK_ATTEMPTS
+		writes, or right away once the register has used its error budget for
+		this pass. Returns True if the block was written."""
+		device, board_reg_num = self.board.layout.getBoardForRegister(reg_num)
+		data = list(data)
+		data[-1] = board_reg_num #the board numbers its own registers from 0
+
+		delay = self.RETRY_BASE_DELAY
+		for attempt in range(self.BLOCK_ATTEMPTS):
+			if register_errors.get(reg_num,0) >= self.REGISTER_ERROR_BUDGET:
+				return False
+			try:
+				await self.writeBlock(device,self.board.RECIPE_MAKER_ADDRESS+board_reg_num,data)
+				return True
+			except OSError as error:
+				register_errors[reg_num] = register_errors.get(reg_num,0) + 1
+				print("Error: Not able to write data at recipe stage. {}".format(error))
+				if attempt + 1 < self.BLOCK_ATTEMPTS:
+					report["retries"] += 1
+					await asyncio.sleep(delay)
+					delay = min(delay*2,self.RETRY_MAX_DELAY)
+		return False
+
+
+	async def order(self,data_sequence,devices=None):
+		"""Sends an order to the boards (all boards by default)."""
+		if devices is None:
+			devices = self.board.layout.boards
+		print("Sending drink data now.")
+		for device in devices:
+			self.ready_events[device["ready_pin"]].clear() #only ready edges after the order count
+		await asyncio.gather(*[self.writeBlock(device,self.board.ORDER_DRINK_ADDRESS,data_sequence,
+											   isPaced=False,isRepeatable=False)
+							   for device in devices])
+		#not paced: the next step of an order waits for the boards to be ready anyway
+		#not repeatable: a board may have started pouring, so OrderQueue decides if it is sent again
+
+
+	async def pourOrder(self,data_sequence,timeout=None):
+		"""Waits for the boards to be ready, sends an order ([id, quantity, 0...])
+		and waits until the boards are done making it. Returns the result of
+		pourBatch."""
+		return await self.pourBatch([(data_sequence[0],data_sequence[1])],timeout)
+
+
+	async def pourBatch(self,items,timeout=None,item_callback=None):
+		"""Pours (drink id, quantity) pairs as a batch: each order frame is sent
+		to the boards that have valves in its recipes once they are ready. The
+		boards signal each finished pair with a ready edge, and item_callback
+		is posted with the pair's index. Returns POUR_DONE, POUR_NOT_SENT if
+		the boards weren't ready within the timeout (seconds) or the frame
+		couldn't be written, or POUR_NOT_FINISHED if a written pair took
+		longer than the timeout."""
+		board = self.board
+		index = 0
+		for frame in board.packOrderFrames(items):
+			frame_items = [(frame[i],frame[i+1]) for i in range(0,len(frame),2) if frame[i+1] > 0]
+			devices = []
+			for drink_id, quantity in frame_items:
+				for device in board.getBoardsForRecipe(drink_id):
+					if device not in devices:
+						devices.append(device)
+			pins = set([device["ready_pin"] for device in devices])
+
+			if not await self.waitReady(timeout,devices=devices):
+				return self.POUR_NOT_SENT
+			first_edges = dict([(pin,self.ready_edges[pin]) for pin in pins])
+			try:
+				await self.order(frame,devices)
+			except OSError as error:
+				print("Order frame not written: {}".format(error))
+				if len(devices) > 1:
+					return self.POUR_NOT_FINISHED #the other boards may have taken it
+				return self.POUR_NOT_SENT
+			for count in range(1,len(frame_items)+1):
+				edge_counts = dict([(pin,first_edges[pin]+count) for pin in pins])
+				if not await self.waitForEdges(edge_counts,timeout):
+					return self.POUR_NOT_FINISHED
+				self.post(item_callback,index)
+				index += 1
+		return self.POUR_DONE
+
+
+	def sendPriorityByte(self,register,value):
+		"""Writes one byte to a register of every board ahead of all queued
+		writes. Runs on the caller's thread and doesn't wait for an
+		acknowledgement. Returns the seconds it took."""
+		start = time.perf_counter()
+		with self.priority_lock:
+			self.priority_pending += 1
+		try:
+			errors = []
+			for device in self.board.layout.boards:
+				try:
+					self.board.i2c_buses[device["bus"]].writeByte(device["address"],register,value)
+				except OSError as error:
+					errors.append(error) #the other boards still get the command
+		finally:
+			with self.priority_lock:
+				self.priority_pending -= 1
+
+		if errors:
+			raise errors[0]
+		return time.perf_counter() - start
+
+
+	def halt(self):
+		"""Commands every board to stop making a drink through the priority
+		lane. Returns the halt latency (seconds)."""
+		latency = self.sendPriorityByte(self.board.HALT_ADDRESS,0)
+		self.halt_latencies.append(latency)
+		return latency
+
+
+	def getHaltStats(self):
+		"""Returns a dictionary of measured halt latencies in milliseconds."""
+		if not self.halt_latencies:
+			return {"halts":0}
+		return {"halts":len(self.halt_latencies),
+				"last_ms":self.halt_latencies[-1]*1000,
+				"average_ms":sum(self.halt_latencies)/len(self.halt_latencies)*1000,
+				"max_ms":max(self.halt_latencies)*1000}
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the BoardLayout class, which describes the
+embedded (fluid) boards that are connected to the computer: the I2C bus and
+address of each board, how many 8-valve registers it has, and which GPIO pin
+it uses to signal that it is ready.
+
+Notes:
+  >	Valve registers are numbered across all boards in the order the boards
+	are listed. With the default layout, valves 1-8 are register 0, valves
+	9-16 are register 1, and so on.
+  >	Layout file format (one board per line, # starts a comment):
+		<bus number> <address> <registers> <ready pin>
+	e.g. "1 0x33 4 4". Without a layout file, DEFAULT_LAYOUT is used.
+  >	Boards on different buses are written to at the same time. Each board
+	should have its own ready pin, since acknowledgements are read from it.
+"""
+
+#standard library imports
+import os
+
+
+
+class BoardLayout:
+
+	DEFAULT_LAYOUT = ((1,0x33,4,4),)  #one board at 0x33 on /dev/i2c-1 with 4 registers; pin 4 is ready
+
+
+	def __init__(self,layout_file_path=None):
+		self.boards = []   #dicts of bus, address, registers, ready_pin, first_register
+		if layout_file_path is not None and os.path.exists(layout_file_path):
+			self.readLayoutFile(layout_file_path)
+		else:
+			for board in self.DEFAULT_LAYOUT:
+				self.addBoard(*board)
+
+
+	def readLayoutFile(self,layout_file_path):
+		"""Reads the boards from a layout file."""
+		with open(layout_file_path,"r") as layout_file:
+			for line in layout_file:
+				values = line.split("#")[0].split()
+				if len(values) < 4:
+					continue
+				self.addBoard(*[int(value,0) for value in values[:4]]) #allows hex addresses
+
+		if not self.boards:
+			print("No boards in {}. Using the default layout.".format(layout_file_path))
+			for board in self.DEFAULT_LAYOUT:
+				self.addBoard(*board)
+
+
+	def addBoard(self,bus,address,registers,ready_pin):
+		"""Adds a board after the boards that are already in the layout."""
+		self.boards.append({"bus":bus,"address":address,"registers":registers,
+							"ready_pin":ready_pin,"first_register":self.getNumRegisters()})
+
+
+	def getNumRegisters(self):
+		"""Returns the number of valve registers on all boards."""
+		return sum([board["registers"] for board in self.boards])
+
+
+	def getBoardForRegister(self,register):
+		"""Returns the board that has a menu register, and the register's
+		number on that board."""
+		for board in self.boards:
+			if register < board["first_register"] + board["registers"]:
+				return board, register - board["first_register"]
+		raise IndexError("No board has register {}".format(register))
+
+
+	def getBuses(self):
+		"""Returns the bus numbers that boards are on."""
+		return sorted(set([board["bus"] for board in self.boards]))
+
+
+	def getReadyPins(self):
+		"""Returns the ready pins of all boards."""
+		return sorted(set([board["ready_pin"] for board in self.boards]))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the DeviceManager class, which sets up the
+peripheral devices of the main application at the same time in a thread pool.
+A slow or missing device (e.g. the camera loading its Haar cascades) no longer
+holds up the other devices or the first paint of the main window.
+
+Note:
+    - Each device is created by a factory function in a worker thread, so
+    device constructors must not use Tk widgets. Work that needs Tk goes in
+    the device's on_ready callback, which runs in the Tk thread.
+    - A device is attached to the main app (e.g. main_app.camera) only once it
+    is ready, so the hasattr(main_app,...) checks of the rest of the app work
+    as before while a device is starting, and after it failed.
+    - Status of a device: "starting" -> "ready" | "failed" | "timed out".
+    A device that times out is not used, even if it finishes later.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import time
+
+
+class DeviceManager:
+
+    DEFAULT_TIMEOUT = 10.0  #seconds a device has to start
+    CHECK_DELAY = 20        #milliseconds between checks for started devices on the Tk thread
+
+    def __init__(self,main_app):
+        self.main_app = main_app
+        self.devices = {}                 #attribute name -> record of the device (see addDevice)
+        self.device_order = []            #attribute names in the order they were added
+        self.finished = queue.Queue()     #attribute names of devices whose factory returned or raised
+        self.executor = None
+        self.isChecking = False
+
+
+    def addDevice(self,attribute,factory,timeout=DEFAULT_TIMEOUT,on_ready=None,on_failed=None):
+        """Adds a device that is created by factory() and attached to the main
+        app as the given attribute. on_ready(device) and on_failed() are
+        called in the Tk thread."""
+        self.devices[attribute] = {"factory":factory,"timeout":timeout,"on_ready":on_ready,
+                                   "on_failed":on_failed,"status":"not started","init_time":None,
+                                   "error":None,"start_time":None,"future":None}
+        self.device_order.append(attribute)
+
+
+    def startAll(self):
+        """Starts creating every device that was added. Returns right away."""
+        self.executor = ThreadPoolExecutor(max_workers=max(len(self.devices),1))
+        for attribute in self.device_order:
+            record = self.devices[attribute]
+            record["status"] = "starting"
+            record["start_time"] = time.monotonic()
+            record["future"] = self.executor.submit(self.createDevice,attribute)
+            record["future"].add_done_callback(lambda future, attribute=attribute: self.finished.put(attribute))
+        self.executor.shutdown(wait=False) #threads exit once their device is created
+
+        if not self.isChecking:
+            self.isChecking = True
+            self.main_app.master.after(self.CHECK_DELAY,self.checkDevices)
+
+
+    def createDevice(self,attribute):
+        """Runs a device's factory and times it. Runs in a worker thread."""
+        record = self.devices[attribute]
+        start = time.monotonic()
+        try:
+            return record["factory"]()
+        finally:
+            record["init_time"] = time.monotonic() - start
+
+
+    def checkDevices(self):
+        """Attaches the devices that are ready and times out the ones that took
+        too long. Checks again until no device is starting."""
+        while not self.finished.empty():
+            self.finishDevice(self.finished.get_nowait())
+
+        now = time.monotonic()
+        for attribute in self.device_order:
+            record = self.devices[attribute]
+            if record["status"] == "starting" and now - record["start_time"] > record["timeout"]:
+                record["status"] = "timed out"
+                record["error"] = "not ready after {} seconds".format(record["timeout"])
+                self.reportDevice(attribute)
+                if record["on_failed"] is not None:
+                    record["on_failed"]()
+
+        if self.isStarting():
+            self.main_app.master.after(self.CHECK_DELAY,self.checkDevices)
+        else:
+            self.isChecking = False
+            self.main_app.writeToLog("Devices started: " + self.getHealthText())
+
+
+    def finishDevice(self,attribute):
+        """Attaches a device whose factory returned, or marks it as failed."""
+        record = self.devices[attribute]
+        if record["status"] != "starting":
+            print("{} finished after {:.2f} seconds, past its timeout, and is not used.".format(
+                attribute,record["init_time"]))
+            return
+
+        try:
+            device = record["future"].result()
+        except Exception as error:
+            record["status"] = "failed"
+            record["error"] = repr(error)
+            self.reportDevice(attribute)
+            if record["on_failed"] is not None:
+                record["on_failed"]()
+            return
+
+        record["status"] = "ready"
+        setattr(self.main_app,attribute,device)
+        self.reportDevice(attribute)
+        print("\n{} : {}".format(device.name,device.state))
+        if record["on_ready"] is not None:
+            record["on_ready"](device)
+
+
+    def reportDevice(self,attribute):
+        """Prints the status of a device."""
+        record = self.devices[attribute]
+        init_time = record["init_time"] if record["init_time"] is not None else time.monotonic() - record["start_time"]
+        message = "Device {}: {} ({:.2f} s)".format(attribute,record["status"],init_time)
+        if record["error"] is not None:
+            message += ": " + record["error"]
+        print(message)
+
+
+    def isStarting(self,attribute=None):
+        """Returns True if the given device (or any device) is still starting."""
+        if attribute is not None:
+            return attribute in self.devices and self.devices[attribute]["status"] == "starting"
+        return any([record["status"] == "starting" for record in self.devices.values()])
+
+
+    def hasFailed(self,attribute):
+        """Returns True if the given device failed or timed out."""
+        return attribute in self.devices and self.devices[attribute]["status"] in ("failed","timed out")
+
+
+    def getHealth(self):
+        """Returns the status, init time (seconds) and error of every device."""
+        health = {}
+        for attribute in self.device_order:
+            record = self.devices[attribute]
+            health[attribute] = {"status":record["status"],"init_time":record["init_time"],
+                                 "error":record["error"]}
+        return health
+
+
+    def getHealthText(self):
+        """Returns the status of every device as one line of text."""
+        parts = []
+        for attribute, health in self.getHealth().items():
+            if health["init_time"] is None:
+                parts.append("{} {}".format(attribute,health["status"]))
+            else:
+                parts.append("{} {} in {:.2f} s".format(attribute,health["status"],health["init_time"]))
+        return ", ".join(parts)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the DrinkCatalog class, which keeps a compiled
+index of every drink profile so that the main application does not have to
+walk each drink directory and parse each text file at startup.
+
+Note:
+    - The index is a JSON file with one entry per drink. Each entry stores the
+    path and modification time of the drink's text file plus its parsed
+    attributes.
+    - An entry is only rebuilt when its text file changes. The drink profile
+    directory itself is only listed when its modification time changes
+    (i.e. a drink was added or deleted).
+"""
+
+import os
+import json
+
+#my modules
+from DrinkProfile import DrinkProfile
+
+
+class DrinkCatalog:
+
+    INDEX_VERSION = 1
+    IGNORED_NAMES = ("__pycache__","__init__.py","__init_.py")
+
+    def __init__(self,drink_profile_directory,index_file_path,main_directory=None):
+        self.drink_profile_directory = drink_profile_directory
+        self.index_file_path = index_file_path
+        self.main_directory = main_directory
+
+        self.entries = {}           #drink directory name -> index entry
+        self.directory_mtime = None
+        self.isChanged = False      #index is written back only when True
+
+
+    def loadDrinks(self):
+        """Returns a list of DrinkProfile objects for every drink in the catalog.
+        Entries whose text files changed since the last run are rebuilt."""
+        self.isChanged = False
+        self.readIndex()
+
+        current_mtime = os.stat(self.drink_profile_directory).st_mtime_ns
+        if current_mtime != self.directory_mtime:
+            self.rescanDirectory()   #a drink was added or removed
+            self.directory_mtime = current_mtime
+            self.isChanged = True
+
+        drinks = []
+        for dir_name in sorted(self.entries):
+            entry = self.entries[dir_name]
+            try:
+                txt_mtime = os.stat(entry["txt_file"]).st_mtime_ns
+            except FileNotFoundError:
+                entry = self.buildEntry(dir_name)
+                if entry is None:
+                    continue
+                txt_mtime = entry["txt_mtime"]
+
+            if txt_mtime != entry["txt_mtime"]:
+                entry = self.buildEntry(dir_name)
+                if entry is None:
+                    continue
+
+            drinks.append(DrinkProfile(entry["txt_file"],self.main_directory,
+                                       catalog_entry=entry["profile"]))
+
+        if self.isChanged:
+            self.writeIndex()
+        return drinks
+
+
+    def readIndex(self):
+        """Reads the compiled index from file. A missing or outdated index is
+        treated as empty, which forces a full rebuild."""
+        self.entries = {}
+        self.directory_mtime = None
+        try:
+            with open(self.index_file_path,"r") as index_file:
+                index = json.load(index_file)
+        except (OSError,ValueError):
+            return
+
+        if index.get("version") != self.INDEX_VERSION:
+            return
+        self.entries = index.get("drinks",{})
+        self.directory_mtime = index.get("directory_mtime")
+
+
+    def writeIndex(self):
+        """Writes the index to a temporary file and then swaps it into place, so
+        a power loss never leaves a half written index."""
+        index = {"version":self.INDEX_VERSION,
+                 "directory_mtime":self.directory_mtime,
+                 "drinks":self.entries}
+
+        temp_path = self.index_file_path + ".tmp"
+        with open(temp_path,"w") as index_file:
+            json.dump(index,index_file)
+        os.replace(temp_path,self.index_file_path)
+        self.isChanged = False
+
+
+    def rescanDirectory(self):
+        """Lists the drink profile directory once and adds/removes entries."""
+        dir_names = [name for name in os.listdir(self.drink_profile_directory)
+                     if name not in self.IGNORED_NAMES and
+                     os.path.isdir(os.path.join(self.drink_profile_directory,name))]
+
+        for old_name in list(self.entries):
+            if old_name not in dir_names:
+                del self.entries[old_name]
+
+        for name in dir_names:
+            if name not in self.entries:
+                self.buildEntry(name)
+
+
+    def buildEntry(self,dir_name):
+        """Parses the drink profile text file in the given directory and stores
+        its attributes in the index. Returns None if there is no text file."""
+        path_builder = os.path.join(self.drink_profile_directory,dir_name)
+        txt_files = [name for name in os.listdir(path_builder) if name.endswith(".txt")]
+        if not txt_files:
+            print("No drink profile text file in {}".format(path_builder))
+            self.entries.pop(dir_name,None)
+            self.isChanged = True
+            return None
+
+        txt_file = "{}/{}".format(path_builder,txt_files[0])
+        drink = DrinkProfile(txt_file,self.main_directory)
+
+        #the profile can rewrite its own file (e.g. fixing a picture path), so stat afterwards
+        entry = {"txt_file":txt_file,
+                 "txt_mtime":os.stat(txt_file).st_mtime_ns,
+                 "profile":drink.toCatalogEntry()}
+        self.entries[dir_name] = entry
+        self.isChanged = True
+        return entry
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the DrinkMenuFile class, which reads and writes
+the compiled drink menu as a fixed-layout binary file. Readers map the file
+with mmap and slice recipe blocks straight out of it, so nothing has to be
+parsed before an upload.
+
+Note:
+    - File layout (little endian):
+        header (16 bytes):
+            magic         4 bytes   b"ADDM"
+            version       1 byte
+            recipes       1 byte
+            registers     1 byte
+            block size    1 byte    (10)
+            checksum      4 bytes   CRC-32 of the blocks
+            blocks length 4 bytes
+        blocks:
+            recipes * registers blocks of
+            [id, time_val_0, ... ,time_val_7, register_num]
+    - The text form (drink_menu.txt) can still be exported for debugging.
+    - Usage as a tool: python3 DrinkMenuFile.py <menu.bin> [text file to export]
+"""
+
+import os
+import sys
+import mmap
+import struct
+import zlib
+
+
+class DrinkMenuFile:
+
+    MAGIC = b"ADDM"
+    VERSION = 1
+    HEADER_FORMAT = "<4sBBBBII"
+    HEADER_SIZE = struct.calcsize(HEADER_FORMAT)  #16 bytes
+
+    def __init__(self,path):
+        self.path = path
+        self.file = None
+        self.map = None
+
+        self.num_recipes = 0
+        self.num_registers = 0
+        self.block_size = 0
+        self.checksum = None
+
+
+    def writeMenu(self,blocks,num_recipes,num_registers):
+        """Writes the blocks (any bytes-like object, e.g. a uint8 NumPy array)
+        into a new menu file. The file is swapped into place when complete."""
+        data = bytes(memoryview(blocks).cast("B"))
+        block_size = len(data) // (num_recipes * num_registers)
+        checksum = zlib.crc32(data)
+        header = struct.pack(self.HEADER_FORMAT,self.MAGIC,self.VERSION,num_recipes,
+                             num_registers,block_size,checksum,len(data))
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path,"wb") as menu_file:
+            menu_file.write(header)
+            menu_file.write(data)
+        os.replace(temp_path,self.path)
+        return checksum
+
+
+    def open(self):
+        """Maps the menu file into memory and checks its header & checksum.
+        Raises ValueError if the file is not a valid menu file."""
+        self.close()
+        self.file = open(self.path,"rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+            if len(self.map) < self.HEADER_SIZE:
+                raise ValueError("Drink menu file is too short.")
+
+            magic, version, self.num_recipes, self.num_registers, self.block_size, \
+                self.checksum, length = struct.unpack_from(self.HEADER_FORMAT,self.map,0)
+
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError("Not a drink menu file (or an unsupported version).")
+            if length != self.num_recipes*self.num_registers*self.block_size or \
+               len(self.map) < self.HEADER_SIZE + length:
+                raise ValueError("Drink menu file has the wrong length.")
+            if zlib.crc32(self.map[self.HEADER_SIZE:self.HEADER_SIZE+length]) != self.checksum:
+                raise ValueError("Drink menu file checksum does not match.")
+        except ValueError:
+            self.close()
+            raise
+        return self
+
+
+    def close(self):
+        """Unmaps and closes the menu file."""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+    def getBlock(self,recipe_num,reg_num):
+        """Returns the block for a recipe & register as bytes."""
+        offset = self.HEADER_SIZE + (recipe_num*self.num_registers + reg_num)*self.block_size
+        return self.map[offset:offset+self.block_size]
+
+
+    def getBlocks(self):
+        """Returns every block as a list of lists of ints, in upload order."""
+        blocks = []
+        for recipe_num in range(self.num_recipes):
+            for reg_num in range(self.num_registers):
+                blocks.append(list(self.getBlock(recipe_num,reg_num)))
+        return blocks
+
+
+    def exportText(self,text_path):
+        """Writes the menu in the comma delimited text form for debugging."""
+        with open(text_path,"w") as drink_menu:
+            for block in self.getBlocks():
+                drink_menu.write(",".join([str(x) for x in block])+"\n")
+
+
+
+if __name__ == "__main__":
+    menu = DrinkMenuFile(sys.argv[1]).open()
+    print("Recipes: {}  Registers: {}  Checksum: {:08x}".format(menu.num_recipes,
+                                                                menu.num_registers,menu.checksum))
+    if len(sys.argv) > 2:
+        menu.exportText(sys.argv[2])
+    else:
+        for block in menu.getBlocks():
+            print(",".join([str(x) for x in block]))
+    menu.close()
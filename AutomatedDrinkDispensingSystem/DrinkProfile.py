@@ -21,7 +21,10 @@ import shutil
 
 class DrinkProfile:
       
-    def __init__(self,drink_txt_file_path = None,main_directory=None):
+    CATALOG_ATTRIBUTES = ("id_number","name","ingredients","pic_location","isUrl",
+                          "isActive","price","ounces","pic_extension")
+      
+    def __init__(self,drink_txt_file_path = None,main_directory=None,catalog_entry=None):
         if main_directory == None:
             self.MAIN_DIRECTORY_PATH = ""
         else:
@@ -53,7 +56,10 @@ class DrinkProfile:
         """
         self.edited_attributes = [0,0,0,0,0,0,0,0]
         
-        self.checkIfNew()
+        if catalog_entry is not None:
+            self.loadCatalogEntry(catalog_entry) #attributes were already parsed by DrinkCatalog
+        else:
+            self.checkIfNew()
 
 
     def checkIfNew(self):
@@ -116,6 +122,20 @@ class DrinkProfile:
                 file.writelines(lines)
 
 
+    def toCatalogEntry(self):
+        """Returns the parsed drink attributes as a dictionary for the DrinkCatalog index."""
+        return {attrib: getattr(self,attrib) for attrib in self.CATALOG_ATTRIBUTES}
+
+
+    def loadCatalogEntry(self,entry):
+        """Sets the drink attributes from a DrinkCatalog index entry instead of parsing the text file."""
+        for attrib in self.CATALOG_ATTRIBUTES:
+            setattr(self,attrib,entry[attrib])
+        #lists are copied, so that edits to this drink don't change the cached entry
+        self.ingredients = list(self.ingredients)
+        self.ounces = list(self.ounces)
+
+
     def createDrinkProfile(self,desired_pic_path=None):
         """Creates a new drink profile in the designated directory.
         *Functions as a callback for a GUI element after the instance's attributes are populated.
@@ -212,39 +232,6 @@ class DrinkProfile:
         os.rmdir(drink_profile_path)
 
     
-    def addDrinkToConfig(self, path= None):
-        """Adds a drink to the configuration file for the main application if it is new."""
-        if path == None:
-            path = self.CONFIG_FILE_PATH
-        with open(path,"r+",encoding="ISO-8859-1") as f:
-            lines = f.read().splitlines()
-            f.seek(0)
-            
-            line_number = 1
-            for line in lines:
-                if line_number == 2:
-                    occurences_indx = []
-                    start = 0
-                    while True:
-                        index_new = line.find(self.name,start)
-                        if index_new == -1:
-                            break
-                        start = index_new + len(self.name)
-                        occurences_indx.append(index_new)
-                    if not occurences_indx:
-                        line = line +" "+ self.name
-                    else:
-                        isNotARepeat = True
-                        for sub_indx in occurences_indx:
-                            if  line.endswith(self.name) or line[ sub_indx + len(self.name)] == " ":
-                                isNotARepeat = False
-                        if isNotARepeat:
-                            line = line +" "+ self.name + " "
-                        
-                f.write(line+"\n") #overwrites existing content
-                line_number += 1
-
-
     def acquireDesiredPic(self,desired_pic_path):
         """Acquires the desired pic and sets the pic_location attribute of the drink object."""
 
@@ -290,18 +277,6 @@ def testNewDrink():
     test_drink2.createDrinkProfile("/home/pi/Pictures/drink.jpg")    
 
 
-def testAddingDrinkToConfig():
-    """Tests adding a drink name to the config file for the system."""
-    test_drink3 = DrinkProfile()
-    test_drink3.name = "vodka"
-    test_drink3.id_number = "25"
-    test_drink3.ingredients = "stuff ingredients nothing really"
-    test_drink3.isUrl = "False"
-    test_drink3.pic_extension = ".jpg"
-
-    test_drink3.addDrinkToConfig("config_copy.txt")
-
-
 def testDeletingADrinkProfile():
     """Tests deleting a drink profile."""
     test_drink4 = DrinkProfile(self.DRINK_PROFILE_DIRECTORY+"/Test_drink_2/test_drink_2.txt")
@@ -325,7 +300,6 @@ def testEditDrinkProfile():
 if __name__ == "__main__":
     #testExistingDrink()
     #testNewDrink()
-    #testAddingDrinkToConfig()
     #testDeletingADrinkProfile()
     #testEditDrinkProfile()
     pass
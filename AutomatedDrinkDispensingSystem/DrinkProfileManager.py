@@ -462,6 +462,7 @@ class DrinkProfileManager:
         
         
         self.main_app.active_drink_objects = self.main_app.getDrinks()
+        self.main_app.config.commit()
         self.main_app.updateDrinkMenu()
         
 
@@ -470,13 +471,15 @@ class DrinkProfileManager:
         """Deletes drink arg and cleans it from config file."""
         drink.deleteDrinkProfile()
         drinkTrash = drink
+        drink_name = drink.name.replace(" ","_")
         for el in self.main_app.active_drink_objects:
             if el.name == drinkTrash.name:
                 self.main_app.active_drink_objects.remove(drink)
                 self.main_app.all_drinks.remove(drink)
                 del drink
         self.drinks.delete(index)
-        self.main_app.cleanOldDrinksFromConfig()
+        self.main_app.config.removeActiveDrink(drink_name)
+        self.main_app.config.commit()
         dir(self.main_app.employee_window)
         #issue: self.main_app.employee_window.resetDrinkOptions()
 
@@ -520,6 +523,10 @@ class DrinkProfileManager:
             self.deployIncompleteMessageBox()
             return
         
+        #a new id or active state moves drinks around in the menu, so the whole menu is recompiled
+        isMenuLayoutChanged = new_id != self.drinkToEdit.id_number or \
+                              new_active_condition != self.drinkToEdit.isActive
+        
         if new_id != "" and new_id != self.drinkToEdit.id_number:
             self.drinkToEdit.id_number = new_id
             self.changeIdNum()
@@ -542,13 +549,19 @@ class DrinkProfileManager:
             if str(new_active_condition) == "1":
                 print("active")
                 self.makeActive(self.drinkToEdit)
+                self.main_app.config.addActiveDrink(self.drinkToEdit.name.replace(" ","_"))
             elif str(new_active_condition) == "0":
                 print("not active")
                 self.deactivateDrink(self.drinkToEdit)
+                self.main_app.config.removeActiveDrink(self.drinkToEdit.name.replace(" ","_"))
             else:
                 print("Incorrect state for isActive")
         
-        self.main_app.updateDrinkMenu()
+        self.main_app.config.commit() #all config changes from this edit in one write
+        if isMenuLayoutChanged:
+            self.main_app.updateDrinkMenu()
+        else:
+            self.main_app.updateDrinkMenu(self.drinkToEdit) #only this drink's recipe is recompiled
         self.main_app.writeToLog("Edited this drink: "+ self.drinkToEdit.name)
         self.top.destroy()
 
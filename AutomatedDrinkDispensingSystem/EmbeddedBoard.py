@@ -2,7 +2,7 @@
 
 """
 Programmer: Chris Blanks
-Last Edited: May 2019
+Last Edited: October 2026
 Project: Automated Self-Serving System
 Purpose: This script defines the EmbeddedBoard class, which inherits basic
 attribute from the PeripheralDevice class. The methods of this class define
@@ -19,14 +19,20 @@ Notes:
 """
 
 #standard library imports
+import os
 import time 
-
-#3rd party module imports
-from smbus2 import SMBusWrapper
-import RPi.GPIO as GPIO
+import zlib
+import json
+import queue
+import threading
 
 #my modules
+import HardwareLayer
 from PeripheralDevice import PeripheralDevice
+from I2CBus import I2CBus
+from DrinkMenuFile import DrinkMenuFile
+from BoardDriver import BoardDriver
+from BoardLayout import BoardLayout
 
 
 
@@ -36,92 +42,306 @@ class EmbeddedBoard(PeripheralDevice):
 	HALT_ADDRESS = 16      # 16 = 0x10
 	#Have to send dummy data (1 byte)
 	
-	I2C_SLAVE_ADDRESS = 51 # 51 = 0x33 is the address of the Embedded board
+	#The bus, address (e.g. 51 = 0x33) and ready pin (e.g. pin 4) of each board are in the BoardLayout
 	RECIPE_MAKER_ADDRESS = 55    # 55 = 0x37 is the address of a "register"
 	ORDER_DRINK_ADDRESS = 87  #
 	# 87 = 0x57 is the address to write to in order to transmit Drink ID & time to pump
+	ORDER_FRAME_SIZE = 10     #bytes in an order frame
+	NUM_RECIPE_SLOTS = 24     #recipes the board can store; drinks are put in them by the RecipeSlotCache
+	MAX_ORDER_QUANTITY = 255  #quantities are sent as one byte
 	
-	TRANSMIT_DELAY = 0.1 #delay for for 100 milliseconds between data transmission
-	COMM_INPUT_PIN = 4   #GPIO pin used for communication protocol with embedded board  
+	TRANSMIT_DELAY = 0.1 #longest wait for the board to take a block; only waited in full without an ack
+	STATUS_ADDRESS = None #register that reads STATUS_IDLE once a block is consumed; None uses the ready pin
+	STATUS_IDLE = 0
+	MENU_DIGEST_ADDRESS = None #register that reads back the board's menu digest (4 bytes); None uses the host's record
+	PIN_BOUNCE_TIME = 5  #milliseconds; edges on the communication pin closer than this are ignored
 	
 	
-	def __init__(self,main_app_instance):
-		"""Sets up an EmbeddedBoard device for communication with the
-		main computer."""
+	def __init__(self,main_app_instance,board_layout=None):
+		"""Sets up the EmbeddedBoard devices in the board layout for
+		communication with the main computer."""
 		
 		self.main_app = main_app_instance
+		self.layout = board_layout
+		if self.layout is None:
+			self.layout = BoardLayout()
+		self.num_registers = self.layout.getNumRegisters()
 		"""
 		pins 2 & 3 are used for i2c
-		pin 4 is used as an input pin to determine whether the embedded
-		board is ready for communication.
+		each board's ready pin (pin 4 by default) is used as an input pin to
+		determine whether the embedded board is ready for communication.
 		"""
         
 		self.name = "Embedded Board"
 		self.state = "off" 
-		self.pin_number = ['2','3','4']  
+		self.pin_number = ['2','3'] + [str(pin) for pin in self.layout.getReadyPins()]
 		self.buffer = None             # Any data that needs to be used in the main app
 		self.buffer_data_type = "Strings"
 		
-
-		GPIO.setmode(GPIO.BCM)
-		GPIO.setup(self.COMM_INPUT_PIN,GPIO.IN,pull_up_down=GPIO.PUD_UP) 
-		#setup pin 4 as input
-		#pull-up is setup on pin 4
+		self.uploaded_recipes = set()          #recipe slots that are fully written to the board
+		self.menu_version = 0                  #counts menu file rewrites that moved drinks between slots
+		self.stale_slots = {}                  #slot -> menu_version it got a new drink; not ready until synced
+		self.upload_future = None              #future of the running menu upload
+		self.upload_report = None              #report of the last menu sync (see BoardDriver.syncDrinkMenu)
+		self.upload_progress = queue.Queue()   #(recipes_done, total) tuples for the GUI thread
+		self.acked_menu = {}                   #(recipe, register) -> last block the board acknowledged
+		self.sync_lock = threading.Lock()
+		self.isSyncRequested = False
+		self.isMenuCheckPending = True         #the first sync checks which boards already have the menu
+		self.menu_record_path = None           #host's record of the menu digest each board acknowledged
+		if self.main_app is not None:
+			self.menu_record_path = self.main_app.BOARD_MENU_RECORD_FILE_PATH
+		
+		self.i2c_buses = {}                    #bus number -> one bus handle for every write
+		for bus_number in self.layout.getBuses():
+			self.i2c_buses[bus_number] = I2CBus(bus_number)
+		self.last_ready_time = None            #time of the last edge that brought a ready pin low
+		
+		master = None
+		if self.main_app is not None:
+			master = self.main_app.master      #callbacks of board operations run on the Tk thread
+		self.driver = BoardDriver(self,master)
+		
+		self.gpio = HardwareLayer.getGPIO()
+		self.gpio.setmode(self.gpio.BCM)
+		for pin in self.layout.getReadyPins():
+			self.gpio.setup(pin,self.gpio.IN,pull_up_down=self.gpio.PUD_UP) 
+			#setup ready pin as input
+			#pull-up is setup on ready pin
+			self.gpio.add_event_detect(pin,self.gpio.BOTH,callback=self.pinEdgeCallback,
+								  bouncetime=self.PIN_BOUNCE_TIME)
 
 
-	def getStateOfPin(self):
-		return GPIO.input(self.COMM_INPUT_PIN)
+	def getStateOfPin(self,pin=None):
+		"""Returns the level of a ready pin (the first board's by default)."""
+		if pin is None:
+			pin = self.layout.boards[0]["ready_pin"]
+		return self.gpio.input(pin)
 	
 	
-	def pollPinUntilLow(self):
-		"""Poll until pin 4 is low (signals that data transmission can start)"""
-		print(GPIO.input(self.COMM_INPUT_PIN))
-		while str(GPIO.input(self.COMM_INPUT_PIN)) == "1":
-			print(GPIO.input(self.COMM_INPUT_PIN))
+	def pinEdgeCallback(self,channel):
+		"""Called from the RPi.GPIO thread on each edge of a ready pin. The
+		edge is passed on to the driver's event loop."""
+		level = self.gpio.input(channel)
+		if str(level) != "1":
+			self.last_ready_time = time.monotonic()
+		self.driver.notifyPinEdge(channel,level)
+
+
+	def isReady(self,boards=None):
+		"""Returns True if the ready pins of the given boards (all boards by
+		default) are low (the boards are ready for data)."""
+		if boards is None:
+			boards = self.layout.boards
+		for board in boards:
+			if str(self.getStateOfPin(board["ready_pin"])) == "1":
+				return False
+		return True
+
+
+	def getBoardsForRecipe(self,recipe_num):
+		"""Returns the boards that have a valve to open for a recipe, going by
+		the blocks they acknowledged. Returns every board if none do."""
+		boards = []
+		for board in self.layout.boards:
+			for reg_num in range(board["first_register"],board["first_register"]+board["registers"]):
+				block = self.acked_menu.get((int(recipe_num),reg_num))
+				if block is not None and any(block[1:-1]):
+					boards.append(board)
+					break
+		if not boards:
+			return list(self.layout.boards)
+		return boards
+
+
+	def pollPinUntilLow(self,timeout=None):
+		"""Blocks until the ready pins are low (signals that data transmission can start).
+		Waits on pin edges instead of reading the pins in a loop. Returns False
+		if the timeout (seconds) runs out first. Not for the Tk thread."""
+		return self.driver.run(self.driver.waitReady(timeout))
+
+
+	def startMenuUpload(self):
+		"""Sends the drink menu to the board on the driver's event loop, so that
+		the GUI doesn't have to wait for it. Only blocks that differ from what the
+		board already acknowledged are sent. Progress is put into self.upload_progress."""
+		with self.sync_lock:
+			self.isSyncRequested = True
+			if self.isUploading():
+				return #running upload will pick up the new request
+			self.upload_future = self.driver.submit(self.driver.uploadMenu(),self.finishMenuUpload)
+
+
+	def finishMenuUpload(self,future):
+		"""Reports an upload that ended with an error."""
+		if not future.cancelled() and future.exception() is not None:
+			print("Error: Drink menu upload failed. {}".format(future.exception()))
+
+
+	def isUploading(self):
+		"""Returns True while the drink menu is being uploaded."""
+		return self.upload_future is not None and not self.upload_future.done()
+
+
+	def getRecipeSlot(self,drink_id):
+		"""Returns the recipe slot (the recipe id on the board) of a drink, or
+		None if the drink isn't in a slot. Without a main app, drink ids are slots."""
+		if self.main_app is not None and hasattr(self.main_app,'recipe_cache'):
+			return self.main_app.recipe_cache.getSlot(drink_id)
+		return int(drink_id)
+
+
+	def isRecipeUploaded(self,drink_id):
+		"""Returns True if the recipe for the given drink id is on the board."""
+		slot = self.getRecipeSlot(drink_id)
+		return slot is not None and slot in self.uploaded_recipes and slot not in self.stale_slots
+
+
+	def markSlotsStale(self,slots):
+		"""Called after the drink menu file was rewritten with new drinks in
+		the given slots. Their orders wait until a sync has read the new file."""
+		self.menu_version += 1
+		for slot in slots:
+			self.stale_slots[slot] = self.menu_version
+
+
+	def clearStaleSlots(self,menu_version):
+		"""Called by a sync that read the menu file at the given menu_version."""
+		for slot in list(self.stale_slots):
+			if self.stale_slots.get(slot,menu_version+1) <= menu_version:
+				del self.stale_slots[slot]
+
+
+	def readDrinkMenuBlocks(self):
+		"""Returns a list of recipe blocks (one per recipe & register) in the
+		order that they are sent to the board."""
+		blocks = []
+		if self.main_app is None:
+			#test data
+			for i in range(self.NUM_RECIPE_SLOTS):
+				for j in range(self.num_registers):
+					blocks.append([i, 51+i,52+i,53+i,54+i ,55+i,56+i,57+i,58+i, j])
+					#each element after DRINK_ID represents a pump time for each valve connected to the embedded board
+		else:
+			#If not testing, then map the binary drink menu file
+			drink_menu = DrinkMenuFile(self.main_app.DRINK_MENU_BIN_FILE_PATH).open()
+			blocks = drink_menu.getBlocks()
+			drink_menu.close()
+		return blocks
 
 
 	def initializeDrinkMenuOnBoard(self, data_sequence=None):
+		"""Forgets what the board has acknowledged and writes the whole drink
+		menu again. Blocks until it is done."""
+		self.acked_menu.clear()
+		self.isMenuCheckPending = False
+		self.syncDrinkMenu()
+
+
+	def getBoardKey(self,device):
+		"""Returns the key of a board in the menu record, e.g. '1:0x33'."""
+		return "{}:{}".format(device["bus"],hex(device["address"]))
+
+
+	def getBoardDigest(self,blocks,device):
+		"""Returns the CRC32 of the blocks that a board holds, in the order
+		and with the register numbers that they are sent to it."""
+		digest = 0
+		for index in range(len(blocks)):
+			board_reg_num = index % self.num_registers - device["first_register"]
+			if 0 <= board_reg_num < device["registers"]:
+				block = [int(value) for value in blocks[index]]
+				block[-1] = board_reg_num
+				digest = zlib.crc32(bytes(block),digest)
+		return digest
+
+
+	def isBoardAcked(self,blocks,device):
+		"""Returns True if a board acknowledged every one of its blocks."""
+		for index in range(len(blocks)):
+			recipe_num = index // self.num_registers
+			reg_num = index % self.num_registers
+			board_reg_num = reg_num - device["first_register"]
+			if 0 <= board_reg_num < device["registers"]:
+				if self.acked_menu.get((recipe_num,reg_num)) != tuple(blocks[index]):
+					return False
+		return True
+
+
+	def markBoardAcked(self,blocks,device):
+		"""Marks every block of a board as acknowledged."""
+		for index in range(len(blocks)):
+			recipe_num = index // self.num_registers
+			reg_num = index % self.num_registers
+			board_reg_num = reg_num - device["first_register"]
+			if 0 <= board_reg_num < device["registers"]:
+				self.acked_menu[(recipe_num,reg_num)] = tuple(blocks[index])
+
+
+	def readMenuRecord(self):
+		"""Returns {board key: menu digest} of the boards that acknowledged
+		their whole menu, as recorded by the host."""
+		if self.menu_record_path is None:
+			return {}
+		try:
+			with open(self.menu_record_path,"r") as record_file:
+				return json.load(record_file)
+		except (OSError,ValueError):
+			return {}
+
+
+	def recordAckedMenu(self,blocks):
+		"""Records the menu digest of each board that acknowledged its whole
+		menu. Boards that are missing blocks are left out of the record."""
+		if self.menu_record_path is None:
+			return
+		record = {}
+		for device in self.layout.boards:
+			if self.isBoardAcked(blocks,device):
+				record[self.getBoardKey(device)] = self.getBoardDigest(blocks,device)
+		if record == self.readMenuRecord():
+			return
+
+		temp_path = self.menu_record_path + ".tmp"
+		with open(temp_path,"w") as record_file:
+			json.dump(record,record_file)
+		os.replace(temp_path,self.menu_record_path)
+
+
+	def syncDrinkMenu(self):
 		"""This function writes a series of data (HEX form) to the embedded
 		boards via I2C. Note: Only can transmit 30 bytes of data.
 		
 		Recipe Data Format: [id, time_val_0,time_val_1,time_val_2,time_val_3,time_val_4,time5,time6,time7,valve_num ]
 		Data length: 10 items/Bytes
-		"""
-		
-		data_buffer = None  #stores recipe data from drink menu file
 		
-		if self.main_app is not None:
-			#If not testing, then grab data from drink menu file.
-			with open(self.main_app.DRINK_MENU_FILE_PATH,"r") as drink_menu:
-				data_buffer = drink_menu.readlines()
-				buffer_count = 0
+		Only the (recipe, register) blocks that differ from the last image
+		acknowledged by the board are written. Blocks until it is done.
+		"""
+		self.driver.run(self.driver.syncDrinkMenu())
+
+
+	def findChangedBlocks(self,blocks):
+		"""Returns {recipe number: [(register number, data), ...]} for blocks
+		that differ from the last image acknowledged by the board. Orders of
+		those recipes are blocked until they are rewritten."""
+		changed_blocks = {} #recipe number -> list of (register number, data)
+		for index in range(len(blocks)):
+			recipe_num = index // self.num_registers  #each recipe has a block for every register on every board
+			reg_num = index % self.num_registers
+			if self.acked_menu.get((recipe_num,reg_num)) != tuple(blocks[index]):
+				changed_blocks.setdefault(recipe_num,[]).append((reg_num,blocks[index]))
 		
-		#write data for all 24 potential recipes
-		for i in range(24):
-			print("Recipe #{}".format(str(i)))
-			DRINK_ID = i
-
-			with SMBusWrapper(1) as bus:
-				for j in range(4):
-					valve_array_num = j #there are 4 valve arrays; 2 boards with 2 registers dedicated to valves
-					print("Valve #{}".format(str(j)))
-					
-					if self.main_app is None:
-						DATA= [DRINK_ID, 51+i,52+i,53+i,54+i ,55+i,56+i,57+i,58+i, valve_array_num]
-						#each element after DRINK_ID represents a pump time for each valve connected to the embedded board
-					else:
-						DATA = (data_buffer[buffer_count]).split(",")
-						DATA = [int(x) for x in DATA] #convert into a list of integers
-						buffer_count +=1
-						pass 
-					
-					#Writing the recipe
-					try:
-						bus.write_i2c_block_data(self.I2C_SLAVE_ADDRESS,self.RECIPE_MAKER_ADDRESS+j,DATA)
-						time.sleep(self.TRANSMIT_DELAY) #takes floats
-					except OSError:
-						print("Error: Not able to write data at recipe stage.")
-				   
+		for recipe_num in changed_blocks:
+			self.uploaded_recipes.discard(recipe_num)
+		return changed_blocks
+
+
+	def markUnchangedRecipes(self,blocks,changed_blocks):
+		"""Recipes that didn't change are still on the board."""
+		for recipe_num in range(len(blocks) // self.num_registers):
+			if recipe_num not in changed_blocks and recipe_num not in self.uploaded_recipes:
+				self.uploaded_recipes.add(recipe_num)
 
 
 	def orderDrink(self,data_sequence=None):
@@ -143,19 +363,49 @@ class EmbeddedBoard(PeripheralDevice):
 		else:
 			DATA = data_sequence 
 		
-		print("Sending drink data now.")	
-		with SMBusWrapper(1) as bus:
-			# Ordering the drink(s)
-			bus.write_i2c_block_data(self.I2C_SLAVE_ADDRESS,self.ORDER_DRINK_ADDRESS,DATA)
-			time.sleep(self.TRANSMIT_DELAY) #takes floats
+		# Ordering the drink(s)
+		self.driver.run(self.driver.order(DATA))
+
+
+	def packOrderFrames(self,items):
+		"""Packs (drink id, quantity) pairs into order frames. Each frame holds
+		up to ORDER_FRAME_SIZE/2 pairs; a larger batch takes several frames.
+
+		Batch Order Data Format: [id_0, quantity_0, id_1, quantity_1, ... id_4, quantity_4]
+		
+		A pair with quantity 0 is empty, so a single order [id, quantity, 0, ...0]
+		has the same bytes as before. The board pours the pairs in order and
+		brings its ready pin low after each one (high again if more are left).
+		"""
+		pairs_per_frame = self.ORDER_FRAME_SIZE // 2
+		frames = []
+		for start in range(0,len(items),pairs_per_frame):
+			frame = []
+			for drink_id, quantity in items[start:start+pairs_per_frame]:
+				if not 0 < int(quantity) <= self.MAX_ORDER_QUANTITY:
+					raise ValueError("Quantity {} of drink {} can't be sent.".format(quantity,drink_id))
+				frame.extend((int(drink_id),int(quantity)))
+			frame.extend([0]*(self.ORDER_FRAME_SIZE - len(frame)))
+			frames.append(frame)
+		return frames
 
 
 	def sendHaltCommand(self):
-		"""Commands the embedded board to stop making a drink."""
-		with SMBusWrapper(1) as bus:
-					# Ordering the drink(s)
-					bus.write_byte_data(self.I2C_SLAVE_ADDRESS,self.HALT_ADDRESS,0)
-					time.sleep(self.TRANSMIT_DELAY) #takes floats
+		"""Commands the embedded boards to stop making a drink. Goes ahead of
+		any upload or order that is in progress and returns the halt latency
+		(seconds). Safe to call from any thread, including the Tk thread."""
+		latency = self.driver.halt()
+		print("Halt sent in {:.2f} ms.".format(latency*1000))
+		return latency
+
+
+	def close(self):
+		"""Stops edge detection on the ready pins, the driver, and closes the I2C bus handles."""
+		for pin in self.layout.getReadyPins():
+			self.gpio.remove_event_detect(pin)
+		self.driver.stop()
+		for bus in self.i2c_buses.values():
+			bus.close()
 
 		
 
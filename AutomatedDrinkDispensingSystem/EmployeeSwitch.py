@@ -1,36 +1,60 @@
 #!/usr/bin/env python3
 """
 Programmer: Chris Blanks
-Last Edited: Feb 2019
+Last Edited: October 2026
 Project: Automated Self-Serving System
 Purpose: This script defines the EmployeeSwitch class, which reads input
 from the GPIO pins of the raspberry pi and controls whether employee mode
 is switched on.
-"""
 
-from gpiozero import Button
+Note:
+  >	gpiozero calls when_pressed from its own thread, once per (debounced)
+	press. The press is sent to the Tk thread as the virtual event
+	PRESS_EVENT, since Tk widgets may only be used from the Tk thread.
+"""
 
 #my modules
+import HardwareLayer
 from PeripheralDevice import PeripheralDevice
 
 
 class EmployeeSwitch(PeripheralDevice):
+
+	BOUNCE_TIME = 0.05  #seconds; presses closer than this are switch bounce
+	PRESS_EVENT = "<<EmployeeSwitchPressed>>"
+
+
 	def __init__(self,main_app_instance):
 		super().__init__(main_app_instance)
 		self.name = "switch"
 		self.state = "enabled"
 		self.pin_number = 17	# GPIO pin 17
-		
-		self.button = Button(self.pin_number)  #assign pin 17 to button object
+
+		self.button = HardwareLayer.createButton(self.pin_number,bounce_time=self.BOUNCE_TIME)  #assign pin 17 to button object
+		self.button.when_pressed = self.buttonPressed
 
 
-	def checkButtonInput(self):
-		"""Sets up a button on GPIO7 & runs the react(). """
-		
-		if self.button.is_pressed and self.main_app.BUTTON_ENABLE:
+	def bindPressEvent(self):
+		"""Handles presses in the Tk thread. Called from the Tk thread once
+		the switch is set up."""
+		self.main_app.master.bind(self.PRESS_EVENT,self.handlePress)
+
+
+	def buttonPressed(self):
+		"""Called by gpiozero (in its thread) when the switch is pressed."""
+		try:
+			self.main_app.master.event_generate(self.PRESS_EVENT,when="tail")
+		except (RuntimeError,AttributeError):
+			print("Employee switch pressed before the window was ready.") #Tk main loop isn't running yet
+
+
+	def handlePress(self,event=None):
+		"""Switches to employee mode, unless the switch is disabled (e.g.
+		while a drink is made). Runs in the Tk thread."""
+		if self.main_app.BUTTON_ENABLE:
 			self.switchToEmployeeMode()
-	
-		
+
+
 	def switchToEmployeeMode(self):
 		"""Turns on employee mode."""
 		print("Employee Mode ON")
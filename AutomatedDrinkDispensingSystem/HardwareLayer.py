@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the hardware abstraction layer that every device
+uses for GPIO pins, I2C buses (SMBus) and buttons, instead of importing
+RPi.GPIO, smbus2 and gpiozero itself. The backend is picked once at start up:
+	> RealBackend, the Raspberry Pi's RPi.GPIO, smbus2 and gpiozero
+	> MockBackend, the in-memory devices of a SimulatedHardware
+	> RecordingBackend, which wraps another backend and writes every pin and
+	  bus event, with its time, to a compact binary trace file
+	> ReplayBackend, which plays the pin edges & bus reads of a trace back on
+	  the mock GPIO in step with the app's bus writes, so a trace from the
+	  field can be profiled on a dev box
+
+Notes:
+  >	getGPIO(), openSMBus() and createButton() use the backend that was given
+	to setBackend(). Without one, the real hardware is used.
+  >	Trace file format (little endian):
+		header: b"ADDSTRC1" <start time (double, seconds since the epoch)>
+		record: <microseconds since the last record (uint32)> <kind (uint8)>
+				<pin or bus (uint8)> <address (uint8)> <register or edge (uint8)>
+				<data length (uint8)> <data bytes>
+	A byte write is 10 bytes. A gap too long for the uint32 is written as a
+	TRACE_GAP record with the microseconds (uint64) as its data.
+  >	readTrace() returns the records of a trace. test_code/trace_report.py
+	prints the timing of the orders in a trace.
+"""
+
+#standard library imports
+import time
+import atexit
+import struct
+import threading
+import collections
+
+
+
+#Trace record kinds
+TRACE_GAP = 0             #data: microseconds (uint64) to add to the next record's time
+TRACE_GPIO_OUTPUT = 1     #data: [level]
+TRACE_GPIO_INPUT = 2      #data: [level]
+TRACE_GPIO_EDGE = 3       #register: edge (EDGE_FALLING, EDGE_RISING or EDGE_BOTH); data: [level]
+TRACE_BUS_WRITE_BLOCK = 4 #data: bytes written
+TRACE_BUS_WRITE_BYTE = 5  #data: [value]
+TRACE_BUS_READ_BYTE = 6   #data: [value]
+TRACE_BUS_READ_BLOCK = 7  #data: bytes read
+TRACE_BUS_ERROR = 8       #data: [kind of the transaction that failed]
+TRACE_BUTTON_PRESS = 9
+TRACE_BUTTON_RELEASE = 10
+
+TRACE_KIND_NAMES = {TRACE_GAP:"gap",TRACE_GPIO_OUTPUT:"gpio output",TRACE_GPIO_INPUT:"gpio input",
+					TRACE_GPIO_EDGE:"gpio edge",TRACE_BUS_WRITE_BLOCK:"bus write block",
+					TRACE_BUS_WRITE_BYTE:"bus write byte",TRACE_BUS_READ_BYTE:"bus read byte",
+					TRACE_BUS_READ_BLOCK:"bus read block",TRACE_BUS_ERROR:"bus error",
+					TRACE_BUTTON_PRESS:"button press",TRACE_BUTTON_RELEASE:"button release"}
+
+EDGE_FALLING = 1
+EDGE_RISING = 2
+EDGE_BOTH = 3
+
+TRACE_MAGIC = b"ADDSTRC1"
+TRACE_HEADER = struct.Struct("<8sd")
+TRACE_RECORD = struct.Struct("<IBBBBB")
+MAX_DELTA = 0xFFFFFFFF  #microseconds
+
+
+
+class TraceWriter:
+	"""Writes trace records to a file. Safe to use from any thread."""
+
+	FLUSH_COUNT = 256  #records between flushes, so a crash loses little of the trace
+
+
+	def __init__(self,trace_path):
+		self.trace_path = trace_path
+		self.trace_file = open(trace_path,"wb")
+		self.trace_file.write(TRACE_HEADER.pack(TRACE_MAGIC,time.time()))
+		self.lock = threading.Lock()
+		self.start = time.monotonic()
+		self.last_us = 0           #microseconds since start of the last record
+		self.unflushed = 0
+		self.record_count = 0
+
+
+	def write(self,kind,channel=0,address=0,register=0,data=()):
+		"""Adds a record with the current time."""
+		data = bytes(data)
+		with self.lock:
+			if self.trace_file is None:
+				return
+			elapsed_us = int((time.monotonic() - self.start) * 1000000)
+			delta = max(elapsed_us - self.last_us,0)
+			self.last_us = max(elapsed_us,self.last_us)
+			if delta > MAX_DELTA:
+				self.trace_file.write(TRACE_RECORD.pack(0,TRACE_GAP,0,0,0,8) + struct.pack("<Q",delta))
+				delta = 0
+			self.trace_file.write(TRACE_RECORD.pack(delta,kind,channel & 0xFF,address & 0xFF,
+													register & 0xFF,len(data)) + data)
+			self.record_count += 1
+			self.unflushed += 1
+			if self.unflushed >= self.FLUSH_COUNT:
+				self.trace_file.flush()
+				self.unflushed = 0
+
+
+	def close(self):
+		"""Writes what is left and closes the file."""
+		with self.lock:
+			if self.trace_file is not None:
+				self.trace_file.close()
+				self.trace_file = None
+
+
+
+def readTrace(trace_path):
+	"""Returns the start time (seconds since the epoch) of a trace and a list
+	of its records as (seconds since start, kind, pin or bus, address,
+	register or edge, data bytes)."""
+	with open(trace_path,"rb") as trace_file:
+		content = trace_file.read()
+	magic, start_time = TRACE_HEADER.unpack_from(content,0)
+	if magic != TRACE_MAGIC:
+		raise ValueError("{} is not a hardware trace".format(trace_path))
+
+	records = []
+	offset = TRACE_HEADER.size
+	elapsed_us = 0
+	while offset + TRACE_RECORD.size <= len(content):
+		delta, kind, channel, address, register, length = TRACE_RECORD.unpack_from(content,offset)
+		offset += TRACE_RECORD.size
+		data = content[offset:offset+length]
+		offset += length
+		if len(data) < length:
+			break #cut off by a crash
+		elapsed_us += delta
+		if kind == TRACE_GAP:
+			elapsed_us += struct.unpack("<Q",data)[0]
+			continue
+		records.append((elapsed_us / 1000000,kind,channel,address,register,data))
+	return start_time, records
+
+
+
+class RecordingGPIO:
+	"""Stands in for RPi.GPIO, passes every call on to another GPIO and writes
+	pin levels and edges to a trace."""
+
+	def __init__(self,gpio,trace):
+		self.gpio = gpio
+		self.trace = trace
+		self.pin_edges = {}  #pin -> edge given to add_event_detect
+
+
+	def __getattr__(self,name):
+		return getattr(self.gpio,name) #constants & calls that aren't recorded (setmode, setup, ...)
+
+
+	def getEdgeCode(self,edge):
+		"""Returns the trace code of a GPIO edge constant."""
+		if edge == self.gpio.FALLING:
+			return EDGE_FALLING
+		if edge == self.gpio.RISING:
+			return EDGE_RISING
+		return EDGE_BOTH
+
+
+	def recordEdge(self,pin,edge):
+		"""Writes an edge of a pin to the trace."""
+		code = self.getEdgeCode(edge)
+		if code == EDGE_BOTH:
+			level = int(self.gpio.input(pin))
+		else:
+			level = 1 if code == EDGE_RISING else 0
+		self.trace.write(TRACE_GPIO_EDGE,pin,register=code,data=(level,))
+
+
+	def wrapCallback(self,pin,callback):
+		"""Returns an edge callback that writes the edge to the trace first."""
+		def recordedCallback(channel):
+			self.recordEdge(channel,self.pin_edges.get(pin,self.gpio.BOTH))
+			callback(channel)
+		return recordedCallback
+
+
+	def input(self,pin):
+		level = self.gpio.input(pin)
+		self.trace.write(TRACE_GPIO_INPUT,pin,data=(int(level),))
+		return level
+
+
+	def output(self,pin,level):
+		self.gpio.output(pin,level)
+		self.trace.write(TRACE_GPIO_OUTPUT,pin,data=(int(level),))
+
+
+	def add_event_detect(self,pin,edge,callback=None,bouncetime=None):
+		self.pin_edges[pin] = edge
+		options = {}
+		if callback is not None:
+			options["callback"] = self.wrapCallback(pin,callback)
+		if bouncetime is not None:
+			options["bouncetime"] = bouncetime
+		self.gpio.add_event_detect(pin,edge,**options)
+
+
+	def add_event_callback(self,pin,callback):
+		self.gpio.add_event_callback(pin,self.wrapCallback(pin,callback))
+
+
+	def wait_for_edge(self,pin,edge,**options):
+		result = self.gpio.wait_for_edge(pin,edge,**options)
+		if result is not None:
+			self.recordEdge(pin,edge)
+		return result
+
+
+
+class RecordingSMBus:
+	"""Stands in for smbus2.SMBus, passes every transaction on to another bus
+	and writes it to a trace."""
+
+	def __init__(self,bus,bus_number,trace):
+		self.bus = bus
+		self.bus_number = bus_number
+		self.trace = trace
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self,*exc_info):
+		self.close()
+
+
+	def __getattr__(self,name):
+		return getattr(self.bus,name)
+
+
+	def record(self,kind,address,register,operation,*args):
+		"""Runs a transaction and writes it (or its failure) to the trace."""
+		try:
+			result = operation(address,register,*args)
+		except OSError:
+			self.trace.write(TRACE_BUS_ERROR,self.bus_number,address,register,(kind,))
+			raise
+		if kind == TRACE_BUS_WRITE_BLOCK:
+			data = args[0]
+		elif kind == TRACE_BUS_WRITE_BYTE:
+			data = (args[0],)
+		elif kind == TRACE_BUS_READ_BYTE:
+			data = (result,)
+		else:
+			data = result
+		self.trace.write(kind,self.bus_number,address,register,data)
+		return result
+
+
+	def write_i2c_block_data(self,address,register,data):
+		return self.record(TRACE_BUS_WRITE_BLOCK,address,register,self.bus.write_i2c_block_data,data)
+
+
+	def write_byte_data(self,address,register,value):
+		return self.record(TRACE_BUS_WRITE_BYTE,address,register,self.bus.write_byte_data,value)
+
+
+	def read_byte_data(self,address,register):
+		return self.record(TRACE_BUS_READ_BYTE,address,register,self.bus.read_byte_data)
+
+
+	def read_i2c_block_data(self,address,register,length):
+		return self.record(TRACE_BUS_READ_BLOCK,address,register,self.bus.read_i2c_block_data,length)
+
+
+	def close(self):
+		self.bus.close()
+
+
+
+class RecordingButton:
+	"""Stands in for gpiozero's Button and writes presses & releases to a trace."""
+
+	def __init__(self,button,pin,trace):
+		self.__dict__["button"] = button
+		self.__dict__["pin"] = pin
+		self.__dict__["trace"] = trace
+		self.__dict__["callbacks"] = {"when_pressed":None,"when_released":None}
+
+
+	def __getattr__(self,name):
+		if name in self.callbacks:
+			return self.callbacks[name]
+		return getattr(self.button,name)
+
+
+	def __setattr__(self,name,value):
+		if name not in self.callbacks:
+			setattr(self.button,name,value)
+			return
+		self.callbacks[name] = value
+		if value is None:
+			setattr(self.button,name,None)
+			return
+		kind = TRACE_BUTTON_PRESS if name == "when_pressed" else TRACE_BUTTON_RELEASE
+		def recordedCallback():
+			self.trace.write(kind,self.pin)
+			value()
+		setattr(self.button,name,recordedCallback)
+
+
+
+class RealBackend:
+	"""The Raspberry Pi's GPIO, I2C buses and buttons."""
+
+	name = "real"
+
+
+	def getGPIO(self):
+		import RPi.GPIO as GPIO
+		return GPIO
+
+
+	def openSMBus(self,bus_number):
+		from smbus2 import SMBus
+		return SMBus(bus_number)
+
+
+	def createButton(self,pin,**options):
+		from gpiozero import Button
+		return Button(pin,**options)
+
+
+
+class MockBackend:
+	"""The in-memory devices of a SimulatedHardware."""
+
+	name = "mock"
+
+
+	def __init__(self,simulated_hardware=None):
+		if simulated_hardware is None:
+			import SimulatedHardware
+			simulated_hardware = SimulatedHardware.SimulatedHardware()
+		self.simulated_hardware = simulated_hardware
+
+
+	def getGPIO(self):
+		return self.simulated_hardware.gpio
+
+
+	def openSMBus(self,bus_number):
+		import SimulatedHardware
+		return SimulatedHardware.SimulatedSMBus(bus_number)
+
+
+	def createButton(self,pin,**options):
+		import SimulatedHardware
+		return SimulatedHardware.SimulatedButton(pin,**options)
+
+
+
+class RecordingBackend:
+	"""Wraps another backend and writes all of its pin & bus traffic to a trace."""
+
+	name = "recording"
+
+
+	def __init__(self,backend,trace_path):
+		self.backend = backend
+		self.trace = TraceWriter(trace_path)
+		self.gpio = None
+		atexit.register(self.close)
+		print("Recording hardware trace to {}.".format(trace_path))
+
+
+	def getGPIO(self):
+		if self.gpio is None:
+			self.gpio = RecordingGPIO(self.backend.getGPIO(),self.trace)
+		return self.gpio
+
+
+	def openSMBus(self,bus_number):
+		return RecordingSMBus(self.backend.openSMBus(bus_number),bus_number,self.trace)
+
+
+	def createButton(self,pin,**options):
+		return RecordingButton(self.backend.createButton(pin,**options),pin,self.trace)
+
+
+	def close(self):
+		self.trace.close()
+
+
+
+class ReplaySMBus:
+	"""An I2C bus that takes the app's writes (failing the ones that failed in
+	the trace) and answers reads with the values read in the trace, in the
+	same order."""
+
+	def __init__(self,replay,bus_number):
+		self.replay = replay
+		self.bus_number = bus_number
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self,*exc_info):
+		self.close()
+
+
+	def getReadData(self,kind,address,register,length):
+		"""Returns the next value read from a register in the trace (zeros
+		once the trace has no more)."""
+		reads = self.replay.bus_reads.get((kind,self.bus_number,address,register))
+		if reads:
+			return reads.popleft()
+		return bytes(length)
+
+
+	def write_i2c_block_data(self,address,register,data):
+		self.replay.recordWrite()
+
+
+	def write_byte_data(self,address,register,value):
+		self.replay.recordWrite()
+
+
+	def read_byte_data(self,address,register):
+		return self.getReadData(TRACE_BUS_READ_BYTE,address,register,1)[0]
+
+
+	def read_i2c_block_data(self,address,register,length):
+		return list(self.getReadData(TRACE_BUS_READ_BLOCK,address,register,length))
+
+
+	def close(self):
+		pass
+
+
+
+class ReplayBackend:
+	"""Plays a trace back against the app. Each pin edge and button press of
+	the trace happens the recorded time (times speed) after the app makes the
+	bus write that came before it in the trace, so the boards answer the app's
+	traffic as they did in the field. Bus writes that failed in the trace
+	fail again, and bus reads return the recorded values."""
+
+	name = "replay"
+	WRITE_KINDS = (TRACE_BUS_WRITE_BLOCK,TRACE_BUS_WRITE_BYTE)
+
+
+	def __init__(self,trace_path,speed=1.0):
+		self.speed = speed
+		import SimulatedHardware
+		self.start_time, self.records = readTrace(trace_path)
+		self.gpio = SimulatedHardware.SimulatedGPIO()
+		self.bus_reads = {}        #(kind, bus, address, register) -> recorded read data
+		self.write_failures = []   #True for each write in the trace that failed
+		self.events = []           #(writes before it, seconds after the last of them, record) of each edge & button event
+		self.write_times = []      #time of each write the app made during the replay
+		self.write_condition = threading.Condition()
+		self.isFinished = threading.Event()
+
+		last_write_time = 0.0
+		for record in self.records:
+			record_time, kind, channel, address, register, data = record
+			if kind in (TRACE_BUS_READ_BYTE,TRACE_BUS_READ_BLOCK):
+				key = (kind,channel,address,register)
+				self.bus_reads.setdefault(key,collections.deque()).append(data)
+			elif kind in self.WRITE_KINDS or (kind == TRACE_BUS_ERROR and data and data[0] in self.WRITE_KINDS):
+				self.write_failures.append(kind == TRACE_BUS_ERROR)
+				last_write_time = record_time
+			elif kind in (TRACE_GPIO_EDGE,TRACE_BUTTON_PRESS,TRACE_BUTTON_RELEASE):
+				self.events.append((len(self.write_failures),record_time - last_write_time,record))
+		print("Replaying {} records of a hardware trace.".format(len(self.records)))
+
+
+	def getGPIO(self):
+		return self.gpio
+
+
+	def openSMBus(self,bus_number):
+		return ReplaySMBus(self,bus_number)
+
+
+	def createButton(self,pin,**options):
+		import SimulatedHardware
+		return SimulatedHardware.SimulatedButton(pin,**options)
+
+
+	def recordWrite(self):
+		"""Counts a write of the app. Raises OSError if that write failed in
+		the trace."""
+		with self.write_condition:
+			index = len(self.write_times)
+			self.write_times.append(time.monotonic())
+			self.write_condition.notify_all()
+		if index < len(self.write_failures) and self.write_failures[index]:
+			raise OSError(121,"Remote I/O error")
+
+
+	def start(self):
+		"""Plays the pin edges & button presses in a background thread."""
+		self.start_monotonic = time.monotonic()
+		threading.Thread(target=self.play,daemon=True).start()
+
+
+	def play(self):
+		import SimulatedHardware
+		for num_writes, delay, record in self.events:
+			with self.write_condition:
+				while len(self.write_times) < num_writes:
+					self.write_condition.wait()
+				anchor = self.write_times[num_writes-1] if num_writes else self.start_monotonic
+			wait = anchor + delay*self.speed - time.monotonic()
+			if wait > 0:
+				time.sleep(wait)
+
+			record_time, kind, channel, address, register, data = record
+			if kind == TRACE_GPIO_EDGE:
+				level = data[0]
+				if self.gpio.input(channel) == level:
+					self.gpio.setLevel(channel,1 - level,False) #so the recorded edge happens, without an edge the app didn't see
+				self.gpio.setLevel(channel,level)
+			else:
+				button = SimulatedHardware.SimulatedButton.buttons.get(channel)
+				if button is not None:
+					if kind == TRACE_BUTTON_PRESS:
+						button.press()
+					else:
+						button.release()
+		self.isFinished.set()
+
+
+
+backend = None  #set with setBackend(); RealBackend if it isn't set
+
+
+def setBackend(new_backend):
+	"""Picks the backend that devices use. Has to be called before any device
+	is created."""
+	global backend
+	backend = new_backend
+	return new_backend
+
+
+def getBackend():
+	"""Returns the backend that devices use."""
+	global backend
+	if backend is None:
+		backend = RealBackend()
+	return backend
+
+
+def getGPIO():
+	"""Returns the GPIO interface (the RPi.GPIO API)."""
+	return getBackend().getGPIO()
+
+
+def openSMBus(bus_number):
+	"""Returns an open I2C bus (the smbus2.SMBus API)."""
+	return getBackend().openSMBus(bus_number)
+
+
+def createButton(pin,**options):
+	"""Returns a button on a pin (the gpiozero Button API)."""
+	return getBackend().createButton(pin,**options)
+
+
+def setupFromArgs(args,simulated_hardware=None):
+	"""Picks the backend from the command line args:
+		"replay=<trace path>" plays a trace ("replay_speed=0.5" plays it twice as fast)
+		"record=<trace path>" records the traffic of the real (or simulated) hardware
+	Without them, the simulated hardware is used if there is one, and the
+	real hardware otherwise. Returns the backend."""
+	trace_path = None
+	replay_path = None
+	replay_speed = 1.0
+	for arg in args:
+		if arg.startswith("record="):
+			trace_path = arg.split("=",1)[1]
+		elif arg.startswith("replay="):
+			replay_path = arg.split("=",1)[1]
+		elif arg.startswith("replay_speed="):
+			replay_speed = float(arg.split("=",1)[1])
+
+	if replay_path is not None:
+		return setBackend(ReplayBackend(replay_path,replay_speed))
+	if simulated_hardware is not None:
+		new_backend = MockBackend(simulated_hardware)
+	else:
+		new_backend = RealBackend()
+	if trace_path is not None:
+		new_backend = RecordingBackend(new_backend,trace_path)
+	return setBackend(new_backend)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the I2CBus class, which owns one long-lived
+SMBus handle for an I2C bus. Every write goes through transaction(), so
+access from different threads is serialized, a lost bus handle is reopened
+once before giving up, and the time of each transaction is recorded.
+
+Notes:
+  >	Opening the SMBus opens /dev/i2c-<bus number>, so the handle is kept
+	open instead of being made for each write.
+  >	Only errors that mean the handle or adapter is gone (EBADF, ENODEV,
+	ENXIO) reopen the bus. A NAK or bus error (EREMOTEIO, EIO) is raised
+	right away, so the caller's retry policy decides what happens next.
+  >	A transaction that isn't repeatable (e.g. an order frame, which a board
+	may already have acted on) still reopens a lost handle, but is never
+	sent again by this class.
+"""
+
+#standard library imports
+import time
+import errno
+import threading
+
+#my modules
+import HardwareLayer
+
+
+
+class I2CBus:
+
+	RECONNECT_ATTEMPTS = 1  #number of times the bus is reopened after a lost handle
+	RECONNECT_ERRNOS = (errno.EBADF,errno.ENODEV,errno.ENXIO)  #errors that mean the handle or adapter is gone
+
+
+	def __init__(self,bus_number=1):
+		self.bus_number = bus_number
+		self.bus = None
+		self.lock = threading.RLock()  #only one transaction on the bus at a time
+
+		#Transaction timing
+		self.transaction_count = 0
+		self.error_count = 0
+		self.last_transaction_time = None   #seconds
+		self.max_transaction_time = 0.0
+		self.total_transaction_time = 0.0
+
+
+	def open(self):
+		"""Opens the bus if it isn't already open."""
+		with self.lock:
+			if self.bus is None:
+				self.bus = HardwareLayer.openSMBus(self.bus_number)
+
+
+	def close(self):
+		"""Closes the bus."""
+		with self.lock:
+			if self.bus is not None:
+				try:
+					self.bus.close()
+				except OSError:
+					pass
+				self.bus = None
+
+
+	def reconnect(self):
+		"""Closes and reopens the bus after a failure."""
+		print("Reconnecting to I2C bus {}.".format(self.bus_number))
+		self.close()
+		self.open()
+
+
+	def transaction(self,operation,*args,delay=0,isRepeatable=True):
+		"""Runs an SMBus method (e.g. 'write_i2c_block_data') with the given
+		arguments. The bus stays locked for the optional delay after the
+		transaction, so the next transaction can't start early. If
+		isRepeatable is False, the transaction is never sent a second time."""
+		with self.lock:
+			attempts = 0
+			while True:
+				start = time.perf_counter()
+				try:
+					self.open()
+					result = getattr(self.bus,operation)(*args)
+					break
+				except OSError as error:
+					self.error_count += 1
+					if error.errno not in self.RECONNECT_ERRNOS or attempts >= self.RECONNECT_ATTEMPTS:
+						raise #NAKs and bus errors are left to the caller
+					attempts += 1
+					self.reconnect()
+					if not isRepeatable:
+						raise
+				finally:
+					self.recordTiming(time.perf_counter() - start)
+
+			if delay:
+				time.sleep(delay)
+			return result
+
+
+	def recordTiming(self,duration):
+		"""Keeps track of how long transactions take."""
+		self.transaction_count += 1
+		self.last_transaction_time = duration
+		self.total_transaction_time += duration
+		if duration > self.max_transaction_time:
+			self.max_transaction_time = duration
+
+
+	def getTimingStats(self):
+		"""Returns a dictionary of transaction timing stats in milliseconds."""
+		with self.lock:
+			average = 0.0
+			if self.transaction_count:
+				average = self.total_transaction_time / self.transaction_count
+			return {"transactions":self.transaction_count,
+					"errors":self.error_count,
+					"last_ms":(self.last_transaction_time or 0.0)*1000,
+					"average_ms":average*1000,
+					"max_ms":self.max_transaction_time*1000}
+
+
+	def writeBlock(self,address,register,data,delay=0,isRepeatable=True):
+		"""Writes a block of bytes to a register of a device."""
+		return self.transaction("write_i2c_block_data",address,register,data,
+								delay=delay,isRepeatable=isRepeatable)
+
+
+	def writeByte(self,address,register,value,delay=0):
+		"""Writes one byte to a register of a device."""
+		return self.transaction("write_byte_data",address,register,value,delay=delay)
+
+
+	def readByte(self,address,register):
+		"""Reads one byte from a register of a device."""
+		return self.transaction("read_byte_data",address,register)
+
+
+	def readBlock(self,address,register,length):
+		"""Reads a block of bytes from a register of a device."""
+		return self.transaction("read_i2c_block_data",address,register,length)
@@ -20,7 +20,6 @@ import Inventory
 from EmbeddedKeyboard import EmbeddedKeyboard
 
 class InventoryManager:
-	MAX_ITEMS = 32 #cannot have more than 32 inventory items
 	#Labels for windows
 	NAME_LABEL_STR = "Item Name: {}"
 	VALVE_NUM_LABEL_STR= "Valve Number: {}"
@@ -118,7 +117,7 @@ class InventoryManager:
 			return #supporess empty listbox error
 		
 		if self.selected_item == "Add New/Replace Old":
-			if len(self.valve_numbers) >= self.MAX_ITEMS:
+			if len(self.valve_numbers) >= self.main_app.recipe_compiler.getNumValves(): #one item per valve on the boards
 				messagebox.showinfo("Exception:","Max limit of items reached.")
 			else: #can still add more items
 				self.add_new_flag = True
@@ -340,7 +339,7 @@ class InventoryManager:
 		#update inventory items			
 		self.main_app.inventory_items = self.main_app.collectInventoryInfo()
 		self.updateListbox()
-		self.main_app.updateDrinkMenu()
+		self.main_app.updateDrinkMenu(isInventoryEdit=True) #only recipes with changed valves are recompiled
 		self.top.destroy() #close editor
 		
 
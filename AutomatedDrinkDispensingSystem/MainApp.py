@@ -9,6 +9,14 @@ Note:
         >two arguments must be sent
             > when "enable" is sent as 1st arg, all peripheral devices are enabled
             > when "testing" is sent as the 2nd arg, the camera is not used
+        > when "text_menu" is sent, the drink menu is also exported as text (drink_menu.txt)
+        > when "simulate" is sent, simulated hardware (SimulatedHardware.py) is used instead of
+          RPi.GPIO, smbus2 & gpiozero, so the app runs off a Pi. Use with "enable" or "embed_en".
+            > "sim_speed=0.1" makes simulated pours 10 times faster
+            > "pulse_script=<path>" plays bill acceptor pulses from a script
+        > when "record=<path>" is sent, all pin & I2C traffic is written to a trace file (HardwareLayer.py)
+        > when "replay=<path>" is sent, a trace's pin edges & I2C reads are played back instead of
+          using hardware ("replay_speed=0.5" plays it twice as fast)
 """
 
 import os
@@ -21,7 +29,6 @@ main_path = (os.path.abspath(__file__)).replace("/MainApp.py","")
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 icon_path = "{}/resources/gui_images/martini.png".format(main_path)
 
-
 #Standard library imports
 import tkinter as tk
 from tkinter import ttk
@@ -29,21 +36,28 @@ from tkinter import font as tkFont
 
 import time
 import datetime
+import threading
 
 from subprocess import check_output
 import subprocess
 
 from threading import Timer
-import _thread as thread
 
 from cryptography.fernet import Fernet
 import http.server as hs
 import socketserver as ss
 
 #My Modules
+import HardwareLayer
 from CustomerWindow import CustomerWindow
 from EmployeeWindow import EmployeeWindow
-import DrinkProfile as     dp_class
+from DrinkCatalog import DrinkCatalog
+from SystemConfig import SystemConfig
+from RecipeCompiler import RecipeCompiler
+from RecipeSlotCache import RecipeSlotCache
+from PourTimeEstimator import PourTimeEstimator
+from BoardLayout import BoardLayout
+from OrderQueue import OrderQueue
 from Inventory import InventoryItem
 from LoginWindow    import LoginWindow
 from KeyboardWindow import KeyboardWindow
@@ -51,6 +65,7 @@ from KeyboardWindow import KeyboardWindow
 #Periphal Device classes
 from EmployeeSwitch import EmployeeSwitch
 from PulsePin import PulsePin
+from DeviceManager import DeviceManager
 from Camera import Camera
 from EmbeddedBoard import EmbeddedBoard
 
@@ -68,6 +83,7 @@ def runMainApplication():
     
     enableDevices = False
     enableEmbedBoard = False
+    enableTextMenu = False
     
     #checks command line arguments
     if len(sys.argv) > 1:
@@ -77,11 +93,22 @@ def runMainApplication():
                 enableDevices = True #if true is sent as a command line arg then enable devices
             if arg == "embed_en":
                 enableEmbedBoard = True
+            if arg == "text_menu":
+                enableTextMenu = True
+    
+    #the hardware backend (real, simulated, recording or replay) has to be picked before any device is created
+    simulated_hardware = None
+    if "simulate" in sys.argv:
+        import SimulatedHardware
+        simulated_hardware = SimulatedHardware.createFromArgs(sys.argv)
+    hardware_backend = HardwareLayer.setupFromArgs(sys.argv,simulated_hardware)
+    print("Hardware backend: {}".format(hardware_backend.name))
 
     style = ttk.Style()
     current_theme = style.theme_use('clam')  #sets up the clam style for all ttk widgets
     
-    main_app = MainApp(root,icon_img,enableDevices,enableEmbedBoard,style) 
+    main_app = MainApp(root,icon_img,enableDevices,enableEmbedBoard,style,enableTextMenu,
+                       simulated_hardware,hardware_backend)
 
     root.mainloop()                          #starts loop for displaying content
 
@@ -107,6 +134,14 @@ class MainApp:
     ENCRYPTION_KEY_FILE_PATH = "{}/key.txt".format(SYSTEM_INFO_PATH)
     INVENTORY_FILE_PATH = "{}/inventory_info.csv".format(SYSTEM_INFO_PATH)
     DRINK_MENU_FILE_PATH = "{}/drink_menu.txt".format(SYSTEM_INFO_PATH)
+    DRINK_MENU_BIN_FILE_PATH = "{}/drink_menu.bin".format(SYSTEM_INFO_PATH)
+    BOARD_MENU_RECORD_FILE_PATH = "{}/drink_menu_boards.json".format(SYSTEM_INFO_PATH) #digests of the menu on each board
+    DRINK_CATALOG_FILE_PATH = "{}/drink_catalog.json".format(SYSTEM_INFO_PATH)
+    ORDER_QUEUE_FILE_PATH = "{}/order_queue.json".format(SYSTEM_INFO_PATH)
+    RECIPE_SLOTS_FILE_PATH = "{}/recipe_slots.json".format(SYSTEM_INFO_PATH)
+    POUR_TIME_LOG_FILE_PATH = "{}/pour_times.csv".format(SYSTEM_INFO_PATH) #estimated & actual pour time of each drink
+    DRINK_SALES_PATH = "{}/drink_sales".format(SYSTEM_INFO_PATH)
+    EMBEDDED_BOARDS_FILE_PATH = "{}/embedded_boards.txt".format(SYSTEM_INFO_PATH)
     CASCADES_PATH = "{}/haar_cascade_files".format(OTHER_PATH)
     
     
@@ -114,8 +149,10 @@ class MainApp:
     
     #DEVICE CONFIGURATION
     BUTTON_ENABLE = True
-    DELAY = 2000         # button input will be polled every 2 seconds
-    AMOUNT_PAID = 0  # keeps track of how much a customer has paid; $0
+    UPLOAD_POLL_DELAY = 100  # drink menu upload progress is checked every 100 milliseconds
+    ORDER_PLACED_SCREEN_TIME = 3000 # milliseconds the "order placed" screen is shown
+    ORDER_STATUS_DELAY = 1000 # milliseconds between updates of the order ETA
+    DEVICE_INIT_TIMEOUTS = {"switch":5,"pulse_pin":5,"camera":15,"embedded_board":10} # seconds each device has to start
 
     drink_names = []             #keeps a record of drink names
 
@@ -123,13 +160,19 @@ class MainApp:
     isValidLogin = False         #controls whethere a user is given access to employee mode
     isWithoutLogin = False       #controls whether a new user login file is created
     data_demo_key = True         #toggles between pre-made shared data messages
+    isCheckingUpload = False     #True while drink menu upload progress is being shown
+    isShowingOrderStatus = False #True while the order ETA is being updated
 
     
     
-    def __init__(self,master,icon_img,peri_dev_enable=False,em_bd_enable=False,style=None):
+    def __init__(self,master,icon_img,peri_dev_enable=False,em_bd_enable=False,style=None,text_menu_enable=False,
+                 simulated_hardware=None,hardware_backend=None):
         
         self.master = master
         self.style= style # style used for ttk widgets
+        self.text_menu_enable = text_menu_enable #exports drink menu as text for debugging
+        self.simulated_hardware = simulated_hardware #None unless "simulate" was sent
+        self.hardware_backend = hardware_backend if hardware_backend is not None else HardwareLayer.getBackend()
         
         stored_color = self.retrieveBackgroundColor()
         if stored_color != self.MASTER_BACKGROUND_COLOR:
@@ -152,25 +195,43 @@ class MainApp:
         if self.isWithoutLogin == True:
             self.createDefaultUserLoginFile()             #creates a new user login file
 
+        self.config = SystemConfig(self.CONFIG_FILE_PATH)  #config file is kept in memory & written with commit()
+        self.drink_catalog = DrinkCatalog(self.DRINK_PROFILE_DIRECTORY_PATH,
+                                        self.DRINK_CATALOG_FILE_PATH,self.MAIN_DIRECTORY_PATH)
         self.active_drink_objects = self.getDrinks()      #returns a list of drink_objects for later use
         self.inventory_items = self.collectInventoryInfo()
+        self.board_layout = BoardLayout(self.EMBEDDED_BOARDS_FILE_PATH) #buses, addresses & registers of the embedded boards
+        self.recipe_compiler = RecipeCompiler(self.board_layout.getNumRegisters()) #compiled menu used by the drink menu file & embedded board
+        self.recipe_cache = RecipeSlotCache(self.RECIPE_SLOTS_FILE_PATH,self.DRINK_SALES_PATH,
+                                            self.recipe_compiler.NUM_RECIPES) #drinks kept in the boards' recipe slots
+        self.pour_estimator = PourTimeEstimator(self.recipe_compiler,self.board_layout,
+                                                self.POUR_TIME_LOG_FILE_PATH) #ETA of orders
+        if self.simulated_hardware is not None:
+            self.simulated_hardware.addBoards(self.board_layout)
         
         self.device_enable = peri_dev_enable
         self.embedded_board_enable = em_bd_enable
         
         #check args
-        if self.device_enable:
-            self.createDevices() #creates device instances for later use
-            self.initializeDrinkMenuOnEmbeddedBoard(self)
-        elif self.embedded_board_enable:
+        if self.embedded_board_enable and not self.device_enable:
             #if other devices off & want to still test embedded board
-            self.embedded_board = EmbeddedBoard(self)
-            self.embedded_board.initializeDrinkMenuOnBoard()
+            self.embedded_board = EmbeddedBoard(self,self.board_layout)
         self.updateDrinkMenu()
+        self.order_queue = OrderQueue(self,self.ORDER_QUEUE_FILE_PATH) #orders are poured one at a time
+        if self.device_enable:
+            self.createDevices() #devices are set up in the background & attached once ready
         self.createMainWindow()
+        if hasattr(self, 'embedded_board'):
+            self.initializeDrinkMenuOnEmbeddedBoard() #uploads in the background after the GUI is up
+        self.order_queue.dispatchNextOrder()              #resumes orders saved before a restart
+        if self.simulated_hardware is not None:
+            self.simulated_hardware.start()               #starts the simulated bill acceptor's pulse script
+        if self.hardware_backend.name == "replay":
+            self.hardware_backend.start()                 #plays the trace's pin edges
         self.retrieveHttpURL()
         self.retrieveConfigurationInformation()
         self.cleanOldDrinksFromConfig()
+        self.config.commit()                              #one write for all config changes at startup
 
 
     
@@ -255,6 +316,34 @@ class MainApp:
         self.employee_window = EmployeeWindow(self,isAdminMode)
 
 
+    def showOrderPickup(self,order):
+        """Shows the pick up screen for a finished order on the open window."""
+        window = None
+        if self.isEmployeeMode and hasattr(self, 'employee_window'):
+            window = self.employee_window
+        elif hasattr(self, 'customer_window'):
+            window = self.customer_window
+        
+        if window is None or not window.master.winfo_exists():
+            print("Order #{} is ready, but no window is open.".format(order["number"]))
+            return
+        window.setupDeliveryScreen(order)
+
+
+    def showOrderFailure(self,order):
+        """Tells the open window that an order couldn't be made."""
+        window = None
+        if self.isEmployeeMode and hasattr(self, 'employee_window'):
+            window = self.employee_window
+        elif hasattr(self, 'customer_window'):
+            window = self.customer_window
+        
+        if window is None or not window.master.winfo_exists():
+            print("Order #{} was not made, but no window is open.".format(order["number"]))
+            return
+        window.setupOrderFailureScreen(order)
+
+
     def launchLoginWindow(self):
         """Launches login window when employee mode is selected."""
         self.login_top_lvl = tk.Toplevel(self.master,background=self.MASTER_BACKGROUND_COLOR)
@@ -272,42 +361,14 @@ class MainApp:
     def getDrinks(self):
         """Retrieves a list of active Drink objects."""
         active_drinks = []
-        self.all_drinks = []
-
-        os.chdir(self.DRINK_PROFILE_DIRECTORY_PATH)
-        drink_profile_names = os.listdir(self.DRINK_PROFILE_DIRECTORY_PATH)
-
-        #removes the __pycache__ directory and __init__.py file that gets initiated in this directory
-        if "__pycache__" in drink_profile_names:
-            drink_profile_names.remove("__pycache__")
-        if "/__pycache__" in drink_profile_names:
-            drink_profile_names.remove("/__pycache__")
-        if "__init__.py" in drink_profile_names:
-            drink_profile_names.remove("__init__.py")
-        if "__init_.py" in drink_profile_names:
-            drink_profile_names.remove("__init_.py")
-        
-        for name in drink_profile_names:
-            path_builder = self.DRINK_PROFILE_DIRECTORY_PATH +"/"+ name
-            os.chdir(path_builder)
-
-            #finds index of text file in individual drink directory listings
-            text_file_index = 0
-            if ".txt" in os.listdir(path_builder)[0]:
-                pass
-            else:
-                text_file_index= 1
-
-            drink = dp_class.DrinkProfile("{}/{}".format(path_builder, os.listdir(path_builder)[text_file_index]),self.MAIN_DIRECTORY_PATH)
+        self.all_drinks = self.drink_catalog.loadDrinks() #compiled index is only rebuilt for changed profiles
 
+        for drink in self.all_drinks:
             if drink.isActive == "1":
                 drink.name = (drink.name).replace(" ","_")
-                drink.addDrinkToConfig()             #config file keeps record of active drinks
+                self.config.addActiveDrink(drink.name) #config file keeps record of active drinks
                 active_drinks.append(drink)          #creates a separate list for active drinks (drinks to be displayed)
 
-            self.all_drinks.append(drink)    #creates a list of active and inactive drinks
-
-        os.chdir(self.MAIN_DIRECTORY_PATH)
         return active_drinks
 
 
@@ -348,50 +409,27 @@ class MainApp:
     
     def retrieveConfigurationInformation(self):
         """Retrieves configuration info (e.g. drink names) from config file """
-        with open(self.CONFIG_FILE_PATH,'r+') as f:
-            lines = f.read().splitlines()
+        if self.config.isLocked():
+            self.isLocked = True
+            print("Config file is locked.\n\n")
+        else:
+            print("Config file is not locked.\n\n")
 
-            line_number = 1
-            for line in lines:
-                if line_number == 1:
-                    if line.split()[1] == '0':
-                        print("Config file is not locked.\n\n")
-                    else:
-                        self.isLocked = True
-                        print("Config file is locked.\n\n")
-                if line_number == 2:
-                    drinks = line.split(" ")
-                    for i in range(len(drinks)-1):
-                        self.drink_names.append(drinks[i+1])
-                line_number+=1
+        self.drink_names.extend(self.config.active_drink_list)
 
 
     def updateConfigurationFile(self,item_to_update,updated_value= None):
-        """ """
-        with open(self.CONFIG_FILE_PATH,"r+") as f:
-            lines = f.read().splitlines()
-            f.seek(0)
-
-            line_headers = ["locked ","active_drink_list ","system_status "]
-            line_to_edit = 0
-
-            if item_to_update == "data_lock":
-                line_to_edit = 1
-            if item_to_update == "drink_list":
-                line_to_edit = 2
-            if item_to_update == "system_status":
-                line_to_edit = 3
-
-            line_number = 1
-            for line in lines:
-                if line_number == line_to_edit and updated_value != None:
-                   line = line_headers[line_to_edit - 1] + updated_value
-                   f.write(line+"\n")
-                else:
-                    f.write(line+"\n")
-                if line_number == 3:
-                    break
-                line_number+=1
+        """Updates a config value in memory. Changes are written to the
+        config file with self.config.commit()."""
+        if updated_value is None:
+            return
+
+        if item_to_update == "data_lock":
+            self.config.setLocked(str(updated_value) != "0")
+        if item_to_update == "drink_list":
+            self.config.setActiveDrinkList(updated_value.split())
+        if item_to_update == "system_status":
+            self.config.setSystemStatus(updated_value)
 
 
     def cleanOldDrinksFromConfig(self):
@@ -416,7 +454,7 @@ class MainApp:
 
     def writeToDrinkSalesLog(self, message):
         """Writes time-stamped sales info into a log for each day."""
-        self.todays_drink_sales = "{}/drink_sales/drink_sales_{}.txt".format(self.SYSTEM_INFO_PATH , str( datetime.date.today() ) )
+        self.todays_drink_sales = "{}/drink_sales_{}.txt".format(self.DRINK_SALES_PATH , str( datetime.date.today() ) )
         with open(self.todays_drink_sales,"a+") as log:
             log.write("{} : {}\n".format( str( datetime.datetime.now() ) , message))
 
@@ -626,8 +664,8 @@ class MainApp:
 
     def startHTTPThread(self):
         """Creates a http server in a separate thread from the GUI in order to prevent delays in the GUI."""
-        thread.start_new_thread(self.startHTTPServer,tuple())
-        thread.start_new_thread(self.startNgrok,tuple())
+        threading.Thread(target=self.startHTTPServer,daemon=True).start()
+        threading.Thread(target=self.startNgrok,daemon=True).start()
  
         
     def startNgrok(self):
@@ -685,168 +723,176 @@ class MainApp:
 
     
     def createDevices(self):
-        """Instantiates all devices."""
-        
-        self.switch = EmployeeSwitch(self)  #pass main app instance
-        print("\n{} : {}".format(self.switch.name,self.switch.state))
-        self.checkButtonState()
-        
-        self.pulse_pin = PulsePin(self) 
-        print("\n{} : {}".format(self.pulse_pin.name,self.pulse_pin.state))
+        """Instantiates all devices at the same time with a DeviceManager, so
+        a slow or missing device doesn't hold up the others or the main window."""
+        self.device_manager = DeviceManager(self)
+        self.device_manager.addDevice("switch",lambda: EmployeeSwitch(self),  #pass main app instance
+                                      self.DEVICE_INIT_TIMEOUTS["switch"],
+                                      on_ready=lambda switch: switch.bindPressEvent())
+        self.device_manager.addDevice("pulse_pin",lambda: PulsePin(self),
+                                      self.DEVICE_INIT_TIMEOUTS["pulse_pin"])
         
-        self.camera = Camera(self)
-        print("\n{} : {}".format(self.camera.name,self.camera.state) )
-        
-        self.embedded_board = EmbeddedBoard(self)
-        print("\n{} : {}".format(self.embedded_board.name,self.embedded_board.state) )
-        print("\n")
+        if self.simulated_hardware is None:
+            self.device_manager.addDevice("camera",lambda: Camera(self),
+                                          self.DEVICE_INIT_TIMEOUTS["camera"])
         
+        self.device_manager.addDevice("embedded_board",lambda: EmbeddedBoard(self,self.board_layout),
+                                      self.DEVICE_INIT_TIMEOUTS["embedded_board"],
+                                      on_ready=self.startEmbeddedBoard,
+                                      on_failed=self.holdOrders)
+        self.device_manager.startAll()
+
+
+    def startEmbeddedBoard(self,embedded_board):
+        """Uploads the drink menu and resumes the order queue once the
+        embedded board is set up by the DeviceManager."""
+        self.initializeDrinkMenuOnEmbeddedBoard()
+        self.order_queue.dispatchNextOrder()
+
+
+    def holdOrders(self):
+        """Holds the order queue when the embedded board fails to start and
+        shows why in the main window."""
+        self.writeToLog("Embedded board did not start. Orders are on hold: " + self.device_manager.getHealthText())
+        self.startOrderStatusUpdates() #shows the error
 
-        
-    def checkButtonState(self):
-        """Recursively calls itself to check button state."""
-        self.switch.checkButtonInput()   #check pin input
-        self.master.after(self.DELAY,self.checkButtonState)
-    
         
     def initializeDrinkMenuOnEmbeddedBoard(self):
         """Acquire drink information for file and send to EmbeddedBoard device
-        for future use."""
+        for future use. The upload runs in a background thread, and its
+        progress is shown in the main window."""
         print("Starting initialization of drink menu")
-        self.embedded_board.initializeDrinkMenuOnBoard()
+        if not hasattr(self, 'upload_status_label'):
+            self.upload_status_label = ttk.Label(self.master,text="")
+            self.upload_status_label.pack()
+        
+        self.embedded_board.startMenuUpload() #only sends blocks that changed since the last upload
+        if not self.isCheckingUpload:
+            self.isCheckingUpload = True
+            self.master.after(self.UPLOAD_POLL_DELAY,self.checkMenuUploadProgress)
 
 
-    def updateDrinkMenu(self):
-        """Drink Menu file is updated when drink profile of a drink is changed
-        Notes:
-            Need to generate a string of pump times that corresponds to valves on
-            boards, so ingredients must be associated with valve numbers
-            
-            Need to convert ounces of ingredients to a pump time and then
-            make a comma delimited string that will be represent pump times
-            for each valve.
-            
-            Need to make unused valves get a value of 0.
-            
-            conversion between ounces to millimeters:
-            1 fluid Oz = 29.5753 milliliters
-            
-            Time resolution: 30/256 = 0.117 sec = 0.117 sec
-            
-            Calculation:
-              time_res = 30/256 #30 seconds divided by 256 (A byte max value)
-              milli_req = OZ_num * 29.5735 
-              pump_time = int(milli_req / time_res)
-              amount_of_fluid = pump_time * (500 / 60) #500 ml per sec pump speed
-        """
+    def checkMenuUploadProgress(self):
+        """Shows the progress of the drink menu upload until it is done."""
+        progress = None
+        while not self.embedded_board.upload_progress.empty():
+            progress = self.embedded_board.upload_progress.get_nowait()
         
-        #Constants
-        OZ_TO_ML_CONV = 29.5753 # 1 fluid Oz = 29.
-        MAX_TIME = 30 #pump will run for a max of 30 seconds
-        BIT_RES = 256
-        PUMP_SPEED_ML_PER_SEC = int(500/60) #rating of pump
-        #other pump speed may be:  PUMP_SPEED_ML_PER_SEC = int(1000/60) 
+        if progress is not None:
+            self.upload_status_label.configure(
+                text="Loading drink menu onto machine: {}/{}".format(progress[0],progress[1]))
         
-        #sort by id_number of drinks
-        self.active_drink_objects.sort(key=lambda x: x.id_number)
+        if self.embedded_board.isUploading() or not self.embedded_board.upload_progress.empty():
+            self.master.after(self.UPLOAD_POLL_DELAY,self.checkMenuUploadProgress)
+        else:
+            self.isCheckingUpload = False
+            report = self.embedded_board.upload_report
+            if report is not None and report["failed"]:
+                missing = ", ".join([str(recipe) for recipe in sorted(report["failed"])])
+                self.upload_status_label.configure(text="Drink menu loaded, except recipes: {}".format(missing))
+                self.writeToLog("Drink menu upload failed for recipes: {}".format(missing))
+            else:
+                self.upload_status_label.configure(text="Drink menu loaded.")
+                self.writeToLog("Drink menu uploaded to embedded board.")
+
+
+    def startOrderStatusUpdates(self):
+        """Shows the order ETA in the main window while there are orders."""
+        if not hasattr(self, 'order_status_label'):
+            self.order_status_label = ttk.Label(self.master,text="")
+            self.order_status_label.pack()
         
-        recipe_menu=[]
-        inventory_names_list = self.getInventoryItemNames()
-        print(inventory_names_list)
-        oz= 0
-        for recipe in self.active_drink_objects:
-            recipe_packet=[]
-            b1_r1=[0,0,0,0,0,0,0,0] #board 1, register 1
-            b1_r2=[0,0,0,0,0,0,0,0]
-            b2_r1=[0,0,0,0,0,0,0,0]
-            b2_r2=[0,0,0,0,0,0,0,0]
-            
-            count = 0 #index for ounces values for each ingredient
-            for ingredient in recipe.ingredients:
-                
-                inventory_id = inventory_names_list.index(ingredient.replace("_"," ").title())+1
-                print("Ingredient {} in {} has id {}.".format(ingredient,recipe.name,inventory_id))
-                #inventory ids start at 1
-                
-                if inventory_id <=8:
-                    print('ounces: {}'.format(recipe.ounces[count]))
-                    oz = float(recipe.ounces[count])
-                    pump_time = int(oz*OZ_TO_ML_CONV / (PUMP_SPEED_ML_PER_SEC *MAX_TIME/BIT_RES) )
-                    print("Pump time is {} /255".format(pump_time))
-                    b1_r1[inventory_id-1] = pump_time
-                elif inventory_id <=16:
-                    inventory_id = inventory_id-8
-                    print('ounces: {}'.format(recipe.ounces[count]))
-                    oz = float(recipe.ounces[count])
-                    pump_time = int(oz*OZ_TO_ML_CONV / (PUMP_SPEED_ML_PER_SEC *MAX_TIME/BIT_RES) )
-                    print("Pump time is {} /255".format(pump_time))
-                    b1_r2[inventory_id-1] = pump_time
-                elif inventory_id <=24:
-                    inventory_id = inventory_id-16
-                    oz = float(recipe.ounces[count])
-                    pump_time = int(oz*OZ_TO_ML_CONV / (PUMP_SPEED_ML_PER_SEC *MAX_TIME/BIT_RES) )
-                    b2_r1[inventory_id-1] = pump_time
-                elif inventory_id <=32:
-                    inventory_id = inventory_id-16
-                    oz =float(recipe.ounces[count])
-                    pump_time = int(oz*OZ_TO_ML_CONV / (PUMP_SPEED_ML_PER_SEC *MAX_TIME/BIT_RES) )
-                    b2_r2[inventory_id-1] = pump_time
-                
-                
-                count +=1
-            
-            recipe_packet.extend([b1_r1,b1_r2,b2_r1,b2_r2])
-            recipe_menu.append(recipe_packet)
+        if not self.isShowingOrderStatus:
+            self.isShowingOrderStatus = True
+            self.updateOrderStatus()
+
+
+    def updateOrderStatus(self):
+        """Updates the order ETA every second until the order queue is empty."""
+        if self.order_queue.isHeld():
+            self.order_status_label.configure(text="Error: The drink machine did not start. {} order(s) on hold.".format(
+                len(self.order_queue.orders)))
+            self.isShowingOrderStatus = False
+            return
+        if not self.order_queue.isBusy():
+            self.order_status_label.configure(text="")
+            self.isShowingOrderStatus = False
+            return
         
-        #populate the rest of the recipe menu
-        empty_reg=[0,0,0,0,0,0,0,0] #board 1, register 1
-        for i in range(24-len(self.active_drink_objects)):
-            empty_recipe=[]
-            for i in range(4):
-                empty_recipe.append(empty_reg)
-            recipe_menu.append(empty_recipe)
+        order_queue = self.order_queue
+        if order_queue.current_order is not None:
+            status = "Pouring order #{}: ready in about {}".format(order_queue.current_order["number"],
+                self.pour_estimator.formatTime(order_queue.getEstimatedWait(order_queue.current_order)))
+        else:
+            status = "Getting the next order ready"
+        if order_queue.orders:
+            status += " | {} more order(s), all ready in about {}".format(len(order_queue.orders),
+                self.pour_estimator.formatTime(order_queue.getEstimatedWait()))
+        self.order_status_label.configure(text=status)
+        self.master.after(self.ORDER_STATUS_DELAY,self.updateOrderStatus)
+
+
+    def updateDrinkMenu(self,edited_drink=None,isInventoryEdit=False):
+        """Drink Menu file is updated when drink profile of a drink is changed.
+        The RecipeCompiler converts the ounces of each ingredient into pump
+        times for the valve that holds that ingredient. Unused valves get a
+        value of 0.
+        
+        If edited_drink is given, only that drink's recipe is recompiled. If
+        isInventoryEdit is True, only recipes that use a changed valve are
+        recompiled.
         
+        Only the drinks in the boards' recipe slots are written to the drink
+        menu file; the other drinks are loaded when they are ordered."""
+        changed_slots = []
+        if isInventoryEdit:
+            self.recipe_compiler.updateValveLookup(self.inventory_items)
+        elif edited_drink is None or not self.recipe_compiler.recompileDrink(edited_drink):
+            #sort by id_number of drinks
+            self.active_drink_objects.sort(key=lambda x: x.id_number)
+            
+            self.recipe_compiler.buildValveLookup(self.inventory_items)
+            self.recipe_compiler.compileMenu(self.active_drink_objects)
+            changed_slots = self.recipe_cache.assignDrinks(self.active_drink_objects)
+        self.writeDrinkMenuFiles(changed_slots)
         
-        data = []
-        time1 = 0
-        time2 = 0
-        time3 = 0
-        time4 = 0
-        time5 = 0
-        time6 = 0
-        time7 = 0
-        time8 = 0
+        if hasattr(self, 'upload_status_label'):
+            self.initializeDrinkMenuOnEmbeddedBoard() #send changed recipes to the board
+
+
+    def writeDrinkMenuFiles(self,changed_slots=()):
+        """Writes the drinks in the recipe slots to the drink menu file. Slots
+        that got a different drink can't be ordered from until the board has it."""
+        slot_drink_ids = self.recipe_cache.slot_drinks
+        self.recipe_compiler.writeBinaryMenuFile(self.DRINK_MENU_BIN_FILE_PATH,slot_drink_ids)
+        if self.text_menu_enable:
+            self.recipe_compiler.writeDrinkMenuFile(self.DRINK_MENU_FILE_PATH,slot_drink_ids)
+        if changed_slots and hasattr(self, 'embedded_board'):
+            self.embedded_board.markSlotsStale(changed_slots)
+
+
+    def canFitOnBoard(self,drink_ids):
+        """Returns False if an order of these drinks has more different drinks
+        than the boards have recipe slots, so it could never be poured."""
+        return len(set(drink_ids)) <= self.recipe_cache.num_slots
+
+
+    def loadDrinksOnBoard(self,drink_ids):
+        """Puts the given drinks that aren't in a recipe slot into the slots of
+        the least popular drinks and uploads them. Returns False if they don't
+        all fit on the boards."""
+        changed_slots = []
+        for drink_id in drink_ids:
+            if self.recipe_cache.getSlot(drink_id) is None:
+                slot = self.recipe_cache.loadDrink(drink_id,drink_ids)
+                if slot is None:
+                    return False
+                changed_slots.append(slot)
         
-        with open(self.DRINK_MENU_FILE_PATH,"w+") as drink_menu:
-            for recipe_num in range(24):
-                for reg_num in range(4):
-                    if recipe_num >= len(recipe_menu):
-                        time1 = 0
-                        time2 = 0
-                        time3 = 0
-                        time4 = 0
-                        time5 = 0
-                        time6 = 0
-                        time7 = 0
-                        time8 = 0
-                    else:
-                        time1 = recipe_menu[recipe_num][reg_num][0]
-                        time2 = recipe_menu[recipe_num][reg_num][1]
-                        time3 = recipe_menu[recipe_num][reg_num][2]
-                        time4 = recipe_menu[recipe_num][reg_num][3]
-                        time5 = recipe_menu[recipe_num][reg_num][4]
-                        time6 = recipe_menu[recipe_num][reg_num][5]
-                        time7 = recipe_menu[recipe_num][reg_num][6]
-                        time8 = recipe_menu[recipe_num][reg_num][7]
-
-                    
-                    data_out = [recipe_num,time1,time2,time3,time4,time5,time6,time7,time8,reg_num]
-                    data_out_s = [str(x) for x in data_out]
-                    data.append(",".join(data_out_s)+"\n")
-
-
-            print(data)
-            drink_menu.writelines(data)
+        if changed_slots:
+            self.writeDrinkMenuFiles(changed_slots)
+            self.initializeDrinkMenuOnEmbeddedBoard() #only the changed slots are sent
+        return True
 
 
 if __name__ == "__main__":
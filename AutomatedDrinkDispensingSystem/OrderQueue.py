@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the OrderQueue class, which sits between the
+app windows and the EmbeddedBoard. Windows add orders to the queue and go
+straight back to the drink options, while the queue sends the orders to the
+board one at a time (oldest first) whenever the board is ready.
+
+Note:
+    - The queue is saved to a JSON file after every change, so waiting orders
+    survive a restart. An order that was being poured when the app stopped
+    is logged and not poured again.
+    - Dispatch runs on the GUI thread. The wait for the board's ready pin and
+    the order itself run on the EmbeddedBoard's driver, which calls back on
+    the GUI thread when the drink is done.
+    - Without an embedded board, a pour is simulated with a timer that runs
+    as long as the order's estimated pour time. If the devices are enabled
+    but the board failed to start, the queue is held instead, so no order is
+    called ready without being poured.
+    - The PourTimeEstimator gives the ETA of each order, and how long the
+    board has to be ready for, and to finish, an item before the order is
+    given up on. The board is halted when that happens. The actual
+    time of each poured item is logged next to its estimate.
+    - Drinks that aren't in one of the boards' recipe slots are loaded into
+    a slot (see RecipeSlotCache) when their order is next in line.
+    - An order is a list of items (drink & quantity), so a round of different
+    drinks is sent to the board as one batch. Each item is marked done as
+    the board finishes it.
+    - An order that was never sent (the board wasn't ready, or the write
+    failed) goes back to the front of the queue and its unfinished items are
+    sent again, up to MAX_ORDER_ATTEMPTS times. An order the board got but
+    didn't finish isn't sent again, since part of it may have been poured:
+    the board is halted. Either way, a failed order tells the customer to
+    ask an employee for help.
+"""
+
+import os
+import json
+import time
+from collections import deque
+
+
+class OrderQueue:
+
+    MIN_SIMULATED_POUR_TIME = 1000  #milliseconds a pour takes at least when no embedded board is connected
+    MAX_ORDER_ATTEMPTS = 3          #times an order is sent to the board before it is given up on
+    RETRY_DELAY = 1000              #milliseconds before a failed order is sent again
+
+    def __init__(self,main_app,queue_file_path):
+        self.main_app = main_app
+        self.queue_file_path = queue_file_path
+
+        self.orders = deque()       #orders waiting to be poured, oldest first
+        self.current_order = None   #order being poured
+        self.pour_future = None     #driver operation of the current order
+        self.pour_start = None      #time.monotonic() when the current order was started
+        self.item_start = None      #time.monotonic() when the current item was started
+        self.current_estimate = 0.0 #estimated seconds of the current order
+        self.next_order_number = 1
+        self.isDispatchScheduled = False
+
+        self.loadQueue()
+
+
+    def loadQueue(self):
+        """Reads the saved queue from file."""
+        try:
+            with open(self.queue_file_path,"r") as queue_file:
+                saved_queue = json.load(queue_file)
+        except (OSError,ValueError):
+            return
+
+        self.next_order_number = saved_queue.get("next_order_number",1)
+        self.orders = deque(saved_queue.get("orders",[]))
+        for order in self.orders:
+            if "items" not in order: #saved before orders had items
+                order["items"] = [{"drink_id":order["drink_id"],"drink_name":order["drink_name"],
+                                   "quantity":order["quantity"],"isDone":False}]
+
+        interrupted_order = saved_queue.get("current_order")
+        if interrupted_order is not None:
+            #the board may have poured part of it, so it isn't sent again
+            self.main_app.writeToLog("Order #{} ({}) was interrupted.".format(
+                interrupted_order["number"],interrupted_order["drink_name"]))
+            self.saveQueue()
+
+
+    def saveQueue(self):
+        """Writes the queue to a temporary file and swaps it into place."""
+        saved_queue = {"next_order_number":self.next_order_number,
+                       "current_order":self.current_order,
+                       "orders":list(self.orders)}
+
+        temp_path = self.queue_file_path + ".tmp"
+        with open(temp_path,"w") as queue_file:
+            json.dump(saved_queue,queue_file)
+        os.replace(temp_path,self.queue_file_path)
+
+
+    def addOrder(self,drink,quantity=1):
+        """Adds an order of one drink to the back of the queue and returns it."""
+        return self.addBatchOrder([(drink,quantity)])
+
+
+    def addBatchOrder(self,drink_quantities):
+        """Adds an order of several drinks, given as (drink, quantity) pairs,
+        to the back of the queue and returns it. The drinks are poured as one
+        batch."""
+        items = []
+        for drink, quantity in drink_quantities:
+            items.append({"drink_id":int(drink.id_number),
+                          "drink_name":drink.name.replace("_"," "),
+                          "quantity":int(quantity),
+                          "isDone":False})
+        order = {"number":self.next_order_number,
+                 "items":items,
+                 "drink_name":items[0]["drink_name"] if len(items) == 1 else self.getItemSummary(items),
+                 "quantity":sum([item["quantity"] for item in items]),
+                 "time":time.time()}
+        self.next_order_number += 1
+        self.orders.append(order)
+        self.saveQueue()
+
+        print("Order #{} queued: {}".format(order["number"],self.getOrderText(order)))
+        if not self.isDispatchScheduled:
+            self.dispatchNextOrder()
+        return order
+
+
+    def getItemSummary(self,items):
+        """Returns the drinks of an order as text, e.g. 'margarita x2, mojito'."""
+        names = []
+        for item in items:
+            if item["quantity"] == 1:
+                names.append(item["drink_name"])
+            else:
+                names.append("{} x{}".format(item["drink_name"],item["quantity"]))
+        return ", ".join(names)
+
+
+    def getOrderText(self,order):
+        """Returns the drinks of an order as text for the log."""
+        if len(order["items"]) == 1:
+            return "{} x{}".format(order["drink_name"],order["quantity"])
+        return order["drink_name"]
+
+
+    def getEstimatedWait(self,order=None):
+        """Returns the estimated seconds until an order (by default, the last
+        order in the queue) is ready."""
+        if order is not None and order is not self.current_order and order not in self.orders:
+            return 0.0 #already poured
+        estimator = self.main_app.pour_estimator
+        wait = 0.0
+        if self.current_order is not None:
+            wait = max(0.0,self.current_estimate - (time.monotonic() - self.pour_start))
+            if self.current_order is order:
+                return wait
+        for queued_order in self.orders:
+            wait += estimator.estimateOrder(queued_order)
+            if queued_order is order:
+                break
+        return wait
+
+
+    def getOrdersAhead(self,order):
+        """Returns how many orders will be poured before the given order."""
+        count = 0 if self.current_order is None else 1
+        for queued_order in self.orders:
+            if queued_order is order:
+                return count
+            count += 1
+        return 0
+
+
+    def isHeld(self):
+        """Returns True if orders can't be poured because the embedded board
+        failed to start."""
+        return hasattr(self.main_app, 'device_manager') and self.main_app.device_manager.hasFailed("embedded_board")
+
+
+    def isBusy(self):
+        """Returns True if an order is being poured or waiting to be poured."""
+        return self.current_order is not None or len(self.orders) > 0
+
+
+    def dispatchNextOrder(self):
+        """Starts the oldest order if nothing is being poured. The order waits
+        until its recipe is on the board and the board is ready."""
+        self.isDispatchScheduled = False
+        if self.current_order is not None or not self.orders:
+            return
+        if hasattr(self.main_app, 'device_manager') and self.main_app.device_manager.isStarting("embedded_board"):
+            return #dispatched once the board is set up
+        if self.isHeld():
+            return #kept in the queue, since nothing can pour them
+
+        if hasattr(self.main_app, 'embedded_board'):
+            board = self.main_app.embedded_board
+            drink_ids = [item["drink_id"] for item in self.orders[0]["items"]]
+            if not self.main_app.loadDrinksOnBoard(drink_ids):
+                self.failOrder(self.orders.popleft(),"has more drinks than the boards have recipe slots")
+                self.dispatchNextOrder()
+                return
+            for drink_id in drink_ids:
+                if not board.isRecipeUploaded(drink_id):
+                    self.scheduleDispatch(self.main_app.UPLOAD_POLL_DELAY) #recipe is still being uploaded
+                    return
+            self.startCurrentOrder()
+            self.sendCurrentOrder()
+        else:
+            self.startCurrentOrder()
+            pour_time = max(int(self.current_estimate*1000),self.MIN_SIMULATED_POUR_TIME)
+            self.main_app.master.after(pour_time,self.completeCurrentOrder)
+
+
+    def startCurrentOrder(self):
+        """Makes the oldest order the current order and counts its drinks
+        towards their popularity."""
+        self.current_order = self.orders.popleft()
+        self.saveQueue()
+        if not self.current_order.get("attempts"): #a retried order was already counted
+            for item in self.current_order["items"]:
+                self.main_app.recipe_cache.recordUse(item["drink_id"],item["quantity"])
+        self.current_estimate = self.main_app.pour_estimator.estimateOrder(self.current_order)
+        self.pour_start = time.monotonic()
+        self.item_start = self.pour_start
+
+
+    def scheduleDispatch(self,delay):
+        """Calls dispatchNextOrder after a delay (milliseconds), once."""
+        if not self.isDispatchScheduled:
+            self.isDispatchScheduled = True
+            self.main_app.master.after(delay,self.dispatchNextOrder)
+
+
+    def sendCurrentOrder(self):
+        """Sends the (recipe slot, quantity) pairs of the unfinished items of
+        the current order to the embedded board as one batch once it is ready.
+        See EmbeddedBoard.packOrderFrames for the order data format."""
+        order = self.current_order
+        driver = self.main_app.embedded_board.driver
+        board = self.main_app.embedded_board
+        pending = [index for index in range(len(order["items"])) if not order["items"][index]["isDone"]]
+        pairs = [(board.getRecipeSlot(order["items"][index]["drink_id"]),order["items"][index]["quantity"])
+                 for index in pending]
+
+        timeout = self.main_app.pour_estimator.getTimeout(order)
+
+        print("Sending order #{} (estimated {:.1f} s).".format(order["number"],self.current_estimate))
+        self.pour_future = driver.submit(driver.pourBatch(pairs,timeout,
+                                         item_callback=lambda index: self.finishItem(pending[index])),
+                                         self.finishPour)
+
+
+    def finishItem(self,index):
+        """Called on the GUI thread when the board has finished one item of
+        the current order."""
+        order = self.current_order
+        if order is None:
+            return
+        item = order["items"][index]
+        item["isDone"] = True
+        self.saveQueue()
+
+        now = time.monotonic()
+        estimator = self.main_app.pour_estimator
+        estimator.recordPour(order,item,estimator.estimateItem(item),now - self.item_start)
+        self.item_start = now
+        if len(order["items"]) > 1:
+            self.main_app.writeToLog("Order #{}: {} x{} is done.".format(
+                order["number"],item["drink_name"],item["quantity"]))
+
+
+    def finishPour(self,future):
+        """Called on the GUI thread when the driver is done with the current order."""
+        self.pour_future = None
+        order = self.current_order
+        driver = self.main_app.embedded_board.driver
+        if all([item["isDone"] for item in order["items"]]):
+            self.completeCurrentOrder()
+            return
+
+        if future.cancelled():
+            print("Order #{} was cancelled.".format(order["number"]))
+            result = driver.POUR_NOT_FINISHED #may have been sent
+        elif future.exception() is not None:
+            print("Error: Not able to send order #{}: {!r}".format(order["number"],future.exception()))
+            result = driver.POUR_NOT_FINISHED
+        else:
+            result = future.result()
+        if result == driver.POUR_DONE:
+            self.completeCurrentOrder()
+            return
+
+        self.current_order = None
+        order["attempts"] = order.get("attempts",0) + 1
+        if result == driver.POUR_NOT_SENT and order["attempts"] < self.MAX_ORDER_ATTEMPTS:
+            self.main_app.writeToLog("Order #{} ({}) was not sent. Trying again ({} of {}).".format(
+                order["number"],order["drink_name"],order["attempts"]+1,self.MAX_ORDER_ATTEMPTS))
+            self.orders.appendleft(order) #unfinished items are sent again
+            self.saveQueue()
+            self.scheduleDispatch(self.RETRY_DELAY)
+            return
+
+        if result == driver.POUR_NOT_SENT:
+            self.failOrder(order,"was not sent after {} attempts".format(order["attempts"]))
+        else:
+            print("Error: The board didn't finish order #{} in time.".format(order["number"]))
+            try:
+                self.main_app.embedded_board.sendHaltCommand() #stops the stuck pour
+            except OSError:
+                self.main_app.writeToLog("Not able to halt the board after order #{}.".format(order["number"]))
+            self.failOrder(order,"was not finished by the board")
+        self.dispatchNextOrder()
+
+
+    def failOrder(self,order,reason):
+        """Marks an order that won't be made as failed, logs why and tells the
+        customer to ask an employee for help."""
+        order["isFailed"] = True
+        self.saveQueue()
+        self.main_app.writeToLog("Order #{} ({}) {}.".format(order["number"],order["drink_name"],reason))
+        self.main_app.showOrderFailure(order)
+
+
+    def completeCurrentOrder(self):
+        """Finishes the current order, tells the customer to pick it up, and
+        starts the next order."""
+        order = self.current_order
+        self.current_order = None
+        self.saveQueue()
+
+        self.main_app.writeToLog("Order #{} ({}) is ready.".format(
+            order["number"],self.getOrderText(order)))
+        self.main_app.showOrderPickup(order)
+        self.dispatchNextOrder()
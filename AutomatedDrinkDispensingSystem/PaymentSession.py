@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the PaymentSession class, which takes the payment
+for a customer's order from the bill acceptor. The session shows the remaining
+balance in a small window, and it is moved along by the bills of the PulsePin
+instead of by the customer closing message boxes, so the drink options stay
+usable and the order is placed as soon as the price is paid.
+
+Note:
+    - Bills arrive in the PulsePin's decoder thread. They are put in a queue
+    and handled in the Tk thread, which checks the queue every POLL_DELAY.
+    - The session times out after PAYMENT_TIMEOUT seconds without a bill, and
+    the customer can cancel it. Money that was already inserted is logged,
+    since the bill acceptor can't give it back. For the same reason, money
+    paid over the price is logged with the order it was paid for.
+    - After the session ends, it keeps listening until the bill being
+    inserted (if any) is credited, and logs what came in late.
+    - States: "waiting" -> "paid" | "cancelled" | "timed out"
+"""
+
+from tkinter import ttk
+import tkinter as tk
+
+import queue
+import time
+
+
+class PaymentSession:
+
+    POLL_DELAY = 50          #milliseconds between checks for new bills
+    PAYMENT_TIMEOUT = 60     #seconds without a bill before the session is cancelled
+
+    def __init__(self,main_app,price,on_paid,on_cancel=None,parent=None):
+        self.main_app = main_app
+        self.price = float(price)
+        self.on_paid = on_paid          #called in the Tk thread once the price is paid
+        self.on_cancel = on_cancel      #called in the Tk thread if the session is cancelled or times out
+        self.parent = parent if parent is not None else main_app.master
+        self.pulse_pin = main_app.pulse_pin
+
+        self.state = "waiting"
+        self.amount_paid = 0.0
+        self.amounts = queue.Queue()    #dollars of each bill, from the decoder thread
+        self.start_time = None
+        self.last_payment_time = None
+
+
+    def start(self):
+        """Shows the balance window and starts listening to the bill acceptor."""
+        self.start_time = time.time()
+        self.last_payment_time = self.start_time
+        self.createBalanceWindow()
+
+        self.pulse_pin.pulse_count = 0
+        self.pulse_pin.listener = self.amounts.put
+        self.pulse_pin.detectPulseEvent() #enable detection of money
+        self.pulse_pin.state = "enabled"
+        self.main_app.master.after(self.POLL_DELAY,self.checkPayments)
+
+
+    def createBalanceWindow(self):
+        """Creates the window with the remaining balance & a cancel button."""
+        background = self.main_app.MASTER_BACKGROUND_COLOR
+        self.top = tk.Toplevel(self.parent,background=background)
+        self.top.title("Payment")
+        self.top.attributes('-topmost',True)
+        self.top.protocol("WM_DELETE_WINDOW",self.cancel)
+
+        ttk.Label(self.top,text="Insert cash into the bill acceptor.",
+                  font=('Helvetica',20,"bold")).pack(padx=20,pady=10)
+        self.balance_label = ttk.Label(self.top,text="",font=('Helvetica',28,"bold"))
+        self.balance_label.pack(padx=20,pady=10)
+        self.timeout_label = ttk.Label(self.top,text="",font=('Helvetica',14))
+        self.timeout_label.pack(padx=20)
+        ttk.Button(self.top,text="Cancel",command=self.cancel).pack(pady=10)
+        self.updateBalanceWindow()
+
+
+    def getRemaining(self):
+        """Returns the dollars that are left to pay."""
+        return max(self.price - self.amount_paid,0.0)
+
+
+    def getTimeLeft(self):
+        """Returns the seconds left before the session times out."""
+        return max(self.PAYMENT_TIMEOUT - (time.time() - self.last_payment_time),0.0)
+
+
+    def updateBalanceWindow(self):
+        """Shows the remaining balance & the time left."""
+        self.balance_label.configure(text="You owe: $%.2f" % self.getRemaining())
+        self.timeout_label.configure(text="Cancelled in {} seconds without payment.".format(int(self.getTimeLeft())))
+
+
+    def checkPayments(self):
+        """Adds up the amounts inserted since the last check, and ends the
+        session once the price is paid or the time is up."""
+        if self.state != "waiting":
+            return
+
+        isPaymentMade = False
+        while not self.amounts.empty():
+            self.amount_paid += self.amounts.get_nowait()
+            isPaymentMade = True
+        if isPaymentMade:
+            self.last_payment_time = time.time()
+
+        if self.amount_paid >= self.price:
+            self.finish("paid")
+            return
+        if self.getTimeLeft() <= 0:
+            self.finish("timed out")
+            return
+
+        self.updateBalanceWindow()
+        self.main_app.master.after(self.POLL_DELAY,self.checkPayments)
+
+
+    def cancel(self):
+        """Cancels the session (cancel button or window closed)."""
+        if self.state == "waiting":
+            self.finish("cancelled")
+
+
+    def finish(self,state):
+        """Closes the balance window and hands the order off (or tells the
+        customer why it was not placed). The bill acceptor is let go once
+        any bill being inserted is credited."""
+        self.state = state
+        self.main_app.master.after(self.POLL_DELAY,self.releasePulsePin)
+        if self.top.winfo_exists():
+            self.top.destroy()
+
+        duration = time.time() - self.start_time
+        if state == "paid":
+            self.main_app.writeToLog("Payment of ${:.2f} received in {:.1f} seconds.".format(self.amount_paid,duration))
+            self.on_paid(self)
+            return
+
+        if self.amount_paid > 0:
+            self.main_app.writeToLog("Payment {} after ${:.2f} of ${:.2f} was inserted.".format(
+                state,self.amount_paid,self.price))
+        else:
+            print("Payment {}.".format(state))
+        if self.on_cancel is not None:
+            self.on_cancel(self)
+
+
+    def logOverpayment(self,order):
+        """Logs the money paid over the price once the order is placed."""
+        excess = round(self.amount_paid - self.price,2)
+        if excess > 0:
+            self.main_app.writeToLog("Order #{} was overpaid: price ${:.2f}, paid ${:.2f}, excess ${:.2f}.".format(
+                order["number"],self.price,self.amount_paid,excess))
+
+
+    def releasePulsePin(self):
+        """Stops listening to the bill acceptor once no bill is being
+        inserted, and logs the money that came in after the session ended."""
+        if self.pulse_pin.isBurstPending():
+            self.main_app.master.after(self.POLL_DELAY,self.releasePulsePin)
+            return
+
+        if self.pulse_pin.listener == self.amounts.put: #not taken over by a newer session
+            self.pulse_pin.listener = None
+            self.pulse_pin.disablePulseEvent()
+            self.pulse_pin.state = "off"
+            self.pulse_pin.pulse_count = 0
+
+        late_amount = 0.0
+        while not self.amounts.empty():
+            late_amount += self.amounts.get_nowait()
+        if late_amount > 0:
+            self.main_app.writeToLog("${:.2f} was inserted after the payment was {}.".format(late_amount,self.state))
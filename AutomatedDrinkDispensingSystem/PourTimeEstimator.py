@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the PourTimeEstimator class, which estimates how
+long an order takes to pour from the compiled pump times of its drinks. The
+estimates are used for the ETA of orders and for how long the board is given
+to finish an order. Observed pour times are logged next to the estimates, so
+the model can be checked against the machine.
+
+Note:
+    - Valves of one register open together, so a register takes as long as
+    its longest pump time. Registers of a board also run together unless
+    REGISTERS_IN_PARALLEL is False, in which case they run one after another.
+    Boards pour at the same time, so a drink takes as long as its slowest board.
+    - A quantity of n is poured as n drinks in a row.
+    - Pump times are in units of MAX_TIME/BIT_RES seconds (30/256).
+"""
+
+import os
+import datetime
+
+
+class PourTimeEstimator:
+
+    REGISTERS_IN_PARALLEL = True   #False if a board runs its registers one after another
+    DRINK_OVERHEAD = 0.0           #seconds the board takes between drinks, besides pumping
+    DEFAULT_POUR_TIME = 5.0        #seconds for a drink that isn't in the compiled menu
+    TIMEOUT_FACTOR = 3             #a drink that takes longer than this many estimates (plus the margin) is stuck
+    TIMEOUT_MARGIN = 30.0          #seconds
+    LOG_HEADER = "time,order,drink_id,quantity,estimated_s,actual_s\n"
+
+    def __init__(self,recipe_compiler,board_layout,log_file_path=None):
+        self.recipe_compiler = recipe_compiler
+        self.board_layout = board_layout
+        self.log_file_path = log_file_path
+        self.time_resolution = recipe_compiler.MAX_TIME / recipe_compiler.BIT_RES  #seconds per pump time unit
+        self.observed_pours = []   #(estimated seconds, actual seconds) of drinks poured since start up
+
+
+    def estimateRecipe(self,drink_id):
+        """Returns the seconds that one drink of a recipe takes to pour."""
+        row = self.recipe_compiler.drink_rows.get(int(drink_id))
+        if row is None:
+            return self.DEFAULT_POUR_TIME
+        register_times = self.recipe_compiler.menu_array[row].max(axis=1) #valves of a register open together
+
+        board_times = []
+        for board in self.board_layout.boards:
+            first = board["first_register"]
+            times = register_times[first:first+board["registers"]]
+            if self.REGISTERS_IN_PARALLEL:
+                board_times.append(int(times.max()) if len(times) else 0)
+            else:
+                board_times.append(int(times.sum()))
+        return max(board_times) * self.time_resolution + self.DRINK_OVERHEAD
+
+
+    def estimateItem(self,item):
+        """Returns the seconds that an order item (drink id & quantity) takes."""
+        return self.estimateRecipe(item["drink_id"]) * item["quantity"]
+
+
+    def estimateOrder(self,order):
+        """Returns the seconds that the unfinished items of an order take to pour."""
+        return sum([self.estimateItem(item) for item in order["items"] if not item["isDone"]])
+
+
+    def getTimeout(self,order):
+        """Returns the seconds the board is given to finish any one item of an
+        order before it is treated as stuck."""
+        longest = max([self.estimateItem(item) for item in order["items"]])
+        return longest * self.TIMEOUT_FACTOR + self.TIMEOUT_MARGIN
+
+
+    def formatTime(self,seconds):
+        """Returns seconds as minutes & seconds, e.g. '1:05'."""
+        seconds = int(round(seconds))
+        return "{}:{:02d}".format(seconds // 60,seconds % 60)
+
+
+    def recordPour(self,order,item,estimated,actual):
+        """Keeps the estimated & actual seconds of a poured item and adds them
+        to the pour time log."""
+        self.observed_pours.append((estimated,actual))
+        if self.log_file_path is None:
+            return
+
+        isNewLog = not os.path.exists(self.log_file_path)
+        with open(self.log_file_path,"a") as log:
+            if isNewLog:
+                log.write(self.LOG_HEADER)
+            log.write("{},{},{},{},{:.2f},{:.2f}\n".format(datetime.datetime.now(),order["number"],
+                      item["drink_id"],item["quantity"],estimated,actual))
+
+
+    def getAccuracyStats(self):
+        """Returns how the estimates compare to the observed pour times."""
+        if not self.observed_pours:
+            return {"pours":0}
+        errors = [actual - estimated for estimated, actual in self.observed_pours]
+        return {"pours":len(self.observed_pours),
+                "average_error_s":sum(errors)/len(errors),
+                "max_error_s":max(errors,key=abs),
+                "estimated_s":sum([estimated for estimated, actual in self.observed_pours]),
+                "actual_s":sum([actual for estimated, actual in self.observed_pours])}
@@ -2,63 +2,193 @@
 
 """
 Programmer: Chris Blanks
-Last Edited: Feb 2019
+Last Edited: October 2026
 Project: Automated Self-Serving System
 Purpose: This script defines the PulsePin class, which reads the pulsating
 output of a MEI bill acceptor. The output from the bill acceptor is formed
-by a open-collector circuit, so this requires a pull-up resistor on the 
+by a open-collector circuit, so this requires a pull-up resistor on the
 RasPi input, attaching the ground wire of the bill acceptor to the Raspi's ground,
 and reading a falling edge to find out how much money has been
 inserted into the bill acceptor. Also a software debounce was used to reduce
 false-positives.
+
+Note:
+  >	A bill is sent as a burst of pulses (one pulse per dollar by default).
+	The GPIO callback only writes the time of each falling edge into a ring
+	buffer, so it never blocks and no edge is lost while bills are decoded.
+  >	A decoder thread reads the ring buffer and groups the pulses into bursts.
+	A burst ends when no pulse arrives for BURST_GAP seconds, and it is
+	credited as one bill. Edges closer than DEBOUNCE_TIME are bounces.
+  >	The ring buffer has one writer (the GPIO thread) and one reader (the
+	decoder thread). ring_lock is held while an edge is written and while
+	the reader copies the new pulses and moves read_index, which is only
+	a few list operations, so the callback is never held up for long. If
+	the reader falls more than RING_SIZE pulses behind, the oldest pulses
+	are counted as dropped.
+  >	A listener (e.g. a PaymentSession) can be set to be told about each bill.
+	It is called from the decoder thread, so it must not touch Tk widgets.
+	A bill that comes in with no listener is written to the log, so no
+	inserted money goes unrecorded.
 """
 
-import RPi.GPIO as GPIO
+import threading
+import time
 
 #my modules
+import HardwareLayer
 from PeripheralDevice import PeripheralDevice
 
 class PulsePin(PeripheralDevice):
 	"""Sets up the GPIO #21 (BCM) for reading pulses from a bill acceptor."""
 	PULSE_PIN = 21
-	BOUNCE_TIME = 100
-	
-	
+	BOUNCE_TIME = 20         #milliseconds; short enough for fast pulse mode (50 ms on / 50 ms off)
+	DEBOUNCE_TIME = 0.02     #seconds; edges closer than this are bounces
+	BURST_GAP = 0.5          #seconds without a pulse that end a bill's burst
+	RING_SIZE = 256          #pulse times kept for the decoder
+	DOLLARS_PER_PULSE = 1.0  #MEI bill acceptors send one pulse per dollar by default
+	DENOMINATIONS = (1,2,5,10,20,50,100)  #bills the acceptor takes, in dollars
+
+
 	def __init__(self,main_app_instance):
 		super().__init__(main_app_instance)
-		
+
 		self.name = "PulsePinForBillAcceptor"
 		self.state = "enabled"
 		self.pin_number = self.PULSE_PIN
-		
+
 		self.pulse_count = 0
-		GPIO.setmode(GPIO.BCM)
-		GPIO.setwarnings(False) #prevents unecessary warnings
-		GPIO.setup(self.PULSE_PIN,GPIO.IN,pull_up_down=GPIO.PUD_UP) 
+		self.listener = None  #called with the amount (dollars) of each bill
+
+		self.pulse_times = [0.0] * self.RING_SIZE  #ring buffer of falling edge times
+		self.write_index = 0    #only moved by the GPIO callback
+		self.read_index = 0     #only moved by the decoder thread
+		self.credited_index = 0 #write_index up to which pulses were credited as bills
+		self.ring_lock = threading.Lock() #guards the ring buffer & its indexes
+		self.pulse_event = threading.Event()
+		self.decoder_thread = None
+		self.isDetecting = False
+
+		self.bills = []             #(dollars, pulses) of bills decoded since start up
+		self.decode_latencies = []  #seconds from the end of a burst to the bill being credited
+		self.dropped_pulses = 0
+		self.bounces = 0
+
+		self.gpio = HardwareLayer.getGPIO()
+		self.gpio.setmode(self.gpio.BCM)
+		self.gpio.setwarnings(False) #prevents unecessary warnings
+		self.gpio.setup(self.PULSE_PIN,self.gpio.IN,pull_up_down=self.gpio.PUD_UP)
 		#setup pulse pin as input & add pull-up circuit++
-	
-	
+
+
 	def __del__(self):
 		print("Removing pin code.")
-		GPIO.cleanup() #clears pins
+		self.gpio.cleanup() #clears pins
 
 
 	def detectPulseEvent(self):
 		"""Detects whenever a falling edge happens on the PULSE_PIN and
 		 sets a callback functions """
-		GPIO.add_event_detect(self.PULSE_PIN,GPIO.FALLING,bouncetime=self.BOUNCE_TIME
+		if self.decoder_thread is None:
+			self.decoder_thread = threading.Thread(target=self.runDecoder,daemon=True)
+			self.decoder_thread.start()
+		if self.isDetecting:
+			return #already on, e.g. while the last payment is drained
+		self.isDetecting = True
+		self.gpio.add_event_detect(self.PULSE_PIN,self.gpio.FALLING,bouncetime=self.BOUNCE_TIME
 							,callback= self.pulseCallback)
-			
-		
+
+
 	def pulseCallback(self,channel):
-		"""Callback function for what to do when the falling edge is triggered """
-		self.pulse_count +=1
-		print("pulse count = " +str(self.pulse_count))
+		"""Callback function for what to do when the falling edge is triggered.
+		Only records the time of the edge; bills are decoded in runDecoder."""
+		pulse_time = time.monotonic()
+		with self.ring_lock:
+			index = self.write_index
+			self.pulse_times[index % self.RING_SIZE] = pulse_time
+			self.write_index = index + 1
+			self.pulse_count +=1
+		self.pulse_event.set()
+
 
-		
 	def disablePulseEvent(self):
 		"""Disables detection of falling edge."""
 		print("Disable pulse detection.")
-		GPIO.remove_event_detect(self.PULSE_PIN)
-		
+		self.isDetecting = False
+		self.gpio.remove_event_detect(self.PULSE_PIN)
+
+
+	def readPulses(self,last_time=None):
+		"""Returns the pulse times written since the last read, without the
+		bounces. last_time is the time of the pulse before them."""
+		with self.ring_lock:
+			write_index = self.write_index
+			if write_index - self.read_index > self.RING_SIZE:
+				self.dropped_pulses += write_index - self.read_index - self.RING_SIZE
+				self.read_index = write_index - self.RING_SIZE
+			new_times = [self.pulse_times[index % self.RING_SIZE]
+						 for index in range(self.read_index,write_index)]
+			self.read_index = write_index
+
+		pulse_times = []
+		for pulse_time in new_times:
+			if last_time is not None and pulse_time - last_time < self.DEBOUNCE_TIME:
+				self.bounces += 1
+				continue
+			pulse_times.append(pulse_time)
+			last_time = pulse_time
+		return pulse_times
+
+
+	def runDecoder(self):
+		"""Groups pulses into bursts and credits each burst as a bill. Runs in
+		the decoder thread."""
+		burst = []  #pulse times of the bill being inserted
+		while True:
+			timeout = None
+			if burst:
+				timeout = max(burst[-1] + self.BURST_GAP - time.monotonic(),0)
+			self.pulse_event.wait(timeout)
+			self.pulse_event.clear() #pulses written after this set it again
+
+			burst.extend(self.readPulses(burst[-1] if burst else None))
+			if burst and time.monotonic() - burst[-1] >= self.BURST_GAP:
+				self.creditBill(burst)
+				burst = []
+			if not burst:
+				with self.ring_lock:
+					self.credited_index = self.read_index #every pulse read so far is credited (or a bounce)
+
+
+	def creditBill(self,burst):
+		"""Turns a burst of pulses into dollars and tells the listener."""
+		dollars = len(burst) * self.DOLLARS_PER_PULSE
+		if dollars not in self.DENOMINATIONS:
+			#still credited, since the money is in the acceptor
+			print("A burst of {} pulses is not a bill; ${:.2f} is credited.".format(len(burst),dollars))
+		self.bills.append((dollars,len(burst)))
+		self.decode_latencies.append(time.monotonic() - burst[-1] - self.BURST_GAP)
+		print("${:.2f} bill inserted ({} pulses).".format(dollars,len(burst)))
+
+		listener = self.listener
+		if listener is not None:
+			listener(dollars)
+		elif self.main_app is not None:
+			self.main_app.writeToLog("${:.2f} bill inserted while no payment was open.".format(dollars))
+
+
+	def isBurstPending(self):
+		"""Returns True if pulses came in that aren't credited as a bill yet."""
+		with self.ring_lock:
+			return self.write_index != self.credited_index
+
+
+	def getDecodeStats(self):
+		"""Returns the bills decoded and how quickly they were credited. The
+		latency is measured after the BURST_GAP that ends every burst."""
+		stats = {"bills":len(self.bills),"dollars":sum([dollars for dollars, pulses in self.bills]),
+				 "pulses":self.write_index,"dropped_pulses":self.dropped_pulses,"bounces":self.bounces}
+		if self.decode_latencies:
+			stats["average_latency_ms"] = 1000 * sum(self.decode_latencies) / len(self.decode_latencies)
+			stats["max_latency_ms"] = 1000 * max(self.decode_latencies)
+		return stats
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the RecipeCompiler class, which turns the active
+drink profiles into the pump times that are sent to the embedded boards.
+The compiled menu is a NumPy uint8 array of shape (drinks, registers, valves)
+with a row for every active drink, and it is the only copy of the menu that
+the drink menu file and the EmbeddedBoard read from. After an edit, only the
+rows that depend on the edited drink or inventory item are recompiled.
+
+Notes:
+    Ingredients are matched to valves through the inventory. Valve numbers
+    start at 1, and every 8 valves are one register. Registers are numbered
+    across all of the boards in the BoardLayout (4 registers by default):
+        valve 1-8   -> register 0
+        valve 9-16  -> register 1
+        valve 17-24 -> register 2
+        valve 25-32 -> register 3
+
+    The boards have 24 recipe slots. The drink menu file holds the rows of
+    the drinks that a RecipeSlotCache put in the slots, and the first byte of
+    each block is the slot number (the recipe id on the board).
+
+    conversion between ounces to millimeters:
+    1 fluid Oz = 29.5753 milliliters
+
+    Time resolution: 30/256 = 0.117 sec
+
+    Calculation:
+      time_res = 30/256 #30 seconds divided by 256 (A byte max value)
+      milli_req = OZ_num * 29.5735
+      pump_time = int(milli_req / time_res)
+      amount_of_fluid = pump_time * (500 / 60) #500 ml per sec pump speed
+"""
+
+import numpy as np
+
+#my modules
+from DrinkMenuFile import DrinkMenuFile
+from EmbeddedBoard import EmbeddedBoard
+
+
+class RecipeCompiler:
+
+    NUM_RECIPES = EmbeddedBoard.NUM_RECIPE_SLOTS  #number of recipe slots on the boards
+    NUM_REGISTERS = 4           #default number of valve registers on all boards
+    VALVES_PER_REGISTER = 8
+    BLOCK_SIZE = 10             #[id, 8 pump times, register number]
+
+    #Constants
+    OZ_TO_ML_CONV = 29.5753 # 1 fluid Oz = 29.5753 ml
+    MAX_TIME = 30 #pump will run for a max of 30 seconds
+    BIT_RES = 256
+    PUMP_SPEED_ML_PER_SEC = int(500/60) #rating of pump
+    #other pump speed may be:  PUMP_SPEED_ML_PER_SEC = int(1000/60)
+    MAX_PUMP_TIME = 255
+
+    def __init__(self,num_registers=NUM_REGISTERS):
+        self.num_registers = num_registers
+        self.valve_lookup = {}     #ingredient name -> (register, slot)
+        self.recipe_drinks = []    #drink object in each row of the menu
+        self.drink_rows = {}       #drink id -> row of the menu
+        self.row_ingredients = {}  #row -> ingredient names used by that row's drink
+        self.ingredient_rows = {}  #ingredient name -> rows that use it
+        self.menu_array = self.createMenuArray(0)
+        self.pump_time_per_oz = self.OZ_TO_ML_CONV / (self.PUMP_SPEED_ML_PER_SEC*self.MAX_TIME/self.BIT_RES)
+
+
+    def createMenuArray(self,num_rows=NUM_RECIPES):
+        """Returns an empty menu array."""
+        return np.zeros((num_rows,self.num_registers,self.VALVES_PER_REGISTER),dtype=np.uint8)
+
+
+    def getNumValves(self):
+        """Returns the number of valves on all boards."""
+        return self.num_registers * self.VALVES_PER_REGISTER
+
+
+    def getIngredientKey(self,name):
+        """Returns a common form of an ingredient name for inventory names
+        (e.g. 'Lime Juice') and drink profile names (e.g. 'lime_juice')."""
+        return name.strip().lower().replace(" ","_")
+
+
+    def buildValveLookup(self,inventory_items):
+        """Maps each inventory item to the register and slot of its valve."""
+        self.valve_lookup = {}
+        for item in inventory_items:
+            valve_index = int(item.valve_number) - 1  #valve numbers start at 1
+            register = valve_index // self.VALVES_PER_REGISTER
+            if register >= self.num_registers:
+                print("Valve {} ({}) is not on any board.".format(item.valve_number,item.name))
+                continue
+            slot = valve_index % self.VALVES_PER_REGISTER
+            self.valve_lookup[self.getIngredientKey(item.name)] = (register,slot)
+
+
+    def gatherPumpTimes(self,drinks,first_row=0):
+        """Finds the valve location and pump time of every ingredient in the
+        given drinks. The drinks are placed in rows starting at first_row.
+        Returns the (rows, registers, slots) index, the pump times, and the set
+        of ingredient names used in each row."""
+        rows = []
+        registers = []
+        slots = []
+        ounces = []
+        row_ingredients = []
+        for offset in range(len(drinks)):
+            recipe = drinks[offset]
+            ingredient_keys = set()
+            for count in range(len(recipe.ingredients)):
+                key = self.getIngredientKey(recipe.ingredients[count])
+                ingredient_keys.add(key) #tracked even without a valve, so a new valve recompiles it
+                location = self.valve_lookup.get(key)
+                if location is None or count >= len(recipe.ounces):
+                    print("Ingredient {} in {} has no valve.".format(recipe.ingredients[count],recipe.name))
+                    continue
+                register, slot = location
+                rows.append(first_row + offset)
+                registers.append(register)
+                slots.append(slot)
+                ounces.append(float(recipe.ounces[count]))
+            row_ingredients.append(ingredient_keys)
+
+        pump_times = (np.array(ounces,dtype=np.float64) * self.pump_time_per_oz).astype(np.int64)
+        if pump_times.size and pump_times.max() > self.MAX_PUMP_TIME:
+            print("Some pump times are too long and were cut to {}.".format(self.MAX_PUMP_TIME))
+        pump_times = np.clip(pump_times,0,self.MAX_PUMP_TIME)
+        return (rows,registers,slots), pump_times, row_ingredients
+
+
+    def setRowIngredients(self,row,ingredient_keys):
+        """Updates which rows depend on which ingredients."""
+        for key in self.row_ingredients.get(row,set()):
+            self.ingredient_rows.get(key,set()).discard(row)
+        self.row_ingredients[row] = ingredient_keys
+        for key in ingredient_keys:
+            self.ingredient_rows.setdefault(key,set()).add(row)
+
+
+    def compileMenu(self,drinks):
+        """Compiles the pump times of the given drinks (in menu order) into a
+        new menu array. There is no limit on the number of drinks, since
+        only the drinks in the recipe slots are sent to the boards."""
+        index, pump_times, row_ingredients = self.gatherPumpTimes(drinks)
+        menu_array = self.createMenuArray(len(drinks))
+        menu_array[index] = pump_times
+
+        self.row_ingredients = {}
+        self.ingredient_rows = {}
+        for row in range(len(row_ingredients)):
+            self.setRowIngredients(row,row_ingredients[row])
+
+        #a new array is swapped in, so that other threads never read a half compiled menu
+        self.recipe_drinks = list(drinks)
+        self.drink_rows = dict([(int(drinks[row].id_number),row) for row in range(len(drinks))])
+        self.menu_array = menu_array
+        return menu_array
+
+
+    def recompileRows(self,rows):
+        """Recompiles only the given rows of the menu."""
+        menu_array = self.menu_array.copy()
+        for row in rows:
+            index, pump_times, row_ingredients = self.gatherPumpTimes([self.recipe_drinks[row]],row)
+            menu_array[row] = 0
+            menu_array[index] = pump_times
+            self.setRowIngredients(row,row_ingredients[0])
+        self.menu_array = menu_array
+        return menu_array
+
+
+    def recompileDrink(self,drink):
+        """Recompiles the row of an edited drink. Returns False if the drink
+        isn't in the compiled menu, which means the whole menu has to be compiled."""
+        for row in range(len(self.recipe_drinks)):
+            if self.recipe_drinks[row] is drink:
+                self.recompileRows([row])
+                return True
+        return False
+
+
+    def updateValveLookup(self,inventory_items):
+        """Rebuilds the valve lookup after an inventory edit and recompiles
+        only the recipes that use an ingredient whose valve changed. Returns
+        the rows that were recompiled."""
+        old_lookup = self.valve_lookup
+        self.buildValveLookup(inventory_items)
+
+        rows = set()
+        for key in set(old_lookup) | set(self.valve_lookup):
+            if old_lookup.get(key) != self.valve_lookup.get(key):
+                rows |= self.ingredient_rows.get(key,set())
+
+        if rows:
+            self.recompileRows(sorted(rows))
+        return rows
+
+
+    def getSlotMenuArray(self,slot_drink_ids=None):
+        """Returns the pump times of the drink in each recipe slot, given as a
+        list of drink ids (None for an empty slot). By default the first
+        drinks of the menu fill the slots."""
+        slot_array = self.createMenuArray()
+        if slot_drink_ids is None:
+            num_rows = min(len(self.menu_array),self.NUM_RECIPES)
+            slot_array[:num_rows] = self.menu_array[:num_rows]
+            return slot_array
+
+        for slot in range(min(len(slot_drink_ids),self.NUM_RECIPES)):
+            row = self.drink_rows.get(slot_drink_ids[slot])
+            if row is not None:
+                slot_array[slot] = self.menu_array[row]
+        return slot_array
+
+
+    def getBlocks(self,slot_drink_ids=None):
+        """Returns the recipe slots as a (slots*registers, 10) array of blocks
+        in the order that they are sent to the board."""
+        blocks = np.empty((self.NUM_RECIPES,self.num_registers,self.BLOCK_SIZE),dtype=np.uint8)
+        blocks[:,:,0] = np.arange(self.NUM_RECIPES,dtype=np.uint8)[:,None]
+        blocks[:,:,1:self.BLOCK_SIZE-1] = self.getSlotMenuArray(slot_drink_ids)
+        blocks[:,:,self.BLOCK_SIZE-1] = np.arange(self.num_registers,dtype=np.uint8)[None,:]
+        return blocks.reshape(-1,self.BLOCK_SIZE)
+
+
+    def writeBinaryMenuFile(self,path,slot_drink_ids=None):
+        """Writes the recipe slots to the binary drink menu file that the
+        EmbeddedBoard maps into memory. Returns the checksum of the menu."""
+        return DrinkMenuFile(path).writeMenu(self.getBlocks(slot_drink_ids),self.NUM_RECIPES,self.num_registers)
+
+
+    def writeDrinkMenuFile(self,path,slot_drink_ids=None):
+        """Writes the recipe slots to the comma delimited drink menu file.
+        Only used as a debugging export."""
+        np.savetxt(path,self.getBlocks(slot_drink_ids),fmt="%d",delimiter=",")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the RecipeSlotCache class, which decides which
+drinks are kept in the recipe slots of the embedded boards. The boards only
+have room for 24 recipes, so the slots are used as a cache: the most popular
+drinks stay on the boards, and a drink that isn't on them is loaded into the
+slot of the least popular drink right before its order is poured.
+
+Note:
+    - Popularity is the number of drinks ordered, read from the drink sales
+    logs at start up and counted for every order after that. Ties go to the
+    drink that was ordered most recently.
+    - The drink in each slot is saved to a JSON file, so the boards don't
+    have to be reloaded after a restart.
+"""
+
+import os
+import re
+import json
+import time
+
+#my modules
+from EmbeddedBoard import EmbeddedBoard
+
+
+class RecipeSlotCache:
+
+    NUM_SLOTS = EmbeddedBoard.NUM_RECIPE_SLOTS  #number of recipes the boards can store
+    SALES_LINE_PATTERN = re.compile(r" : (\d+) (.+?) (was|were) ordered\.")
+
+    def __init__(self,slots_file_path,sales_log_directory=None,num_slots=NUM_SLOTS):
+        self.slots_file_path = slots_file_path
+        self.num_slots = num_slots
+        self.slot_drinks = [None] * num_slots   #slot -> drink id in it
+        self.use_counts = {}                    #drink id -> drinks ordered
+        self.last_used = {}                     #drink id -> time of the last order
+        self.sales_counts = {}                  #drink name -> drinks ordered in the sales logs
+        if sales_log_directory is not None:
+            self.sales_counts = self.readSalesLogs(sales_log_directory)
+        self.loadSlots()
+
+
+    def readSalesLogs(self,sales_log_directory):
+        """Counts the drinks ordered in every sales log, by drink name."""
+        sales_counts = {}
+        try:
+            log_names = os.listdir(sales_log_directory)
+        except OSError:
+            return sales_counts
+
+        for log_name in log_names:
+            with open(os.path.join(sales_log_directory,log_name),"r") as log:
+                for line in log:
+                    match = self.SALES_LINE_PATTERN.search(line)
+                    if match is None:
+                        continue
+                    name = self.getSalesName(match.group(2))
+                    if name.endswith("(s)"):
+                        name = name[:-3] #e.g. "1 daiquiri(s) was ordered."
+                    elif match.group(3) == "were" and name.endswith("s"):
+                        name = name[:-1] #e.g. "2 cuba libres were ordered."
+                    sales_counts[name] = sales_counts.get(name,0) + int(match.group(1))
+        return sales_counts
+
+
+    def getSalesName(self,drink_name):
+        """Returns a drink name as it is counted in sales_counts, e.g.
+        'Cuba_Libre' -> 'cuba libre'."""
+        return drink_name.replace("_"," ").strip().lower()
+
+
+    def loadSlots(self):
+        """Reads the drink in each slot from file."""
+        try:
+            with open(self.slots_file_path,"r") as slots_file:
+                saved_slots = json.load(slots_file)
+        except (OSError,ValueError):
+            return
+        for slot in range(min(len(saved_slots),self.num_slots)):
+            self.slot_drinks[slot] = saved_slots[slot]
+
+
+    def saveSlots(self):
+        """Writes the drink in each slot to a temporary file and swaps it into place."""
+        temp_path = self.slots_file_path + ".tmp"
+        with open(temp_path,"w") as slots_file:
+            json.dump(self.slot_drinks,slots_file)
+        os.replace(temp_path,self.slots_file_path)
+
+
+    def assignDrinks(self,drinks):
+        """Takes the active drinks out of a new menu. Slots of drinks that are
+        no longer active are emptied, and empty slots are filled with the most
+        popular drinks that aren't on the boards. Returns the slots that changed."""
+        drink_ids = []
+        for drink in drinks:
+            drink_id = int(drink.id_number)
+            drink_ids.append(drink_id)
+            if drink_id not in self.use_counts:
+                self.use_counts[drink_id] = self.sales_counts.get(self.getSalesName(drink.name),0)
+
+        changed_slots = []
+        for slot in range(self.num_slots):
+            if self.slot_drinks[slot] is not None and self.slot_drinks[slot] not in drink_ids:
+                self.slot_drinks[slot] = None
+                changed_slots.append(slot)
+
+        waiting_drinks = [drink_id for drink_id in drink_ids if drink_id not in self.slot_drinks]
+        waiting_drinks.sort(key=self.getScore,reverse=True)
+        for slot in range(self.num_slots):
+            if self.slot_drinks[slot] is None and waiting_drinks:
+                self.slot_drinks[slot] = waiting_drinks.pop(0)
+                if slot not in changed_slots:
+                    changed_slots.append(slot)
+
+        if changed_slots:
+            self.saveSlots()
+        return changed_slots
+
+
+    def getScore(self,drink_id):
+        """Returns how popular a drink is; higher scores stay on the boards."""
+        return (self.use_counts.get(drink_id,0),self.last_used.get(drink_id,0))
+
+
+    def getSlot(self,drink_id):
+        """Returns the slot of a drink, or None if it isn't on the boards."""
+        try:
+            return self.slot_drinks.index(int(drink_id))
+        except ValueError:
+            return None
+
+
+    def loadDrink(self,drink_id,pinned_ids=()):
+        """Puts a drink in a slot, evicting the least popular drink that isn't
+        pinned (e.g. part of the order being poured). Returns the slot, or
+        None if every slot is pinned."""
+        drink_id = int(drink_id)
+        slot = self.getSlot(drink_id)
+        if slot is not None:
+            return slot
+
+        victim_slot = None
+        for slot in range(self.num_slots):
+            slot_drink = self.slot_drinks[slot]
+            if slot_drink is None:
+                victim_slot = slot
+                break
+            if slot_drink in pinned_ids:
+                continue
+            if victim_slot is None or self.getScore(slot_drink) < self.getScore(self.slot_drinks[victim_slot]):
+                victim_slot = slot
+
+        if victim_slot is None:
+            return None
+        if self.slot_drinks[victim_slot] is not None:
+            print("Recipe slot {}: drink {} is replaced by drink {}.".format(
+                victim_slot,self.slot_drinks[victim_slot],drink_id))
+        self.slot_drinks[victim_slot] = drink_id
+        self.saveSlots()
+        return victim_slot
+
+
+    def recordUse(self,drink_id,quantity=1):
+        """Counts an order of a drink."""
+        drink_id = int(drink_id)
+        self.use_counts[drink_id] = self.use_counts.get(drink_id,0) + quantity
+        self.last_used[drink_id] = time.time()
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines a software stand-in for the hardware of the
+machine, so the whole order path can run (and be timed) on a computer that
+isn't a Raspberry Pi. It has:
+	> SimulatedGPIO, which takes the place of RPi.GPIO
+	> SimulatedSMBus, which takes the place of smbus2 and records every write
+	> SimulatedButton, which takes the place of gpiozero's Button
+	> SimulatedBoard, an embedded board that stores recipe blocks and drives
+	  the ready pin from the pump times of the recipe that is being poured
+	> SimulatedPulseSource, which sends bill acceptor pulses from a script
+
+Notes:
+  >	The devices reach these through the HardwareLayer's MockBackend.
+	SimulatedHardware.install() makes it the backend, so it has to be called
+	before EmbeddedBoard, PulsePin or EmployeeSwitch is created. MainApp does
+	this when "simulate" is given on the command line.
+  >	addBoards() puts one SimulatedBoard on the bus for each board in a
+	BoardLayout.
+  >	time_scale speeds up (e.g. 0.01) or slows down simulated pours.
+  >	Pulse script format (one step per line, # starts a comment):
+		<seconds to wait> <number of pulses>
+"""
+
+#standard library imports
+import time
+import zlib
+import random
+import threading
+
+#my modules
+import HardwareLayer
+
+
+
+class SimulatedGPIO:
+	"""Keeps the level of every pin in memory and calls edge callbacks when a
+	simulated device changes a level."""
+
+	BCM = 11
+	BOARD = 10
+	IN = 1
+	OUT = 0
+	PUD_OFF = 20
+	PUD_DOWN = 21
+	PUD_UP = 22
+	LOW = 0
+	HIGH = 1
+	RISING = 31
+	FALLING = 32
+	BOTH = 33
+
+
+
+	def __init__(self):
+		self.lock = threading.RLock()
+		self.edge_condition = threading.Condition(self.lock)
+		self.levels = {}         #pin -> level
+		self.edge_detects = {}   #pin -> [edge, callbacks, bouncetime (s), time of last callback]
+
+
+	def setmode(self,mode):
+		pass
+
+
+	def setwarnings(self,isEnabled):
+		pass
+
+
+	def setup(self,pin,direction,pull_up_down=PUD_OFF,initial=LOW):
+		"""Sets the resting level of a pin, unless a simulated device drives it."""
+		with self.lock:
+			if pin in self.levels:
+				return
+			if direction == self.OUT:
+				self.levels[pin] = initial
+			else:
+				self.levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+
+	def input(self,pin):
+		with self.lock:
+			return self.levels.get(pin,self.LOW)
+
+
+	def output(self,pin,level):
+		self.setLevel(pin,level)
+
+
+	def add_event_detect(self,pin,edge,callback=None,bouncetime=None):
+		with self.lock:
+			if pin in self.edge_detects:
+				raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+			bounce = (bouncetime or 0) / 1000
+			self.edge_detects[pin] = [edge,[],bounce,None]
+			if callback is not None:
+				self.edge_detects[pin][1].append(callback)
+
+
+	def add_event_callback(self,pin,callback):
+		with self.lock:
+			self.edge_detects[pin][1].append(callback)
+
+
+	def remove_event_detect(self,pin):
+		with self.lock:
+			self.edge_detects.pop(pin,None)
+
+
+	def wait_for_edge(self,pin,edge,bouncetime=None,timeout=None):
+		"""Blocks until the edge happens. Returns the pin, or None after the
+		timeout (milliseconds)."""
+		deadline = None
+		if timeout is not None:
+			deadline = time.monotonic() + timeout/1000
+		with self.edge_condition:
+			while True:
+				level = self.levels.get(pin,self.LOW)
+				remaining = None
+				if deadline is not None:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						return None
+				self.edge_condition.wait(remaining)
+				new_level = self.levels.get(pin,self.LOW)
+				if new_level != level and self.isMatchingEdge(edge,new_level):
+					return pin
+
+
+	def cleanup(self,pin=None):
+		with self.lock:
+			if pin is None:
+				self.edge_detects.clear()
+			else:
+				self.edge_detects.pop(pin,None)
+
+
+	def isMatchingEdge(self,edge,new_level):
+		"""Returns True if a change to new_level is the given kind of edge."""
+		if edge == self.BOTH:
+			return True
+		if edge == self.FALLING:
+			return new_level == self.LOW
+		return new_level == self.HIGH
+
+
+	def setLevel(self,pin,level,isEdgeDetected=True):
+		"""Changes the level of a pin (as a device would) and calls the edge
+		callbacks on the caller's thread, unless isEdgeDetected is False."""
+		callbacks = []
+		with self.lock:
+			old_level = self.levels.get(pin,self.LOW)
+			self.levels[pin] = level
+			if old_level == level or not isEdgeDetected:
+				return
+			self.edge_condition.notify_all()
+
+			detect = self.edge_detects.get(pin)
+			if detect is not None and self.isMatchingEdge(detect[0],level):
+				now = time.monotonic()
+				if detect[3] is None or now - detect[3] >= detect[2]:
+					detect[3] = now
+					callbacks = list(detect[1])
+
+		for callback in callbacks:
+			callback(pin)
+
+
+
+class SimulatedSMBus:
+	"""Stands in for smbus2.SMBus. Writes are recorded in SimulatedSMBus.log
+	as (time, bus, address, register, data) and passed to the simulated
+	device at that bus and address."""
+
+	devices = {}      #(bus number, address) -> simulated device
+	log = []
+	error_rate = 0.0  #chance of 'OSError: [Errno 121] Remote I/O error' on a transaction
+	byte_time = 0.0   #seconds each byte takes on the wire (about 0.00009 at 100 kHz)
+
+
+	def __init__(self,bus=None):
+		self.bus_number = bus
+
+
+	def __enter__(self):
+		return self
+
+
+	def __exit__(self,*exc_info):
+		self.close()
+
+
+	def close(self):
+		pass
+
+
+	def getDevice(self,address,num_bytes=1):
+		"""Returns the device at an address, failing like a real bus would.
+		Takes as long as sending the address, register and bytes would."""
+		if self.byte_time:
+			time.sleep((num_bytes + 2) * self.byte_time)
+		device = self.devices.get((self.bus_number,address))
+		if device is None or random.random() < self.error_rate:
+			raise OSError(121,"Remote I/O error")
+		return device
+
+
+	def write_i2c_block_data(self,address,register,data):
+		device = self.getDevice(address,len(data))
+		self.log.append((time.monotonic(),self.bus_number,address,register,list(data)))
+		device.write(register,list(data))
+
+
+	def write_byte_data(self,address,register,value):
+		device = self.getDevice(address)
+		self.log.append((time.monotonic(),self.bus_number,address,register,[value]))
+		device.write(register,[value])
+
+
+	def read_byte_data(self,address,register):
+		return self.getDevice(address).read(register)
+
+
+	def read_i2c_block_data(self,address,register,length):
+		return self.getDevice(address,length).readBlock(register,length)
+
+
+
+class SimulatedButton:
+	"""Stands in for gpiozero's Button. Scripts press it with press()."""
+
+	buttons = {}  #pin -> button
+
+
+	def __init__(self,pin,pull_up=True,bounce_time=None,**kwargs):
+		self.pin = pin
+		self.is_pressed = False
+		self.when_pressed = None
+		self.when_released = None
+		self.buttons[pin] = self
+
+
+	def press(self):
+		self.is_pressed = True
+		if self.when_pressed is not None:
+			self.when_pressed()
+
+
+	def release(self):
+		self.is_pressed = False
+		if self.when_released is not None:
+			self.when_released()
+
+
+	def close(self):
+		self.buttons.pop(self.pin,None)
+
+
+
+class SimulatedBoard:
+	"""An embedded board on the simulated bus. Recipe blocks are stored as
+	they are written. Each (recipe id, quantity) pair of an order holds the
+	ready pin high for as long as the recipe's longest pump time (valves pour
+	at the same time), times the quantity. The pin is brought low for
+	ITEM_DONE_TIME between pairs."""
+
+	HALT_ADDRESS = 16
+	RECIPE_MAKER_ADDRESS = 55
+	ORDER_DRINK_ADDRESS = 87
+	MENU_DIGEST_ADDRESS = 96     #reads back the CRC32 of the stored blocks (set EmbeddedBoard.MENU_DIGEST_ADDRESS to use it)
+
+	TIME_RESOLUTION = 30/256     #seconds per pump time unit
+	BLOCK_PROCESS_TIME = 0.01    #seconds the board takes to store a recipe block
+	ITEM_DONE_TIME = 0.02        #seconds the ready pin is low between the pairs of a batch order
+
+
+	def __init__(self,gpio,time_scale=1.0,num_registers=4,ready_pin=4):
+		self.gpio = gpio
+		self.time_scale = time_scale
+		self.NUM_REGISTERS = num_registers
+		self.READY_PIN = ready_pin
+		self.recipes = {}            #recipe id -> {register: pump times}
+		self.blocks = {}             #(recipe id, register) -> block as written
+		self.pour_timer = None
+		self.orders_poured = 0
+		self.gpio.setLevel(self.READY_PIN,self.gpio.LOW) #idle board is ready
+
+
+	def write(self,register,data):
+		"""Handles a write from the bus."""
+		if self.RECIPE_MAKER_ADDRESS <= register < self.RECIPE_MAKER_ADDRESS + self.NUM_REGISTERS:
+			self.recipes.setdefault(data[0],{})[register - self.RECIPE_MAKER_ADDRESS] = data[1:9]
+			self.blocks[(data[0],register - self.RECIPE_MAKER_ADDRESS)] = data
+			self.setBusy(self.BLOCK_PROCESS_TIME)
+		elif register == self.ORDER_DRINK_ADDRESS:
+			items = [(data[i],data[i+1]) for i in range(0,len(data)-1,2) if data[i+1] > 0]
+			self.orders_poured += 1
+			self.pourItems(items)
+		elif register == self.HALT_ADDRESS:
+			if self.pour_timer is not None:
+				self.pour_timer.cancel()
+			self.gpio.setLevel(self.READY_PIN,self.gpio.LOW)
+
+
+	def read(self,register):
+		"""Returns 0 (idle) when the ready pin is low, otherwise 1."""
+		return self.gpio.input(self.READY_PIN)
+
+
+	def readBlock(self,register,length):
+		"""Returns the menu digest (little endian) when it is read."""
+		if register != self.MENU_DIGEST_ADDRESS:
+			raise OSError(121,"Remote I/O error")
+		digest = 0
+		for key in sorted(self.blocks):
+			digest = zlib.crc32(bytes(self.blocks[key]),digest)
+		return list(digest.to_bytes(4,"little"))[:length]
+
+
+	def getPourTime(self,recipe_id,quantity):
+		"""Returns how many seconds the given order takes to pour."""
+		registers = self.recipes.get(recipe_id)
+		if not registers:
+			print("Simulated board doesn't have recipe {}.".format(recipe_id))
+			return 0
+		longest = max([max(times) for times in registers.values()])
+		return longest * self.TIME_RESOLUTION * quantity
+
+
+	def pourItems(self,items):
+		"""Pours the first (recipe id, quantity) pair, then the rest."""
+		if items:
+			recipe_id, quantity = items[0]
+			self.setBusy(self.getPourTime(recipe_id,quantity) * self.time_scale,items[1:])
+
+
+	def setBusy(self,duration,next_items=()):
+		"""Holds the ready pin high for a duration (seconds), then pours the
+		next items of the order, if there are any."""
+		if self.pour_timer is not None:
+			self.pour_timer.cancel()
+		self.gpio.setLevel(self.READY_PIN,self.gpio.HIGH)
+		self.pour_timer = threading.Timer(duration,self.finishBusy,args=(next_items,))
+		self.pour_timer.daemon = True
+		self.pour_timer.start()
+
+
+	def finishBusy(self,next_items):
+		"""Brings the ready pin low and starts the next items after ITEM_DONE_TIME."""
+		self.gpio.setLevel(self.READY_PIN,self.gpio.LOW)
+		if next_items:
+			self.pour_timer = threading.Timer(self.ITEM_DONE_TIME,self.pourItems,args=(next_items,))
+			self.pour_timer.daemon = True
+			self.pour_timer.start()
+
+
+
+class SimulatedPulseSource:
+	"""Sends falling edges on the bill acceptor's pulse pin, like a MEI bill
+	acceptor does (one pulse per dollar)."""
+
+	PULSE_PIN = 21
+	PULSE_WIDTH = 0.05   #seconds the pin is held low
+	PULSE_GAP = 0.15     #seconds between pulses
+
+
+	def __init__(self,gpio):
+		self.gpio = gpio
+		self.script = []     #(seconds to wait, pulses)
+		self.gpio.setLevel(self.PULSE_PIN,self.gpio.HIGH)
+
+
+	def sendPulses(self,pulses):
+		"""Sends the given number of pulses. Blocks until they are sent."""
+		for count in range(pulses):
+			self.gpio.setLevel(self.PULSE_PIN,self.gpio.LOW)
+			time.sleep(self.PULSE_WIDTH)
+			self.gpio.setLevel(self.PULSE_PIN,self.gpio.HIGH)
+			time.sleep(self.PULSE_GAP)
+
+
+	def loadScript(self,script_path):
+		"""Reads a pulse script file."""
+		self.script = []
+		with open(script_path,"r") as script_file:
+			for line in script_file:
+				values = line.split("#")[0].split()
+				if len(values) >= 2:
+					self.script.append((float(values[0]),int(values[1])))
+
+
+	def runScript(self):
+		"""Plays the script in a background thread."""
+		def play():
+			for delay, pulses in self.script:
+				time.sleep(delay)
+				self.sendPulses(pulses)
+		threading.Thread(target=play,daemon=True).start()
+
+
+
+class SimulatedHardware:
+	"""Creates the simulated devices and installs the simulated modules."""
+
+	def __init__(self,time_scale=1.0,pulse_script_path=None):
+		self.time_scale = time_scale
+		self.gpio = SimulatedGPIO()
+		self.boards = []             #one SimulatedBoard per board in the layout
+		self.pulse_source = SimulatedPulseSource(self.gpio)
+		if pulse_script_path is not None:
+			self.pulse_source.loadScript(pulse_script_path)
+
+
+	def addBoards(self,board_layout):
+		"""Puts a simulated board on the bus for each board in a BoardLayout.
+		Returns self."""
+		for device in board_layout.boards:
+			board = SimulatedBoard(self.gpio,self.time_scale,device["registers"],device["ready_pin"])
+			SimulatedSMBus.devices[(device["bus"],device["address"])] = board
+			self.boards.append(board)
+		return self
+
+
+	def getPourTime(self,recipe_id,quantity):
+		"""Returns how many seconds the given order takes to pour on the
+		slowest board that has valves in its recipe."""
+		pour_times = [board.getPourTime(recipe_id,quantity) for board in self.boards
+					  if recipe_id in board.recipes]
+		return max(pour_times) if pour_times else 0
+
+
+	def getOrdersPoured(self):
+		"""Returns the most orders poured by any one board."""
+		return max([board.orders_poured for board in self.boards])
+
+
+	def install(self):
+		"""Makes the HardwareLayer use the simulated devices. Returns self."""
+		HardwareLayer.setBackend(HardwareLayer.MockBackend(self))
+		print("Using simulated hardware.")
+		return self
+
+
+	def start(self):
+		"""Starts the pulse script, if there is one."""
+		if self.pulse_source.script:
+			self.pulse_source.runScript()
+
+
+
+def createFromArgs(args):
+	"""Makes a SimulatedHardware from the command line args
+	sim_speed=<time scale> and pulse_script=<path>."""
+	time_scale = 1.0
+	pulse_script_path = None
+	for arg in args:
+		if arg.startswith("sim_speed="):
+			time_scale = float(arg.split("=",1)[1])
+		elif arg.startswith("pulse_script="):
+			pulse_script_path = arg.split("=",1)[1]
+	return SimulatedHardware(time_scale,pulse_script_path)
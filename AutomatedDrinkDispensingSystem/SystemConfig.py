@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Programmer: Chris Blanks
+Last Edited: October 2026
+Project: Automated Self-Serving System
+Purpose: This script defines the SystemConfig class, which keeps the contents
+of the configuration file (config.txt) in memory.
+
+Note:
+    - The configuration file has 3 lines:
+        locked <0 or 1>
+        active_drink_list <drink names separated by spaces>
+        system_status <status>
+    - Setters only change the values in memory. commit() writes all of the
+    changes at once by writing a temporary file and swapping it into place.
+"""
+
+import os
+
+
+class SystemConfig:
+
+    LINE_HEADERS = ("locked","active_drink_list","system_status")
+
+    def __init__(self,config_file_path):
+        self.config_file_path = config_file_path
+
+        self.locked = "0"
+        self.active_drink_list = []
+        self.system_status = "idle"
+
+        self.isDirty = False  #True when memory differs from the file
+        self.readConfigFile()
+
+
+    def readConfigFile(self):
+        """Reads the 3 configuration lines from file. Anything after them is ignored."""
+        try:
+            with open(self.config_file_path,"r",encoding="ISO-8859-1") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            print("No config file found. Using defaults.")
+            self.isDirty = True
+            return
+
+        for line in lines:
+            values = line.split()
+            if not values:
+                continue
+            if values[0] == "locked" and len(values) > 1:
+                self.locked = values[1]
+            elif values[0] == "active_drink_list":
+                self.active_drink_list = values[1:]
+            elif values[0] == "system_status" and len(values) > 1:
+                self.system_status = values[1]
+                break #last line of the config; the rest is leftover data
+
+
+    def isLocked(self):
+        """Returns True if the config file is locked."""
+        return self.locked != "0"
+
+
+    def setLocked(self,isLocked):
+        """Locks or unlocks the config file."""
+        value = "1" if isLocked else "0"
+        if value != self.locked:
+            self.locked = value
+            self.isDirty = True
+
+
+    def addActiveDrink(self,drink_name):
+        """Adds a drink to the active drink list if it is new."""
+        if drink_name not in self.active_drink_list:
+            self.active_drink_list.append(drink_name)
+            self.isDirty = True
+
+
+    def removeActiveDrink(self,drink_name):
+        """Removes a drink from the active drink list."""
+        if drink_name in self.active_drink_list:
+            self.active_drink_list.remove(drink_name)
+            self.isDirty = True
+
+
+    def setActiveDrinkList(self,drink_names):
+        """Replaces the active drink list."""
+        drink_names = list(drink_names)
+        if drink_names != self.active_drink_list:
+            self.active_drink_list = drink_names
+            self.isDirty = True
+
+
+    def setSystemStatus(self,status):
+        """Changes the system status (e.g. idle, mixing)."""
+        if status != self.system_status:
+            self.system_status = status
+            self.isDirty = True
+
+
+    def commit(self):
+        """Writes all pending changes to the config file in a single write.
+        Returns True if the file was written."""
+        if not self.isDirty:
+            return False
+
+        lines = ["{} {}".format(self.LINE_HEADERS[0],self.locked),
+                 "{} {}".format(self.LINE_HEADERS[1]," ".join(self.active_drink_list)),
+                 "{} {}".format(self.LINE_HEADERS[2],self.system_status)]
+
+        temp_path = self.config_file_path + ".tmp"
+        with open(temp_path,"w",encoding="ISO-8859-1") as f:
+            f.write("\n".join(lines)+"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path,self.config_file_path) #atomic on the same file system
+
+        self.isDirty = False
+        return True
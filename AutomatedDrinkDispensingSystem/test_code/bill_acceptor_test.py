@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 
-"""Test for reading pulses from bill acceptor."""
+"""Test for reading pulses from bill acceptor.
+"record=<trace path>" records the pulses (see HardwareLayer.py)."""
 
-import RPi.GPIO as GPIO
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HardwareLayer
+HardwareLayer.setupFromArgs(sys.argv)
+GPIO = HardwareLayer.getGPIO()
 
 def waitAndCount():
 	"""Infinite loop that waits for a falling edge and writes number of
@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 
-from gpiozero import Button
+import os
+import sys
 from signal import pause
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HardwareLayer
+
 def react():
 	print("Employee Mode ON")
 
 def setupButtonInput():
 	"""Sets up a button on GPIO7 & runs the react(). """
-	button = Button(17)
+	button = HardwareLayer.createButton(17)
 	#button.when_pressed = react
 	if button.is_pressed:
 		react()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""Benchmark of halt latency while the drink menu is being uploaded, against
+the simulated embedded board. Runs on any computer.
+
+Halts are sent through the driver's priority lane (EmbeddedBoard.sendHaltCommand)
+and, for comparison, as an ordinary paced write queued behind the upload.
+
+Usage: python3 halt_latency_benchmark.py [number of halts] [board layout file]
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SimulatedHardware
+NUM_HALTS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+LAYOUT_FILE_PATH = sys.argv[2] if len(sys.argv) > 2 else None  #embedded_boards.txt format
+BYTE_TIME = 0.00009  #100 kHz bus
+hardware = SimulatedHardware.SimulatedHardware(0.01).install()
+SimulatedHardware.SimulatedSMBus.byte_time = BYTE_TIME
+
+from EmbeddedBoard import EmbeddedBoard
+from BoardLayout import BoardLayout
+
+
+def keepUploading(board):
+	"""Starts a full menu upload if none is running."""
+	if not board.isUploading():
+		board.acked_menu.clear()
+		board.startMenuUpload()
+
+
+def sendQueuedHalt(board):
+	"""Sends a halt the way ordinary commands are sent: as a paced write on the
+	event loop, after the writes that are already queued. Returns seconds."""
+	driver = board.driver
+	start = time.perf_counter()
+	for device in board.layout.boards:
+		driver.run(driver.writeByte(device,board.HALT_ADDRESS,0))
+	return time.perf_counter() - start
+
+
+def printStats(name,latencies):
+	latencies = sorted(latencies)
+	print("{:<15} average {:6.2f} ms  p95 {:6.2f} ms  max {:6.2f} ms".format(name,
+		sum(latencies)/len(latencies)*1000,latencies[int(len(latencies)*0.95)]*1000,latencies[-1]*1000))
+
+
+def runBenchmark():
+	layout = BoardLayout(LAYOUT_FILE_PATH)
+	hardware.addBoards(layout)
+	board = EmbeddedBoard(None,layout)  #no main app, so the board's test menu is used
+
+	queued_latencies = []
+	priority_latencies = []
+	for count in range(NUM_HALTS):
+		keepUploading(board)
+		time.sleep(random.uniform(0.005,0.03))  #land somewhere in the middle of the upload
+		queued_latencies.append(sendQueuedHalt(board))
+
+		keepUploading(board)
+		time.sleep(random.uniform(0.005,0.03))
+		priority_latencies.append(board.sendHaltCommand())
+
+	while board.isUploading():
+		time.sleep(0.05)
+	print("\nHalts under a concurrent menu upload: {}".format(NUM_HALTS))
+	printStats("Queued halt:",queued_latencies)
+	printStats("Priority lane:",priority_latencies)
+	print("Driver halt stats: {}".format(board.driver.getHaltStats()))
+	board.close()
+
+
+if __name__ == "__main__":
+	runBenchmark()
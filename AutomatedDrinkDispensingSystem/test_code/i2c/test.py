@@ -1,8 +1,14 @@
 #!/usr/bin/python3
 
-from smbus2 import SMBusWrapper
-import RPi.GPIO as GPIO
+import os
+import sys
 import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import HardwareLayer
+HardwareLayer.setupFromArgs(sys.argv) #"record=<trace path>" records the I2C traffic
+GPIO = HardwareLayer.getGPIO()
     
 GPIO.setmode(GPIO.BCM)
 GPIO.setup(4,GPIO.IN,pull_up_down=GPIO.PUD_UP) 
@@ -38,7 +44,7 @@ def writeToEmbeddedBoard(data_sequence=None):
         DATA = data  #must be a list of data (each item is )
     
         
-    with SMBusWrapper(1) as bus:
+    with HardwareLayer.openSMBus(1) as bus:
         #Writing the recipe
         bus.write_i2c_block_data(TARGET_ADDRESS,REG_ADDRESS,DATA1)
         time.sleep(TRANSMIT_DELAY) #takes floats
@@ -74,7 +80,7 @@ def writeEverythingToBoard(data_sequence=None):
         placeholder,placeholder,placeholder,placeholder ]
         
         """
-        with SMBusWrapper(1) as bus:
+        with HardwareLayer.openSMBus(1) as bus:
             for j in range(4):
                 
                 print("Valve #{}".format(str(j)))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""Benchmark of menu upload time and order throughput against the simulated
+embedded board. Runs on any computer.
+
+Usage: python3 order_throughput_benchmark.py [number of orders] [time scale] [board layout file]
+	time scale 0.01 pours 100 times faster than the real machine; results are
+	scaled back to real time. Without a layout file, one board is simulated.
+"""
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import SimulatedHardware
+NUM_ORDERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+TIME_SCALE = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+hardware = SimulatedHardware.SimulatedHardware(TIME_SCALE).install()
+
+from EmbeddedBoard import EmbeddedBoard
+from BoardLayout import BoardLayout
+LAYOUT_FILE_PATH = sys.argv[3] if len(sys.argv) > 3 else None  #embedded_boards.txt format
+
+
+def runBenchmark():
+	layout = BoardLayout(LAYOUT_FILE_PATH)
+	hardware.addBoards(layout)
+	board = EmbeddedBoard(None,layout)  #no main app, so the board's test menu is used
+
+	start = time.monotonic()
+	board.initializeDrinkMenuOnBoard()
+	upload_time = time.monotonic() - start
+	print("\nMenu upload: {:.2f} s  {}".format(upload_time,board.driver.getPacingStats()))
+
+	pour_time = 0.0
+	start = time.monotonic()
+	for count in range(NUM_ORDERS):
+		drink_id = count % 24
+		pour_time += hardware.getPourTime(drink_id,1)
+		board.driver.run(board.driver.pourOrder([drink_id,1,0,0,0,0,0,0,0,0]))
+	elapsed = time.monotonic() - start
+
+	overhead = elapsed - pour_time*TIME_SCALE  #time not spent pouring
+	real_time = pour_time + overhead
+	print("Orders: {}  poured: {}".format(NUM_ORDERS,hardware.getOrdersPoured()))
+	print("Pour time (real): {:.1f} s  host overhead: {:.1f} ms per order".format(
+		pour_time,overhead*1000/NUM_ORDERS))
+	print("Throughput (real): {:.1f} drinks per hour".format(NUM_ORDERS*3600/real_time))
+	board.close()
+
+
+if __name__ == "__main__":
+	runBenchmark()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""Prints a profile of a hardware trace recorded with "record=<trace path>"
+(see HardwareLayer.py): how many of each event there were, the I2C traffic of
+each board, and how long each order took from being written to a board to
+the last edge of that board's ready pin before the board was written to
+again. The slowest orders are listed first. Runs on any computer.
+
+Usage: python3 trace_report.py <trace path> [number of orders to list] [embedded boards file]
+The boards file gives the ready pin of each board (see BoardLayout.py); the
+one in resources/system_info is used by default.
+"""
+
+import os
+import sys
+import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import HardwareLayer
+from BoardLayout import BoardLayout
+from EmbeddedBoard import EmbeddedBoard
+
+MAIN_DIRECTORY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACE_PATH = sys.argv[1]
+NUM_ORDERS_LISTED = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+BOARDS_FILE_PATH = sys.argv[3] if len(sys.argv) > 3 else "{}/resources/system_info/embedded_boards.txt".format(MAIN_DIRECTORY_PATH)
+
+
+def getOrderTimes(records,board_layout):
+	"""Returns (time written, bus, address, frame, seconds until the last
+	ready edge, number of ready edges) for each order in the trace. An edge
+	counts towards the order on the board with that ready pin, until the
+	board is written to again (e.g. a recipe upload, whose acks use the same pin)."""
+	ready_pins = dict([((board["bus"],board["address"]),board["ready_pin"]) for board in board_layout.boards])
+	orders = []
+	pin_orders = {}  #ready pin -> order being poured by its board
+	for record_time, kind, channel, address, register, data in records:
+		if kind in (HardwareLayer.TRACE_BUS_WRITE_BLOCK,HardwareLayer.TRACE_BUS_WRITE_BYTE):
+			pin = ready_pins.get((channel,address))
+			if kind == HardwareLayer.TRACE_BUS_WRITE_BLOCK and register == EmbeddedBoard.ORDER_DRINK_ADDRESS:
+				order = [record_time,channel,address,list(data),0.0,0]
+				orders.append(order)
+				if pin is not None:
+					pin_orders[pin] = order
+			elif pin is not None:
+				pin_orders.pop(pin,None)
+		elif kind == HardwareLayer.TRACE_GPIO_EDGE and data[0] == 0 and channel in pin_orders:
+			order = pin_orders[channel]  #the ready pin brought low finishes an item of the order
+			order[4] = record_time - order[0]
+			order[5] += 1
+	return orders
+
+
+def printReport():
+	start_time, records = HardwareLayer.readTrace(TRACE_PATH)
+	duration = records[-1][0] if records else 0.0
+	print("Trace started {} and lasted {:.2f} s ({} records, {} bytes).".format(
+		datetime.datetime.fromtimestamp(start_time),duration,len(records),os.path.getsize(TRACE_PATH)))
+
+	kind_counts = {}
+	bus_traffic = {}  #(bus, address) -> [transactions, bytes, errors]
+	for record_time, kind, channel, address, register, data in records:
+		kind_counts[kind] = kind_counts.get(kind,0) + 1
+		if kind >= HardwareLayer.TRACE_BUS_WRITE_BLOCK and kind <= HardwareLayer.TRACE_BUS_ERROR:
+			traffic = bus_traffic.setdefault((channel,address),[0,0,0])
+			traffic[0] += 1
+			traffic[1] += len(data)
+			if kind == HardwareLayer.TRACE_BUS_ERROR:
+				traffic[2] += 1
+
+	print("\nEvents:")
+	for kind in sorted(kind_counts):
+		print("  {:<16} {}".format(HardwareLayer.TRACE_KIND_NAMES.get(kind,kind),kind_counts[kind]))
+
+	print("\nI2C traffic:")
+	for (bus, address), (transactions, num_bytes, errors) in sorted(bus_traffic.items()):
+		print("  bus {} address {:#04x}: {} transactions, {} bytes, {} errors".format(
+			bus,address,transactions,num_bytes,errors))
+
+	orders = getOrderTimes(records,BoardLayout(BOARDS_FILE_PATH))
+	print("\n{} orders, slowest first:".format(len(orders)))
+	for record_time, bus, address, frame, order_time, num_edges in sorted(orders,key=lambda order: -order[4])[:NUM_ORDERS_LISTED]:
+		print("  at {:8.3f} s  bus {} address {:#04x}  {} ready edges in {:.3f} s  frame {}".format(
+			record_time,bus,address,num_edges,order_time,frame))
+
+
+if __name__ == "__main__":
+	printReport()